@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Асинхронный доступ к базе данных GhostPen.
+
+Фасад над Database с теми же методами, которые выполняются в выделенном
+пуле потоков. Обработчики FastAPI делают `await adb.get_user(...)`
+и не блокируют event loop на дисковом I/O и ожидании блокировок SQLite.
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from database import Database
+
+
+class AsyncDatabase:
+    """Async-фасад Database поверх выделенного пула потоков."""
+
+    def __init__(self, db: Database, max_workers: int = 4):
+        """
+        Args:
+            db: Синхронная база данных
+            max_workers: Количество потоков БД (у каждого своё соединение SQLite)
+        """
+        self.db = db
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ghostpen-db"
+        )
+        self._wrappers: Dict[str, Callable[..., Any]] = {}
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Выполняет произвольную синхронную функцию в пуле потоков БД."""
+        loop = asyncio.get_running_loop()
+        # Контекст (текущий span трассировки) переходит в поток БД
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(context.run, func, *args, **kwargs)
+        )
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        """Возвращает async-версию публичного метода Database с тем же именем."""
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        wrapper = self._wrappers.get(name)
+        if wrapper is not None:
+            return wrapper
+
+        method = getattr(self.db, name)
+        if not callable(method):
+            raise AttributeError(f"Database.{name} не является методом")
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            return await self.run(method, *args, **kwargs)
+
+        self._wrappers[name] = wrapper
+        return wrapper
+
+    def close(self) -> None:
+        """Дожидается завершения запросов и останавливает пул."""
+        self._executor.shutdown(wait=True)
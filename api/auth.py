@@ -5,30 +5,60 @@ JWT Authentication для GhostPen API.
 Обеспечивает безопасную аутентификацию пользователей через JWT токены.
 """
 
+import asyncio
+import base64
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from lru_cache import LRUCache
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import (
+        Ed25519PrivateKey, Ed25519PublicKey
+    )
+    CRYPTOGRAPHY_AVAILABLE = True
+except ImportError:
+    CRYPTOGRAPHY_AVAILABLE = False
+
 # Настройки JWT (будут переопределены из config при импорте)
 try:
     from config import settings
     SECRET_KEY = settings.SECRET_KEY
-    ALGORITHM = "HS256"
+    ALGORITHM = settings.JWT_ALGORITHM
+    JWT_PRIVATE_KEY_PATH = settings.JWT_PRIVATE_KEY_PATH
+    JWT_PUBLIC_KEY_PATH = settings.JWT_PUBLIC_KEY_PATH
+    TOKEN_CACHE_MAX_ENTRIES = settings.TOKEN_CACHE_MAX_ENTRIES
     ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
     REFRESH_TOKEN_EXPIRE_DAYS = settings.REFRESH_TOKEN_EXPIRE_DAYS
+    BCRYPT_ROUNDS = settings.BCRYPT_ROUNDS
+    PASSWORD_HASH_WORKERS = settings.PASSWORD_HASH_WORKERS
+    PASSWORD_HASH_MAX_QUEUE = settings.PASSWORD_HASH_MAX_QUEUE
 except:
     # Fallback
     SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-    ALGORITHM = "HS256"
+    ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+    JWT_PRIVATE_KEY_PATH = os.getenv("JWT_PRIVATE_KEY_PATH")
+    JWT_PUBLIC_KEY_PATH = os.getenv("JWT_PUBLIC_KEY_PATH")
+    TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
     REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing (стоимость новых хэшей настраивается, старые проверяются с любой)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 # HTTP Bearer для извлечения токена
 security = HTTPBearer()
@@ -44,6 +74,224 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class PasswordHasher:
+    """
+    Хэширование паролей вне event loop.
+
+    bcrypt занимает 100-300 мс CPU и отпускает GIL, поэтому выполняется
+    в отдельном ограниченном пуле потоков. Очередь ограничена: при
+    перегрузке (шторм логинов) запрос сразу получает 503, а не копится.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 32):
+        """
+        Args:
+            max_workers: Потоков для bcrypt (не больше числа свободных ядер)
+            max_queue: Максимум ожидающих и выполняющихся операций
+        """
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ghostpen-bcrypt"
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    async def _run(self, func: Callable[..., Any], *args) -> Any:
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Сервер перегружен, повторите попытку позже",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Хэширует пароль в пуле bcrypt."""
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Проверяет пароль в пуле bcrypt."""
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def stats(self) -> Dict[str, int]:
+        """Текущая очередь и число отказов."""
+        return {"pending": self._pending, "max_queue": self.max_queue, "rejected": self.rejected}
+
+    def close(self) -> None:
+        """Останавливает пул (при остановке приложения)."""
+        self._executor.shutdown(wait=True)
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
+
+def _b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+class TokenCodec:
+    """
+    Подпись и проверка JWT.
+
+    HS256 — через python-jose с общим секретом. EdDSA (Ed25519) — через
+    cryptography (python-jose его не поддерживает): токен подписывается
+    приватным ключом, а проверить его может любой сервис с публичным.
+    """
+
+    def __init__(self, algorithm: str = "HS256", secret_key: Optional[str] = None,
+                 private_key: Optional["Ed25519PrivateKey"] = None,
+                 public_key: Optional["Ed25519PublicKey"] = None):
+        """
+        Args:
+            algorithm: "HS256" или "EdDSA"
+            secret_key: Секрет HS256
+            private_key: Ключ подписи EdDSA (без него токены только проверяются)
+            public_key: Ключ проверки EdDSA (по умолчанию из private_key)
+        """
+        if algorithm not in ("HS256", "EdDSA"):
+            raise ValueError(f"Неподдерживаемый алгоритм JWT: {algorithm}")
+        if algorithm == "EdDSA":
+            if not CRYPTOGRAPHY_AVAILABLE:
+                raise ImportError("Для EdDSA установите cryptography")
+            if public_key is None and private_key is not None:
+                public_key = private_key.public_key()
+            if public_key is None:
+                raise ValueError("Для EdDSA нужен приватный или публичный ключ Ed25519")
+        self.algorithm = algorithm
+        self.secret_key = secret_key
+        self.private_key = private_key
+        self.public_key = public_key
+        if algorithm == "EdDSA":
+            self._header = _b64url_encode(
+                json.dumps({"alg": "EdDSA", "typ": "JWT"}, separators=(",", ":")).encode()
+            )
+
+    @classmethod
+    def from_pem_files(cls, private_key_path: Optional[str],
+                       public_key_path: Optional[str]) -> "TokenCodec":
+        """EdDSA кодек из PEM файлов (достаточно одного из ключей)."""
+        if not CRYPTOGRAPHY_AVAILABLE:
+            raise ImportError("Для EdDSA установите cryptography")
+        private_key = public_key = None
+        if private_key_path:
+            with open(private_key_path, "rb") as f:
+                private_key = serialization.load_pem_private_key(f.read(), password=None)
+            if not isinstance(private_key, Ed25519PrivateKey):
+                raise ValueError(f"{private_key_path}: ожидается приватный ключ Ed25519")
+        if public_key_path:
+            with open(public_key_path, "rb") as f:
+                public_key = serialization.load_pem_public_key(f.read())
+            if not isinstance(public_key, Ed25519PublicKey):
+                raise ValueError(f"{public_key_path}: ожидается публичный ключ Ed25519")
+        return cls("EdDSA", private_key=private_key, public_key=public_key)
+
+    def encode(self, claims: dict) -> str:
+        """Подписывает claims (datetime в exp превращается в unix-время)."""
+        if self.algorithm == "HS256":
+            return jwt.encode(claims, self.secret_key, algorithm="HS256")
+        if self.private_key is None:
+            raise RuntimeError("Нет приватного ключа EdDSA: токены можно только проверять")
+
+        claims = {
+            key: int(value.timestamp()) if isinstance(value, datetime) else value
+            for key, value in claims.items()
+        }
+        payload = _b64url_encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+        signing_input = f"{self._header}.{payload}".encode("ascii")
+        return f"{self._header}.{payload}.{_b64url_encode(self.private_key.sign(signing_input))}"
+
+    def decode(self, token: str) -> Optional[dict]:
+        """Проверяет подпись и срок действия; None, если токен невалиден."""
+        if self.algorithm == "HS256":
+            try:
+                return jwt.decode(token, self.secret_key, algorithms=["HS256"])
+            except JWTError:
+                return None
+
+        try:
+            header_segment, payload_segment, signature_segment = token.split(".")
+            header = json.loads(_b64url_decode(header_segment))
+            if not isinstance(header, dict) or header.get("alg") != "EdDSA":
+                return None
+            self.public_key.verify(
+                _b64url_decode(signature_segment),
+                f"{header_segment}.{payload_segment}".encode("ascii")
+            )
+            claims = json.loads(_b64url_decode(payload_segment))
+        except (ValueError, InvalidSignature):
+            return None
+        if not isinstance(claims, dict):
+            return None
+
+        exp = claims.get("exp")
+        if exp is not None and (not isinstance(exp, (int, float)) or exp <= time.time()):
+            return None
+        return claims
+
+
+def _create_token_codec() -> TokenCodec:
+    if ALGORITHM != "EdDSA":
+        # Неподдерживаемый алгоритм — ValueError при старте, а не молча HS256
+        return TokenCodec(ALGORITHM, secret_key=SECRET_KEY)
+    if not CRYPTOGRAPHY_AVAILABLE:
+        raise ImportError("Для EdDSA установите cryptography")
+    if JWT_PRIVATE_KEY_PATH or JWT_PUBLIC_KEY_PATH:
+        return TokenCodec.from_pem_files(JWT_PRIVATE_KEY_PATH, JWT_PUBLIC_KEY_PATH)
+    # Без ключей: временный ключ процесса (токены не переживут перезапуск)
+    print("⚠️ [AUTH] JWT_PRIVATE_KEY_PATH не задан, EdDSA использует временный ключ")
+    return TokenCodec("EdDSA", private_key=Ed25519PrivateKey.generate())
+
+
+token_codec = _create_token_codec()
+
+
+class VerifiedTokenCache:
+    """
+    Кэш claims уже проверенных токенов.
+
+    Повторный запрос с тем же токеном не проверяет подпись заново.
+    Запись живёт до exp токена, размер кэша ограничен (LRU).
+    """
+
+    def __init__(self, max_entries: int = 10_000):
+        self._cache = LRUCache(max_entries, sizeof=lambda entry: 1)
+
+    def get(self, token: str) -> Optional[dict]:
+        entry = self._cache.get(token)
+        if entry is None:
+            return None
+        exp, claims = entry
+        if exp <= time.time():
+            self._cache.pop(token)
+            return None
+        return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        exp = claims.get("exp")
+        # Токены без срока действия не кэшируются
+        if isinstance(exp, (int, float)):
+            self._cache.put(token, (exp, claims))
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+token_cache = VerifiedTokenCache(TOKEN_CACHE_MAX_ENTRIES)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Создает JWT access token."""
     to_encode = data.copy()
@@ -53,8 +301,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return token_codec.encode(to_encode)
 
 
 def create_refresh_token(data: dict) -> str:
@@ -62,17 +309,22 @@ def create_refresh_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return token_codec.encode(to_encode)
 
 
 def decode_token(token: str) -> Optional[dict]:
-    """Декодирует JWT token."""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
-        return None
+    """
+    Декодирует JWT token.
+    
+    Проверенные claims кэшируются до exp; возвращаемый словарь общий,
+    его нельзя изменять.
+    """
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = token_codec.decode(token)
+        if claims is not None:
+            token_cache.put(token, claims)
+    return claims
 
 
 async def get_current_user(
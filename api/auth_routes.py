@@ -11,11 +11,11 @@ from typing import Optional
 import uuid
 
 from database import Database
+from async_database import AsyncDatabase
 from auth import (
     create_access_token,
     create_refresh_token,
-    verify_password,
-    get_password_hash,
+    password_hasher,
     get_current_user,
     decode_token
 )
@@ -33,6 +33,17 @@ def get_db():
     """Dependency для Database - будет переопределена в main.py."""
     return Database()
 
+
+_fallback_async_db: Optional[AsyncDatabase] = None
+
+
+def get_async_db() -> AsyncDatabase:
+    """Dependency для AsyncDatabase - будет переопределена в main.py."""
+    global _fallback_async_db
+    if _fallback_async_db is None:
+        _fallback_async_db = AsyncDatabase(get_db())
+    return _fallback_async_db
+
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
@@ -57,12 +68,12 @@ class TokenResponse(BaseModel):
 
 
 @router.post("/register", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
-async def register(request: RegisterRequest, db: Database = Depends(lambda: get_db())):
+async def register(request: RegisterRequest, db: AsyncDatabase = Depends(lambda: get_async_db())):
     """Регистрация нового пользователя."""
     logger.info(f"Registration attempt for email: {request.email}")
     
     # Проверяем, существует ли пользователь
-    existing_user = db.get_user_by_email(request.email)
+    existing_user = await db.get_user_by_email(request.email)
     if existing_user:
         logger.warning(f"Registration failed: email already exists - {request.email}")
         raise HTTPException(
@@ -72,9 +83,10 @@ async def register(request: RegisterRequest, db: Database = Depends(lambda: get_
     
     # Создаем пользователя
     user_id = str(uuid.uuid4())
-    password_hash = get_password_hash(request.password)
+    # bcrypt выполняется в отдельном пуле, event loop не блокируется
+    password_hash = await password_hasher.hash(request.password)
     
-    success = db.create_user(
+    success = await db.create_user(
         user_id=user_id,
         email=request.email,
         name=request.name,
@@ -105,12 +117,12 @@ async def register(request: RegisterRequest, db: Database = Depends(lambda: get_
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(request: LoginRequest, db: Database = Depends(lambda: get_db())):
+async def login(request: LoginRequest, db: AsyncDatabase = Depends(lambda: get_async_db())):
     """Вход пользователя."""
     logger.info(f"Login attempt for email: {request.email}")
     
     # Получаем пользователя
-    user = db.get_user_by_email(request.email)
+    user = await db.get_user_by_email(request.email)
     if not user:
         logger.warning(f"Login failed: user not found - {request.email}")
         raise HTTPException(
@@ -120,7 +132,7 @@ async def login(request: LoginRequest, db: Database = Depends(lambda: get_db()))
     
     # Проверяем пароль
     password_hash = user.get("password_hash")
-    if not password_hash or not verify_password(request.password, password_hash):
+    if not password_hash or not await password_hasher.verify(request.password, password_hash):
         logger.warning(f"Login failed: invalid password - {request.email}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -192,8 +204,8 @@ async def refresh_token(request: RefreshRequest):
         )
     
     # Получаем пользователя из БД для актуальных данных
-    db = get_db()
-    user = db.get_user(user_id)
+    db = get_async_db()
+    user = await db.get_user(user_id)
     if not user:
         logger.warning(f"User not found for refresh: {user_id}")
         raise HTTPException(
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: влияние шторма логинов на задержку /api/generate.
+
+Приложение запускается в процессе (ASGI, без сети) на временной базе.
+Пока параллельные клиенты непрерывно логинятся, отдельный клиент
+вызывает /api/generate (mock LLM) по расписанию и меряет задержку.
+Сравниваются два режима проверки пароля:
+- inline: bcrypt прямо в обработчике, на event loop;
+- pool: PasswordHasher (отдельный ограниченный пул потоков).
+
+Запуск:
+    cd api && python bench_login_storm.py --rounds 12 --clients 8 --duration 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+GENERATE_INTERVAL = 0.05  # секунд между запросами /api/generate
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Шторм логинов против /api/generate")
+    parser.add_argument("--rounds", type=int, default=12, help="Стоимость bcrypt")
+    parser.add_argument("--clients", type=int, default=8, help="Параллельных клиентов логина")
+    parser.add_argument("--duration", type=float, default=5.0, help="Длительность шторма, сек")
+    return parser.parse_args()
+
+
+class InlineHasher:
+    """Старое поведение: bcrypt на event loop."""
+
+    def __init__(self, auth_module):
+        self.auth = auth_module
+
+    async def hash(self, password: str) -> str:
+        return self.auth.get_password_hash(password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self.auth.verify_password(plain_password, hashed_password)
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_phase(client, duration: float, clients: int, credentials: dict):
+    """Меряет /api/generate, пока clients клиентов логинятся (clients=0 — без шторма)."""
+    stop_at = time.perf_counter() + duration
+    logins = {"ok": 0, "rejected": 0}
+
+    async def login_loop():
+        while time.perf_counter() < stop_at:
+            response = await client.post("/api/auth/login", json=credentials)
+            logins["ok" if response.status_code == 200 else "rejected"] += 1
+
+    async def generate_loop():
+        # Запросы по расписанию (каждые GENERATE_INTERVAL): задержка считается
+        # от запланированного момента, поэтому учитывает и время, пока
+        # заблокированный event loop не давал запросу начаться
+        latencies = []
+        scheduled = time.perf_counter()
+        while scheduled < stop_at:
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            response = await client.post("/api/generate", json={
+                "author_id": "person_01",
+                "social_network": "linkedin",
+                "topic": "О важности планирования"
+            })
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(f"/api/generate вернул {response.status_code}")
+            scheduled += GENERATE_INTERVAL
+        return latencies
+
+    results = await asyncio.gather(generate_loop(), *(login_loop() for _ in range(clients)))
+    return results[0], logins
+
+
+async def main_async(args) -> int:
+    import httpx
+    import main
+    import auth
+    import auth_routes
+
+    await main.startup_event()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        credentials = {"email": "bench@example.com", "password": "bench-password"}
+        response = await client.post("/api/auth/register", json={**credentials, "name": "Bench"})
+        if response.status_code != 201:
+            print(f"❌ Регистрация не удалась: {response.status_code} {response.text}")
+            return 1
+
+        print(f"bcrypt rounds={args.rounds}, клиентов логина={args.clients}, шторм {args.duration} с\n")
+        print(f"{'Режим':<22} {'p50, мс':>9} {'p95, мс':>9} {'max, мс':>9} {'логинов/с':>10} {'503':>6}")
+
+        pool_hasher = auth_routes.password_hasher
+        for name, hasher, clients in (
+            ("без шторма", pool_hasher, 0),
+            ("шторм, inline bcrypt", InlineHasher(auth), args.clients),
+            ("шторм, пул bcrypt", pool_hasher, args.clients),
+        ):
+            auth_routes.password_hasher = hasher
+            latencies, logins = await run_phase(client, args.duration, clients, credentials)
+            print(
+                f"{name:<22} {statistics.median(latencies):>9.1f} "
+                f"{percentile(latencies, 0.95):>9.1f} {max(latencies):>9.1f} "
+                f"{logins['ok'] / args.duration:>10.1f} {logins['rejected']:>6}"
+            )
+        auth_routes.password_hasher = pool_hasher
+
+    await main.shutdown_event()
+    return 0
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Временная база и mock LLM: бенчмарк не трогает рабочие данные
+    os.environ["DATABASE_PATH"] = str(Path(tempfile.mkdtemp()) / "bench.db")
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ.pop("OPENAI_API_KEY", None)
+    sys.exit(asyncio.run(main_async(args)))
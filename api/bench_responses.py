@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сериализации и сжатия ответов GhostPen API.
+
+Для типичных ответов /api/authors, /api/users/{id}/posts и
+/api/users/{id}/profile (собранных из dataset/) показывает:
+- время сериализации: jsonable_encoder + json (по умолчанию в FastAPI)
+  против FastJSONResponse (orjson, если установлен);
+- байты на проводе без сжатия, с gzip и brotli (если установлен).
+
+Запуск:
+    cd api && python bench_responses.py
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+
+from http_responses import (
+    BROTLI_AVAILABLE, ORJSON_AVAILABLE, compress, dumps
+)
+
+DATASET_DIR = Path(__file__).parent.parent / "dataset"
+
+
+def load_payloads() -> Dict[str, Any]:
+    """Собирает ответы эндпоинтов из демо-данных."""
+    with open(DATASET_DIR / "author_profiles.json", "r", encoding="utf-8") as f:
+        profiles = json.load(f)["profiles"]
+    with open(DATASET_DIR / "dataset.json", "r", encoding="utf-8") as f:
+        dataset = json.load(f)
+
+    posts: List[Dict[str, Any]] = []
+    for author in dataset["authors"]:
+        for platform, platform_posts in author["platforms"].items():
+            for post in platform_posts:
+                meta = post.get("meta", {})
+                posts.append({
+                    "id": post["post_id"],
+                    "user_id": author["author_id"],
+                    "platform": platform,
+                    "content": post["content"],
+                    "timestamp": post.get("timestamp"),
+                    "hashtags": meta.get("hashtags", []),
+                    "mentions": meta.get("mentions", []),
+                    "emojis": meta.get("emojis", []),
+                    "created_at": post.get("timestamp"),
+                })
+    page = posts[:100]
+
+    return {
+        "/api/authors": {"authors": profiles},
+        "/api/users/{id}/posts": {"posts": page, "count": len(page), "next_cursor": None},
+        "/api/users/{id}/profile": max(profiles, key=lambda p: len(json.dumps(p))),
+    }
+
+
+def default_render(content: Any) -> bytes:
+    """Как сериализует FastAPI по умолчанию (jsonable_encoder + JSONResponse)."""
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+        indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def measure_us(func: Callable[[], Any], min_time: float = 0.3) -> float:
+    """Среднее время одного вызова в микросекундах."""
+    iterations = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        iterations += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / iterations * 1e6
+
+
+def main():
+    payloads = load_payloads()
+    fast_name = "orjson" if ORJSON_AVAILABLE else "json (orjson не установлен)"
+    print(f"📊 Сериализация: FastAPI default против FastJSONResponse [{fast_name}]")
+    print(f"{'Эндпоинт':<26} {'default, мкс':>13} {'fast, мкс':>11} {'ускорение':>10}")
+    for name, payload in payloads.items():
+        default_us = measure_us(lambda: default_render(payload))
+        fast_us = measure_us(lambda: dumps(payload))
+        print(f"{name:<26} {default_us:>13.1f} {fast_us:>11.1f} {default_us / fast_us:>9.1f}x")
+
+    encodings = ["gzip"] + (["br"] if BROTLI_AVAILABLE else [])
+    print(f"\n📦 Байты на проводе (сжатие: {', '.join(encodings)})")
+    header = f"{'Эндпоинт':<26} {'raw':>9}"
+    for encoding in encodings:
+        header += f" {encoding:>9} {encoding + ', мкс':>11}"
+    print(header)
+    for name, payload in payloads.items():
+        body = dumps(payload)
+        row = f"{name:<26} {len(body):>9}"
+        for encoding in encodings:
+            compressed = compress(body, encoding)
+            compress_us = measure_us(lambda: compress(body, encoding), min_time=0.2)
+            row += f" {len(compressed):>9} {compress_us:>11.1f}"
+        print(row)
+
+    if not BROTLI_AVAILABLE:
+        print("\nℹ️  brotli не установлен: pip install brotli")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк проверки JWT в GhostPen API.
+
+Показывает, сколько проверок токена в секунду выдерживает один поток:
+- HS256 (python-jose) и EdDSA (Ed25519, cryptography);
+- без кэша (подпись проверяется каждый раз) и с кэшем проверенных токенов.
+
+Запуск:
+    cd api && python bench_tokens.py
+"""
+
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import auth
+from auth import CRYPTOGRAPHY_AVAILABLE, TokenCodec, VerifiedTokenCache
+
+TOKENS = 1000  # разных токенов (как разных активных пользователей)
+
+
+def measure_ops(func: Callable[[int], object], min_time: float = 0.5) -> float:
+    """Сколько вызовов func в секунду (аргумент — номер токена)."""
+    iterations = 0
+    start = time.perf_counter()
+    while True:
+        for i in range(TOKENS):
+            func(i)
+        iterations += TOKENS
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return iterations / elapsed
+
+
+def bench_codec(name: str, codec: TokenCodec) -> None:
+    auth.token_codec = codec
+    auth.token_cache = VerifiedTokenCache(TOKENS * 2)
+    tokens = [
+        auth.create_access_token({"sub": f"user-{i}"}, expires_delta=timedelta(hours=1))
+        for i in range(TOKENS)
+    ]
+    for token in tokens:
+        if codec.decode(token) is None:
+            raise RuntimeError(f"{name}: токен не прошёл проверку")
+
+    uncached = measure_ops(lambda i: codec.decode(tokens[i]))
+    cached = measure_ops(lambda i: auth.decode_token(tokens[i]))
+    print(f"{name:<8} {uncached:>14,.0f} {cached:>14,.0f} {cached / uncached:>9.1f}x "
+          f"{len(tokens[0]):>7}")
+
+
+def main():
+    print(f"📊 Проверок токена в секунду (1 поток, {TOKENS} разных токенов)")
+    print(f"{'Алгоритм':<8} {'без кэша':>14} {'с кэшем':>14} {'ускорение':>10} {'длина':>7}")
+    bench_codec("HS256", TokenCodec("HS256", secret_key="bench-secret"))
+    if CRYPTOGRAPHY_AVAILABLE:
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+        bench_codec("EdDSA", TokenCodec("EdDSA", private_key=Ed25519PrivateKey.generate()))
+    else:
+        print("\nℹ️  cryptography не установлен: EdDSA пропущен")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Кэширующая обёртка базы данных GhostPen.
+
+Read-through кэш пользователей и разобранных профилей поверх любого
+бэкенда (SQLite или PostgreSQL). Горячий путь /api/generate и
+/api/authors для активных пользователей не ходит в БД и не разбирает
+JSON. Записи сбрасываются точечно методами, которые их меняют.
+
+Возвращаемые словари общие для всех запросов — их нельзя изменять.
+"""
+
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from lru_cache import LRUCache
+
+
+# Маркер "записи нет в БД" (кэшируются и промахи)
+_MISSING = object()
+
+
+def _profile_size(profile: Any) -> int:
+    """Примерный размер профиля в байтах (длина его JSON)."""
+    if profile is _MISSING:
+        return 64
+    return len(json.dumps(profile, ensure_ascii=False))
+
+
+class CachedDatabase:
+    """Read-through LRU кэш get_user / get_profile с инвалидацией при записи."""
+
+    def __init__(self, backend: Any, max_users: int = 10_000,
+                 profile_cache_bytes: int = 16 * 1024 * 1024):
+        """
+        Args:
+            backend: Database или PostgresDatabase
+            max_users: Сколько пользователей держать в кэше
+            profile_cache_bytes: Бюджет кэша профилей в байтах
+        """
+        self.backend = backend
+        self.users = LRUCache(max_users, sizeof=lambda user: 1)
+        self.profiles = LRUCache(profile_cache_bytes, sizeof=_profile_size)
+        # Счётчик инвалидаций: значение, прочитанное до записи в БД,
+        # не должно попасть в кэш после её инвалидации
+        self._generation = 0
+        self._generation_lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        """Остальные методы бэкенда вызываются напрямую."""
+        return getattr(self.backend, name)
+
+    def _invalidate(self, cache: LRUCache, key: str) -> None:
+        with self._generation_lock:
+            self._generation += 1
+            cache.pop(key)
+
+    def _read_through(self, cache: LRUCache, key: str, load) -> Any:
+        value = cache.get(key)
+        if value is None:
+            generation = self._generation
+            loaded = load(key)
+            value = _MISSING if loaded is None else loaded
+            with self._generation_lock:
+                if generation == self._generation:
+                    cache.put(key, value)
+        return None if value is _MISSING else value
+
+    # === Users ===
+    def get_user(self, user_id: str) -> Optional[Dict]:
+        """Получить пользователя (из кэша)."""
+        return self._read_through(self.users, user_id, self.backend.get_user)
+
+    def create_user(self, user_id: str, *args, **kwargs) -> bool:
+        """Создать пользователя (сбрасывает закэшированный промах)."""
+        created = self.backend.create_user(user_id, *args, **kwargs)
+        self._invalidate(self.users, user_id)
+        return created
+
+    # === Posts ===
+    # Профиль строится по постам: при их изменении закэшированный профиль
+    # перечитывается, чтобы не расходиться с тем, что лежит в БД
+    def add_post(self, user_id: str, *args, **kwargs) -> str:
+        """Добавить пост пользователя."""
+        post_id = self.backend.add_post(user_id, *args, **kwargs)
+        self._invalidate(self.profiles, user_id)
+        return post_id
+
+    def add_posts(self, user_id: str, *args, **kwargs):
+        """Добавить много постов пользователя одной транзакцией."""
+        post_ids = self.backend.add_posts(user_id, *args, **kwargs)
+        self._invalidate(self.profiles, user_id)
+        return post_ids
+
+    def delete_post(self, post_id: str, user_id: str) -> bool:
+        """Удалить пост."""
+        deleted = self.backend.delete_post(post_id, user_id)
+        if deleted:
+            self._invalidate(self.profiles, user_id)
+        return deleted
+
+    # === Profiles ===
+    def get_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Получить стилевой профиль пользователя (из кэша)."""
+        return self._read_through(self.profiles, user_id, self.backend.get_profile)
+
+    def save_profile(self, user_id: str, profile: Dict[str, Any]) -> bool:
+        """Сохранить стилевой профиль пользователя."""
+        saved = self.backend.save_profile(user_id, profile)
+        self._invalidate(self.profiles, user_id)
+        return saved
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Статистика кэшей пользователей и профилей."""
+        return {"users": self.users.stats(), "profiles": self.profiles.stats()}
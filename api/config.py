@@ -34,6 +34,11 @@ class Settings(BaseSettings):
         env="ALLOWED_ORIGINS",
         description="Разрешенные домены для CORS"
     ) 
+    ADMIN_EMAILS: str = Field(
+        default="",
+        env="ADMIN_EMAILS",
+        description="Email администраторов через запятую (профилирование запросов)"
+    )
     
     # JWT
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(
@@ -44,18 +49,75 @@ class Settings(BaseSettings):
         default=30,
         env="REFRESH_TOKEN_EXPIRE_DAYS"
     )
+    JWT_ALGORITHM: str = Field(
+        default="HS256",
+        env="JWT_ALGORITHM",
+        description="Алгоритм подписи JWT: HS256 (общий секрет) или EdDSA (Ed25519)"
+    )
+    JWT_PRIVATE_KEY_PATH: Optional[str] = Field(
+        default=None,
+        env="JWT_PRIVATE_KEY_PATH",
+        description="PEM приватного ключа Ed25519 (для EdDSA)"
+    )
+    JWT_PUBLIC_KEY_PATH: Optional[str] = Field(
+        default=None,
+        env="JWT_PUBLIC_KEY_PATH",
+        description="PEM публичного ключа Ed25519 (для EdDSA, если нет приватного)"
+    )
+    TOKEN_CACHE_MAX_ENTRIES: int = Field(
+        default=10_000,
+        env="TOKEN_CACHE_MAX_ENTRIES",
+        description="Сколько проверенных токенов держать в кэше"
+    )
+    
+    # Password hashing
+    BCRYPT_ROUNDS: int = Field(
+        default=12,
+        env="BCRYPT_ROUNDS",
+        description="Стоимость bcrypt для новых хэшей (каждая единица удваивает время)"
+    )
+    PASSWORD_HASH_WORKERS: int = Field(
+        default=2,
+        env="PASSWORD_HASH_WORKERS",
+        description="Потоков для хэширования паролей"
+    )
+    PASSWORD_HASH_MAX_QUEUE: int = Field(
+        default=32,
+        env="PASSWORD_HASH_MAX_QUEUE",
+        description="Максимум операций bcrypt в очереди (сверх — 503)"
+    )
     
     # Database
     DATABASE_URL: Optional[str] = Field(
         default=None,
         env="DATABASE_URL",
-        description="URL базы данных (для PostgreSQL в production)"
+        description="URL PostgreSQL (postgresql://...); если не задан — SQLite по DATABASE_PATH"
     )
     DATABASE_PATH: str = Field(
         default="ghostpen.db",
         env="DATABASE_PATH",
         description="Путь к SQLite базе (для dev)"
     )
+    DATABASE_WORKERS: int = Field(
+        default=4,
+        env="DATABASE_WORKERS",
+        description="Размер пула потоков для async-доступа к БД"
+    )
+    DATABASE_POOL_SIZE: int = Field(
+        default=10,
+        env="DATABASE_POOL_SIZE",
+        description="Максимум соединений в пуле PostgreSQL"
+    )
+    USER_CACHE_MAX_ENTRIES: int = Field(
+        default=10_000,
+        env="USER_CACHE_MAX_ENTRIES",
+        description="Сколько пользователей держать в read-through кэше"
+    )
+    PROFILE_CACHE_MAX_BYTES: int = Field(
+        default=16 * 1024 * 1024,
+        env="PROFILE_CACHE_MAX_BYTES",
+        description="Бюджет кэша разобранных профилей пользователей в байтах"
+    )
     
     # OpenAI
     OPENAI_API_KEY: Optional[str] = Field(
@@ -63,6 +125,16 @@ class Settings(BaseSettings):
         env="OPENAI_API_KEY",
         description="OpenAI API ключ"
     )
+    OPENAI_BASE_URL: Optional[str] = Field(
+        default=None,
+        env="OPENAI_BASE_URL",
+        description="OpenAI-совместимый сервер (по умолчанию api.openai.com)"
+    )
+    OPENAI_STREAM: bool = Field(
+        default=False,
+        env="OPENAI_STREAM",
+        description="Получать ответ LLM потоком (SSE)"
+    )
     
     # Logging
     LOG_LEVEL: str = Field(
@@ -75,6 +147,51 @@ class Settings(BaseSettings):
         env="LOG_FORMAT",
         description="Формат логов (json, text)"
     )
+    LOG_QUEUE_SIZE: int = Field(
+        default=10_000,
+        env="LOG_QUEUE_SIZE",
+        description="Записей в очереди логов (сверх — отбрасываются, а не блокируют запрос)"
+    )
+    LOG_DEBUG_SAMPLE_RATE: float = Field(
+        default=0.1,
+        env="LOG_DEBUG_SAMPLE_RATE",
+        description="Доля DEBUG-записей, которые попадают в лог (при LOG_LEVEL=DEBUG)"
+    )
+    
+    # Generation pipeline
+    PIPELINE_TRACK_ALLOCATIONS: bool = Field(
+        default=False,
+        env="PIPELINE_TRACK_ALLOCATIONS",
+        description="Замерять выделение памяти по этапам генерации (tracemalloc, медленнее)"
+    )
+    
+    PROMPT_CACHE_MAX_BYTES: int = Field(
+        default=4 * 1024 * 1024,
+        env="PROMPT_CACHE_MAX_BYTES",
+        description="Бюджет LRU кэша готовых промптов в байтах"
+    )
+    PROFILES_RELOAD_INTERVAL: float = Field(
+        default=2.0,
+        env="PROFILES_RELOAD_INTERVAL",
+        description="Период проверки author_profiles.json на изменения, сек (0 — без перезагрузки)"
+    )
+    USER_POST_INDEX_MAX_POSTS: int = Field(
+        default=200_000,
+        env="USER_POST_INDEX_MAX_POSTS",
+        description="Сколько постов пользователей держать в BM25 индексах в памяти (LRU)"
+    )
+    BULK_IMPORT_MAX_POSTS: int = Field(
+        default=10_000,
+        env="BULK_IMPORT_MAX_POSTS",
+        description="Максимум постов в одном запросе массового импорта"
+    )
+    
+    # Responses
+    COMPRESSION_MIN_BYTES: int = Field(
+        default=1024,
+        env="COMPRESSION_MIN_BYTES",
+        description="Сжимать (brotli/gzip) ответы не меньше этого размера, байт"
+    )
     
     # Environment
     ENVIRONMENT: str = Field(
@@ -83,6 +200,48 @@ class Settings(BaseSettings):
         description="Окружение (development, staging, production)"
     )
     
+    # Metrics
+    METRICS_ENABLED: bool = Field(
+        default=True,
+        env="METRICS_ENABLED",
+        description="Prometheus метрики на GET /metrics"
+    )
+    
+    # Profiling (cProfile отдельного запроса по запросу администратора)
+    PROFILE_DIR: str = Field(
+        default="profiles",
+        env="PROFILE_DIR",
+        description="Каталог .prof файлов профилированных запросов"
+    )
+    PROFILE_MAX_FILES: int = Field(
+        default=100,
+        env="PROFILE_MAX_FILES",
+        gt=0,
+        description="Сколько последних .prof файлов хранить в PROFILE_DIR"
+    )
+    PROFILE_TOP_FUNCTIONS: int = Field(
+        default=25,
+        env="PROFILE_TOP_FUNCTIONS",
+        description="Сколько функций показывать в сводке профиля"
+    )
+    
+    # Tracing
+    TRACE_EXPORTER: str = Field(
+        default="none",
+        env="TRACE_EXPORTER",
+        description="Экспорт spans: none (только ID в логах), jsonl или otlp"
+    )
+    TRACE_FILE: str = Field(
+        default="traces.jsonl",
+        env="TRACE_FILE",
+        description="Файл spans для TRACE_EXPORTER=jsonl"
+    )
+    TRACE_OTLP_ENDPOINT: str = Field(
+        default="http://localhost:4318/v1/traces",
+        env="TRACE_OTLP_ENDPOINT",
+        description="OTLP/HTTP (JSON) коллектор для TRACE_EXPORTER=otlp"
+    )
+    
     # Rate Limiting
     RATE_LIMIT_ENABLED: bool = Field(
         default=True,
@@ -90,7 +249,36 @@ class Settings(BaseSettings):
     )
     RATE_LIMIT_PER_MINUTE: int = Field(
         default=10,
-        env="RATE_LIMIT_PER_MINUTE"
+        env="RATE_LIMIT_PER_MINUTE",
+        gt=0,
+        description="Генераций в минуту на пользователя (и всплеск)"
+    )
+    RATE_LIMIT_TOKENS_PER_MINUTE: int = Field(
+        default=20_000,
+        env="RATE_LIMIT_TOKENS_PER_MINUTE",
+        gt=0,
+        description="Оценочных токенов LLM в минуту на пользователя"
+    )
+    RATE_LIMIT_BURST_TOKENS: int = Field(
+        default=40_000,
+        env="RATE_LIMIT_BURST_TOKENS",
+        gt=0,
+        description="Ёмкость корзины токенов (максимальный всплеск)"
+    )
+    RATE_LIMIT_BACKEND: str = Field(
+        default="memory",
+        env="RATE_LIMIT_BACKEND",
+        description="Хранилище корзин: memory (один воркер), sqlite или redis (несколько)"
+    )
+    RATE_LIMIT_SQLITE_PATH: str = Field(
+        default="ratelimit.db",
+        env="RATE_LIMIT_SQLITE_PATH",
+        description="Файл SQLite для RATE_LIMIT_BACKEND=sqlite"
+    )
+    RATE_LIMIT_REDIS_URL: Optional[str] = Field(
+        default=None,
+        env="RATE_LIMIT_REDIS_URL",
+        description="URL Redis-совместимого сервера для RATE_LIMIT_BACKEND=redis"
     )
     
     @field_validator("ALLOWED_ORIGINS", mode="before")
@@ -3,21 +3,113 @@
 База данных для GhostPen.
 
 SQLite база для хранения пользователей, их постов и стилевых профилей.
+Соединения долгоживущие (одно на поток) и работают в WAL режиме.
 """
 
 import sqlite3
 import json
+import re
+import threading
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Sequence, Tuple
 from datetime import datetime, timezone
 
 
+# Колонки user_posts (для проекции в get_user_posts)
+POST_COLUMNS = ('id', 'user_id', 'platform', 'content', 'timestamp',
+                'hashtags', 'mentions', 'emojis', 'created_at')
+JSON_POST_COLUMNS = ('hashtags', 'mentions', 'emojis')
+
+
+def project_post_columns(columns: Optional[Sequence[str]]) -> Tuple[str, ...]:
+    """
+    Проверяет запрошенные колонки постов и возвращает список для SELECT.
+
+    id и timestamp добавляются всегда — они нужны для курсора.
+    """
+    if columns is None:
+        return POST_COLUMNS
+    unknown = set(columns) - set(POST_COLUMNS)
+    if unknown:
+        raise ValueError(f"Неизвестные колонки: {', '.join(sorted(unknown))}")
+    return ('id', 'timestamp') + tuple(
+        c for c in POST_COLUMNS if c in columns and c not in ('id', 'timestamp')
+    )
+
+
+def build_fts_query(text: str) -> str:
+    """
+    Превращает пользовательский запрос в безопасное выражение FTS5.
+
+    Фразы в двойных кавычках ищутся точно, остальные слова — по префиксу
+    (покрывает окончания: «планирован» найдёт «планированию»). Все части
+    должны встретиться в посте. Операторы FTS5 во вводе не интерпретируются.
+    """
+    parts = []
+    for index, chunk in enumerate(text.split('"')):
+        if index % 2:
+            words = re.findall(r'\w+', chunk)
+            if words:
+                parts.append('"' + ' '.join(words) + '"')
+        else:
+            parts.extend(f'"{word}"*' for word in re.findall(r'\w+', chunk))
+    return ' '.join(parts)
+
+
+def group_posts_for_profiling(user_id: str, posts: List[Dict]) -> Optional[Dict[str, Any]]:
+    """Группирует посты пользователя по платформам в формат StyleProfiler."""
+    if not posts:
+        return None
+    
+    platforms_data = {}
+    for post in posts:
+        platforms_data.setdefault(post['platform'], []).append({
+            'post_id': post['id'],
+            'content': post['content'],
+            'timestamp': post['timestamp'],
+            'meta': {
+                'hashtags': post['hashtags'],
+                'mentions': post['mentions'],
+                'emojis': post['emojis']
+            }
+        })
+    
+    return {
+        'author_id': f"user_{user_id}",
+        'platforms': platforms_data
+    }
+
+
+def create_database(database_url: Optional[str] = None, db_path: str = "ghostpen.db", **options):
+    """
+    Создаёт бэкенд БД по настройкам.
+
+    Args:
+        database_url: postgresql://... — PostgreSQL, иначе SQLite
+        db_path: Путь к SQLite базе
+        **options: Параметры PostgresDatabase (min_size, max_size)
+
+    Returns:
+        Database или PostgresDatabase с одинаковым набором методов
+    """
+    if database_url and database_url.startswith(("postgresql://", "postgres://")):
+        from postgres_database import PostgresDatabase
+        return PostgresDatabase(database_url, **options)
+    return Database(db_path)
+
+
 class Database:
     """Управление базой данных GhostPen."""
     
     _instance = None
     _initialized = False
     
+    # Настройки соединений SQLite
+    BUSY_TIMEOUT_MS = 5000              # Ожидание блокировки писателя
+    CACHE_SIZE_KB = 16 * 1024           # Кэш страниц на соединение
+    MMAP_SIZE = 256 * 1024 * 1024       # Memory-mapped I/O
+    CACHED_STATEMENTS = 256             # Кэш подготовленных выражений на соединение
+    
     def __new__(cls, db_path: str = "ghostpen.db"):
         """Singleton pattern - один экземпляр Database."""
         if cls._instance is None:
@@ -28,113 +120,255 @@ class Database:
         """Инициализация (вызывается только один раз благодаря singleton)."""
         if not Database._initialized:
             self.db_path = Path(db_path)
+            # Долгоживущее соединение на поток (sqlite3.Connection не потокобезопасен)
+            self._local = threading.local()
+            self._connections: List[sqlite3.Connection] = []
+            self._connections_lock = threading.Lock()
             self.init_db()
             Database._initialized = True
     
-    def get_connection(self):
-        """Получить соединение с БД."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+    def get_connection(self) -> sqlite3.Connection:
+        """
+        Получить соединение с БД текущего потока.
+        
+        Соединение открывается один раз на поток и переиспользуется,
+        вместе с ним переиспользуются и подготовленные выражения.
+        Закрывать его не нужно.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.BUSY_TIMEOUT_MS / 1000,
+                cached_statements=self.CACHED_STATEMENTS,
+                check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            self._configure_connection(conn)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
         return conn
     
+    def _configure_connection(self, conn: sqlite3.Connection) -> None:
+        """Применяет PRAGMA к новому соединению."""
+        # WAL: читатели не блокируются писателем
+        conn.execute("PRAGMA journal_mode=WAL")
+        # В WAL режиме NORMAL безопасен и не делает fsync на каждый commit
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={self.BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size=-{self.CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={self.MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+    
+    def close(self) -> None:
+        """Закрывает все открытые соединения (при остановке приложения)."""
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+    
     def init_db(self):
         """Инициализация таблиц БД."""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Таблица пользователей
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id TEXT PRIMARY KEY,
-                email TEXT UNIQUE,
-                name TEXT,
-                password_hash TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Миграция: добавляем password_hash если его нет
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN password_hash TEXT")
-        except sqlite3.OperationalError:
-            pass  # Колонка уже существует
-        
-        # Индексы для производительности
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_user_posts_user_id 
-            ON user_posts(user_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_user_posts_platform 
-            ON user_posts(platform)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_users_email 
-            ON users(email)
-        """)
-        
-        # Таблица постов пользователей
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_posts (
-                id TEXT PRIMARY KEY,
-                user_id TEXT NOT NULL,
-                platform TEXT NOT NULL,
-                content TEXT NOT NULL,
-                timestamp TEXT,
-                hashtags TEXT,  -- JSON array
-                mentions TEXT,  -- JSON array
-                emojis TEXT,   -- JSON array
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        """)
-        
-        # Таблица стилевых профилей
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_profiles (
-                user_id TEXT PRIMARY KEY,
-                profile_json TEXT NOT NULL,  -- JSON профиля стиля
-                generated_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
+        with conn:
+            cursor = conn.cursor()
+            
+            # Таблица пользователей
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id TEXT PRIMARY KEY,
+                    email TEXT UNIQUE,
+                    name TEXT,
+                    password_hash TEXT,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Миграция: добавляем password_hash если его нет
+            try:
+                cursor.execute("ALTER TABLE users ADD COLUMN password_hash TEXT")
+            except sqlite3.OperationalError:
+                pass  # Колонка уже существует
+            
+            # Таблица постов пользователей. post_rowid — явный псевдоним rowid:
+            # по нему FTS5 индекс ссылается на строки, и VACUUM его не перенумерует
+            posts_columns = {row[1] for row in cursor.execute("PRAGMA table_info(user_posts)")}
+            migrate_posts = bool(posts_columns) and 'post_rowid' not in posts_columns
+            if migrate_posts:
+                cursor.execute("ALTER TABLE user_posts RENAME TO user_posts_old")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS user_posts (
+                    post_rowid INTEGER PRIMARY KEY,
+                    id TEXT NOT NULL UNIQUE,
+                    user_id TEXT NOT NULL,
+                    platform TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    timestamp TEXT,
+                    hashtags TEXT,  -- JSON array
+                    mentions TEXT,  -- JSON array
+                    emojis TEXT,   -- JSON array
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users(id)
+                )
+            """)
+            if migrate_posts:
+                # Миграция: старая таблица с TEXT ключом и неявным rowid; её триггеры
+                # и индексы удаляются вместе с ней и создаются ниже заново
+                cursor.execute("""
+                    INSERT INTO user_posts
+                    (post_rowid, id, user_id, platform, content, timestamp,
+                     hashtags, mentions, emojis, created_at)
+                    SELECT rowid, id, user_id, platform, content, timestamp,
+                           hashtags, mentions, emojis, created_at
+                    FROM user_posts_old
+                """)
+                cursor.execute("DROP TABLE user_posts_old")
+                cursor.execute("DROP TABLE IF EXISTS user_posts_fts")
+            
+            # Таблица стилевых профилей
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS user_profiles (
+                    user_id TEXT PRIMARY KEY,
+                    profile_json TEXT NOT NULL,  -- JSON профиля стиля
+                    generated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users(id)
+                )
+            """)
+            
+            # Полнотекстовый поиск по постам: внешний FTS5 индекс над
+            # user_posts.content, синхронизируется триггерами
+            fts_exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_posts_fts'"
+            ).fetchone()
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS user_posts_fts USING fts5(
+                    content,
+                    content='user_posts',
+                    content_rowid='post_rowid',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS user_posts_fts_insert AFTER INSERT ON user_posts BEGIN
+                    INSERT INTO user_posts_fts(rowid, content) VALUES (new.post_rowid, new.content);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS user_posts_fts_delete AFTER DELETE ON user_posts BEGIN
+                    INSERT INTO user_posts_fts(user_posts_fts, rowid, content)
+                    VALUES ('delete', old.post_rowid, old.content);
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS user_posts_fts_update AFTER UPDATE OF content ON user_posts BEGIN
+                    INSERT INTO user_posts_fts(user_posts_fts, rowid, content)
+                    VALUES ('delete', old.post_rowid, old.content);
+                    INSERT INTO user_posts_fts(rowid, content) VALUES (new.post_rowid, new.content);
+                END
+            """)
+            if not fts_exists:
+                # Миграция: индексируем уже существующие посты
+                cursor.execute("INSERT INTO user_posts_fts(user_posts_fts) VALUES ('rebuild')")
+            
+            # Агрегаты постов по пользователю и платформе (для /api/authors),
+            # обновляются триггерами в той же транзакции, что и user_posts
+            stats_exists = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_post_stats'"
+            ).fetchone()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS user_post_stats (
+                    user_id TEXT NOT NULL,
+                    platform TEXT NOT NULL,
+                    post_count INTEGER NOT NULL DEFAULT 0,
+                    total_chars INTEGER NOT NULL DEFAULT 0,
+                    last_post_at TEXT,
+                    PRIMARY KEY (user_id, platform)
+                ) WITHOUT ROWID
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS user_post_stats_insert AFTER INSERT ON user_posts BEGIN
+                    INSERT INTO user_post_stats (user_id, platform, post_count, total_chars, last_post_at)
+                    VALUES (new.user_id, new.platform, 1, length(new.content), new.timestamp)
+                    ON CONFLICT (user_id, platform) DO UPDATE SET
+                        post_count = post_count + 1,
+                        total_chars = total_chars + excluded.total_chars,
+                        last_post_at = nullif(max(coalesce(last_post_at, ''), coalesce(excluded.last_post_at, '')), '');
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS user_post_stats_delete AFTER DELETE ON user_posts BEGIN
+                    UPDATE user_post_stats SET
+                        post_count = post_count - 1,
+                        total_chars = total_chars - length(old.content),
+                        last_post_at = (
+                            SELECT max(timestamp) FROM user_posts
+                            WHERE user_id = old.user_id AND platform = old.platform
+                        )
+                    WHERE user_id = old.user_id AND platform = old.platform;
+                    DELETE FROM user_post_stats
+                    WHERE user_id = old.user_id AND platform = old.platform AND post_count <= 0;
+                END
+            """)
+            if not stats_exists:
+                # Миграция: считаем агрегаты по уже существующим постам
+                cursor.execute("""
+                    INSERT INTO user_post_stats (user_id, platform, post_count, total_chars, last_post_at)
+                    SELECT user_id, platform, count(*), sum(length(content)), max(timestamp)
+                    FROM user_posts GROUP BY user_id, platform
+                """)
+            
+            # Индексы для производительности (после создания таблиц)
+            # Составные индексы под ленту постов (user_id, [platform,] timestamp, id).
+            # Индекс по одному user_id покрывается их префиксом
+            cursor.execute("DROP INDEX IF EXISTS idx_user_posts_user_id")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_user_posts_user_timeline 
+                ON user_posts(user_id, timestamp, id)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_user_posts_user_platform_timeline 
+                ON user_posts(user_id, platform, timestamp, id)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_user_posts_platform 
+                ON user_posts(platform)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_users_email 
+                ON users(email)
+            """)
     
     # === Users ===
     def create_user(self, user_id: str, email: Optional[str] = None, name: Optional[str] = None, password_hash: Optional[str] = None) -> bool:
         """Создать пользователя."""
         conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute(
-                "INSERT INTO users (id, email, name, password_hash) VALUES (?, ?, ?, ?)",
-                (user_id, email, name, password_hash)
-            )
-            conn.commit()
+            with conn:
+                conn.execute(
+                    "INSERT INTO users (id, email, name, password_hash) VALUES (?, ?, ?, ?)",
+                    (user_id, email, name, password_hash)
+                )
             return True
         except sqlite3.IntegrityError:
             return False
-        finally:
-            conn.close()
     
     def get_user(self, user_id: str) -> Optional[Dict]:
         """Получить пользователя."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-        row = cursor.fetchone()
-        conn.close()
+        row = self.get_connection().execute(
+            "SELECT * FROM users WHERE id = ?", (user_id,)
+        ).fetchone()
         return dict(row) if row else None
     
     def get_user_by_email(self, email: str) -> Optional[Dict]:
         """Получить пользователя по email."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-        row = cursor.fetchone()
-        conn.close()
+        row = self.get_connection().execute(
+            "SELECT * FROM users WHERE email = ?", (email,)
+        ).fetchone()
         return dict(row) if row else None
     
     # === Posts ===
@@ -148,120 +382,195 @@ class Database:
         post_id = str(uuid.uuid4())
         
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO user_posts 
-            (id, user_id, platform, content, timestamp, hashtags, mentions, emojis)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            post_id,
-            user_id,
-            platform,
-            content,
-            timestamp or datetime.now(timezone.utc).isoformat(),
-            json.dumps(hashtags or []),
-            json.dumps(mentions or []),
-            json.dumps(emojis or [])
-        ))
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute("""
+                INSERT INTO user_posts 
+                (id, user_id, platform, content, timestamp, hashtags, mentions, emojis)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                post_id,
+                user_id,
+                platform,
+                content,
+                timestamp or datetime.now(timezone.utc).isoformat(),
+                json.dumps(hashtags or []),
+                json.dumps(mentions or []),
+                json.dumps(emojis or [])
+            ))
         return post_id
-    
-    def get_user_posts(self, user_id: str, platform: Optional[str] = None) -> List[Dict]:
-        """Получить посты пользователя."""
+
+    def add_posts(self, user_id: str, posts: List[Dict[str, Any]],
+                  chunk_size: int = 500) -> List[str]:
+        """
+        Добавить много постов пользователя одной транзакцией.
+
+        Args:
+            user_id: ID пользователя
+            posts: Посты (ключи как у add_post: platform, content, timestamp, hashtags, ...)
+            chunk_size: Сколько строк передавать в один executemany
+
+        Returns:
+            ID добавленных постов в порядке входного списка
+        """
+        import uuid
+        now = datetime.now(timezone.utc).isoformat()
+        post_ids = [str(uuid.uuid4()) for _ in posts]
+
         conn = self.get_connection()
-        cursor = conn.cursor()
+        # Один commit на весь импорт: либо добавлены все посты, либо ни одного
+        with conn:
+            for start in range(0, len(posts), chunk_size):
+                conn.executemany("""
+                    INSERT INTO user_posts
+                    (id, user_id, platform, content, timestamp, hashtags, mentions, emojis)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    (
+                        post_id,
+                        user_id,
+                        post['platform'],
+                        post['content'],
+                        post.get('timestamp') or now,
+                        json.dumps(post.get('hashtags') or []),
+                        json.dumps(post.get('mentions') or []),
+                        json.dumps(post.get('emojis') or [])
+                    )
+                    for post_id, post in zip(
+                        post_ids[start:start + chunk_size], posts[start:start + chunk_size]
+                    )
+                ])
+        return post_ids
+
+    def get_user_posts(self, user_id: str, platform: Optional[str] = None,
+                       limit: Optional[int] = None,
+                       after: Optional[Tuple[str, str]] = None,
+                       columns: Optional[Sequence[str]] = None) -> List[Dict]:
+        """
+        Получить посты пользователя (новые первыми).
+        
+        Args:
+            user_id: ID пользователя
+            platform: Фильтр по платформе
+            limit: Размер страницы (None — все посты)
+            after: Курсор (timestamp, id) последнего поста предыдущей страницы
+            columns: Какие колонки вернуть (None — все); id и timestamp
+                добавляются всегда, они нужны для курсора
         
+        Returns:
+            Список постов, JSON колонки уже разобраны
+        """
+        selected = project_post_columns(columns)
+        
+        # Порядок (timestamp, id) совпадает с составными индексами,
+        # страница читается по индексу без сортировки и OFFSET
+        query = f"SELECT {', '.join(selected)} FROM user_posts WHERE user_id = ?"
+        params: List[Any] = [user_id]
         if platform:
-            cursor.execute(
-                "SELECT * FROM user_posts WHERE user_id = ? AND platform = ? ORDER BY timestamp DESC",
-                (user_id, platform)
-            )
-        else:
-            cursor.execute(
-                "SELECT * FROM user_posts WHERE user_id = ? ORDER BY timestamp DESC",
-                (user_id,)
-            )
+            query += " AND platform = ?"
+            params.append(platform)
+        if after is not None:
+            query += " AND (timestamp, id) < (?, ?)"
+            params.extend(after)
+        query += " ORDER BY timestamp DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
         
-        rows = cursor.fetchall()
-        conn.close()
+        rows = self.get_connection().execute(query, params).fetchall()
         
+        json_columns = [c for c in JSON_POST_COLUMNS if c in selected]
         posts = []
         for row in rows:
             post = dict(row)
-            post['hashtags'] = json.loads(post['hashtags'] or '[]')
-            post['mentions'] = json.loads(post['mentions'] or '[]')
-            post['emojis'] = json.loads(post['emojis'] or '[]')
+            for column in json_columns:
+                post[column] = json.loads(post[column] or '[]')
             posts.append(post)
         
         return posts
     
+    def search_user_posts(self, user_id: str, query: str,
+                          platform: Optional[str] = None,
+                          limit: int = 20) -> List[Dict]:
+        """
+        Полнотекстовый поиск по постам пользователя.
+        
+        Args:
+            user_id: ID пользователя
+            query: Слова (ищутся по префиксу) и "точные фразы" в кавычках
+            platform: Фильтр по платформе
+            limit: Сколько постов вернуть
+        
+        Returns:
+            Посты (id, platform, timestamp, snippet, score) по убыванию релевантности
+        """
+        match = build_fts_query(query)
+        if not match:
+            return []
+        
+        sql = """
+            SELECT p.id, p.platform, p.timestamp,
+                   snippet(user_posts_fts, 0, '<mark>', '</mark>', '…', 16) AS snippet,
+                   -bm25(user_posts_fts) AS score
+            FROM user_posts_fts
+            JOIN user_posts p ON p.post_rowid = user_posts_fts.rowid
+            WHERE user_posts_fts MATCH ? AND p.user_id = ?
+        """
+        params: List[Any] = [match, user_id]
+        if platform:
+            sql += " AND p.platform = ?"
+            params.append(platform)
+        sql += " ORDER BY bm25(user_posts_fts) LIMIT ?"
+        params.append(limit)
+        
+        rows = self.get_connection().execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+    
     def delete_post(self, post_id: str, user_id: str) -> bool:
         """Удалить пост."""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "DELETE FROM user_posts WHERE id = ? AND user_id = ?",
-            (post_id, user_id)
-        )
-        deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        return deleted
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM user_posts WHERE id = ? AND user_id = ?",
+                (post_id, user_id)
+            )
+        return cursor.rowcount > 0
+    
+    def get_user_post_stats(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Агрегаты постов пользователя без чтения самих постов.
+        
+        Returns:
+            {platform: {"post_count", "total_chars", "last_post_at"}}
+        """
+        rows = self.get_connection().execute(
+            "SELECT platform, post_count, total_chars, last_post_at "
+            "FROM user_post_stats WHERE user_id = ?",
+            (user_id,)
+        ).fetchall()
+        return {row['platform']: dict(row) for row in rows}
     
     # === Profiles ===
     def save_profile(self, user_id: str, profile: Dict[str, Any]) -> bool:
         """Сохранить стилевой профиль пользователя."""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT OR REPLACE INTO user_profiles (user_id, profile_json, generated_at)
-            VALUES (?, ?, ?)
-        """, (
-            user_id,
-            json.dumps(profile, ensure_ascii=False),
-            datetime.now(timezone.utc).isoformat()
-        ))
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO user_profiles (user_id, profile_json, generated_at)
+                VALUES (?, ?, ?)
+            """, (
+                user_id,
+                json.dumps(profile, ensure_ascii=False),
+                datetime.now(timezone.utc).isoformat()
+            ))
         return True
     
     def get_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Получить стилевой профиль пользователя."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT profile_json FROM user_profiles WHERE user_id = ?", (user_id,))
-        row = cursor.fetchone()
-        conn.close()
+        row = self.get_connection().execute(
+            "SELECT profile_json FROM user_profiles WHERE user_id = ?", (user_id,)
+        ).fetchone()
         return json.loads(row['profile_json']) if row else None
     
     def get_user_data_for_profiling(self, user_id: str) -> Dict[str, Any]:
         """Получить данные пользователя в формате для StyleProfiler."""
-        posts = self.get_user_posts(user_id)
-        
-        if not posts:
-            return None
-        
-        # Группируем по платформам
-        platforms_data = {}
-        for post in posts:
-            platform = post['platform']
-            if platform not in platforms_data:
-                platforms_data[platform] = []
-            
-            platforms_data[platform].append({
-                'post_id': post['id'],
-                'content': post['content'],
-                'timestamp': post['timestamp'],
-                'meta': {
-                    'hashtags': post['hashtags'],
-                    'mentions': post['mentions'],
-                    'emojis': post['emojis']
-                }
-            })
-        
-        return {
-            'author_id': f"user_{user_id}",
-            'platforms': platforms_data
-        }
-
+        return group_posts_for_profiling(user_id, self.get_user_posts(user_id))
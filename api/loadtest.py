@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест GhostPen API с mock LLM сервером.
+
+Запускает mock OpenAI-совместимый сервер (mock_llm_server.py) и API
+(uvicorn, отдельные процессы, временная база), готовит пользователей
+и подаёт открытый поток запросов (пуассоновский, --rps) в заданной
+смеси сценариев. Задержка считается от запланированного момента
+запроса, поэтому очередь на стороне сервера в ней видна. В конце —
+пропускная способность и p50/p95/p99 по маршрутам.
+
+Сценарии (--mix):
+    generate       POST /api/generate с демо-автором
+    generate_user  POST /api/generate с профилем пользователя
+    authors        GET /api/authors
+    login          POST /api/auth/login
+    ingest         POST /api/users/{user_id}/posts
+
+Запуск:
+    cd api && python loadtest.py --rps 20 --duration 30 \\
+        --mix generate=4,generate_user=2,authors=3,login=1,ingest=2 \\
+        --latency lognormal:800:0.5 --error-rate 0.02 --stream
+
+    # Против уже запущенного API (LLM настроен на его стороне)
+    python loadtest.py --target http://localhost:8000 --rps 5 --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+API_DIR = Path(__file__).parent
+DATASET_PATH = API_DIR.parent / "dataset" / "author_profiles.json"
+
+DEFAULT_MIX = "generate=4,generate_user=2,authors=3,login=1,ingest=2"
+PLATFORMS = ("linkedin", "instagram", "facebook", "telegram")
+TOPICS = (
+    "О важности планирования",
+    "Как я выбираю книги",
+    "Почему команда важнее процессов",
+    "Удалённая работа: итоги года",
+    "Ошибки, на которых я научился",
+    "Зачем вести дневник решений",
+)
+PASSWORD = "loadtest-password"
+# Одновременных регистраций при подготовке: больше очереди bcrypt
+# (PASSWORD_HASH_MAX_QUEUE) воркер отвечает 503
+REGISTER_CONCURRENCY = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест GhostPen API с mock LLM")
+    parser.add_argument("--target", help="URL запущенного API (по умолчанию API и mock LLM запускаются)")
+    parser.add_argument("--rps", type=float, default=10.0, help="Запросов в секунду (все сценарии)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Длительность замера, сек")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Прогрев без учёта в отчёте, сек")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Веса сценариев: name=weight,...")
+    parser.add_argument("--users", type=int, default=20, help="Пользователей для login/ingest/generate_user")
+    parser.add_argument("--max-in-flight", type=int, default=1000,
+                        help="Предел одновременных запросов клиента (сверх — отбрасываются)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Таймаут запроса, сек")
+    parser.add_argument("--json", dest="json_path", help="Сохранить результаты в JSON")
+    # Запуск API
+    parser.add_argument("--workers", type=int, default=1, help="Воркеров uvicorn")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="Стоимость bcrypt")
+    parser.add_argument("--rate-limit", action="store_true", help="Не отключать RATE_LIMIT_ENABLED")
+    # Mock LLM
+    parser.add_argument("--latency", default="lognormal:800:0.5",
+                        help="Время до первого токена, мс (см. mock_llm_server.py)")
+    parser.add_argument("--token-interval", type=float, default=20.0, help="Мс между чанками ответа LLM")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов LLM 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Доля ответов LLM 429")
+    parser.add_argument("--stream", action="store_true", help="API получает ответ LLM потоком")
+    return parser.parse_args()
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'generate=4,authors=1' → {'generate': 4.0, 'authors': 1.0}."""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Неизвестный сценарий: {name} (доступны: {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_http(url: str, timeout: float = 30.0) -> None:
+    """Ждёт, пока url начнёт отвечать."""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                response.read()
+                return
+        except Exception:
+            if time.time() > deadline:
+                raise RuntimeError(f"{url} не отвечает за {timeout} с")
+            time.sleep(0.2)
+
+
+class Environment:
+    """Процессы mock LLM и API на временной базе."""
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = Path(tempfile.mkdtemp(prefix="ghostpen-loadtest-"))
+        self.processes: List[subprocess.Popen] = []
+        self.mock_url: Optional[str] = None
+        self.api_url: Optional[str] = None
+
+    def _spawn(self, name: str, command: List[str], env: Dict[str, str]) -> None:
+        log = open(self.workdir / f"{name}.log", "w")
+        self.processes.append(subprocess.Popen(
+            command, cwd=API_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+        ))
+
+    def start(self) -> str:
+        args = self.args
+        mock_port, api_port = free_port(), free_port()
+        self._spawn("mock_llm", [
+            sys.executable, "mock_llm_server.py", "--port", str(mock_port),
+            "--latency", args.latency, "--token-interval", str(args.token_interval),
+            "--error-rate", str(args.error_rate), "--rate-limit-rate", str(args.rate_limit_rate),
+        ], dict(os.environ))
+        self.mock_url = f"http://127.0.0.1:{mock_port}"
+        wait_http(f"{self.mock_url}/v1/models")
+
+        env = dict(os.environ)
+        env.update({
+            "DATABASE_PATH": str(self.workdir / "loadtest.db"),
+            "RATE_LIMIT_SQLITE_PATH": str(self.workdir / "ratelimit.db"),
+            "OPENAI_API_KEY": "sk-loadtest",
+            "OPENAI_BASE_URL": f"{self.mock_url}/v1",
+            "OPENAI_STREAM": "true" if args.stream else "false",
+            "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+            "LOG_LEVEL": "WARNING",
+        })
+        if not args.rate_limit:
+            env["RATE_LIMIT_ENABLED"] = "false"
+        self._spawn("api", [
+            sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+            "--port", str(api_port), "--workers", str(args.workers), "--log-level", "warning",
+        ], env)
+        self.api_url = f"http://127.0.0.1:{api_port}"
+        wait_http(f"{self.api_url}/api/health", timeout=60)
+        return self.api_url
+
+    def mock_stats(self) -> Optional[dict]:
+        if self.mock_url is None:
+            return None
+        with urllib.request.urlopen(f"{self.mock_url}/stats", timeout=5) as response:
+            return json.loads(response.read())
+
+    def stop(self) -> None:
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+class LoadContext:
+    """Данные, подготовленные до замера: авторы, пользователи, тексты постов."""
+
+    def __init__(self):
+        self.author_ids: List[str] = []
+        self.users: List[dict] = []  # {"email", "user_id", "token"}
+        self.profile_user_ids: List[str] = []
+        self.posts: List[str] = []
+
+
+async def prepare(client, users: int) -> LoadContext:
+    """Регистрирует пользователей и строит им профили (параллельно, до замера)."""
+    context = LoadContext()
+    with open(DATASET_PATH, encoding="utf-8") as f:
+        for profile in json.load(f)["profiles"]:
+            context.author_ids.append(profile["author_id"])
+            context.posts.extend(profile.get("sample_posts", []))
+
+    run_id = f"{random.getrandbits(32):08x}"
+    register_slots = asyncio.Semaphore(REGISTER_CONCURRENCY)
+
+    async def register(i: int) -> None:
+        email = f"load{i}-{run_id}@example.com"
+        async with register_slots:
+            response = await client.post("/api/auth/register", json={
+                "email": email, "password": PASSWORD, "name": f"Load {i}"
+            })
+        response.raise_for_status()
+        data = response.json()
+        context.users.append({"email": email, "user_id": data["user_id"], "token": data["access_token"]})
+
+        # Профиль для generate_user: посты из демо-датасета
+        response = await client.post("/api/users", json={"name": f"Load {i}"})
+        response.raise_for_status()
+        user_id = response.json()["user_id"]
+        posts = random.sample(context.posts, min(12, len(context.posts)))
+        response = await client.post(
+            f"/api/users/{user_id}/posts/bulk?rebuild_profile=true",
+            json=[{"platform": random.choice(PLATFORMS), "content": post} for post in posts]
+        )
+        response.raise_for_status()
+        context.profile_user_ids.append(user_id)
+
+    await asyncio.gather(*(register(i) for i in range(users)))
+    return context
+
+
+# === Сценарии: (маршрут для отчёта, корутина запроса) ===
+
+def _generate_body(author_key: str, author_value: str) -> dict:
+    return {author_key: author_value, "social_network": random.choice(PLATFORMS),
+            "topic": random.choice(TOPICS)}
+
+
+async def scenario_generate(client, context: LoadContext):
+    user = random.choice(context.users)
+    return await client.post(
+        "/api/generate", json=_generate_body("author_id", random.choice(context.author_ids)),
+        headers={"Authorization": f"Bearer {user['token']}"}
+    )
+
+
+async def scenario_generate_user(client, context: LoadContext):
+    return await client.post(
+        "/api/generate", json=_generate_body("user_id", random.choice(context.profile_user_ids))
+    )
+
+
+async def scenario_authors(client, context: LoadContext):
+    return await client.get("/api/authors")
+
+
+async def scenario_login(client, context: LoadContext):
+    user = random.choice(context.users)
+    return await client.post("/api/auth/login", json={"email": user["email"], "password": PASSWORD})
+
+
+async def scenario_ingest(client, context: LoadContext):
+    return await client.post(
+        f"/api/users/{random.choice(context.profile_user_ids)}/posts",
+        json={"platform": random.choice(PLATFORMS), "content": random.choice(context.posts)}
+    )
+
+
+SCENARIOS = {
+    "generate": ("POST /api/generate (author)", scenario_generate),
+    "generate_user": ("POST /api/generate (user)", scenario_generate_user),
+    "authors": ("GET /api/authors", scenario_authors),
+    "login": ("POST /api/auth/login", scenario_login),
+    "ingest": ("POST /api/users/{id}/posts", scenario_ingest),
+}
+
+
+class RouteStats:
+    """Задержки и коды ответов одного маршрута."""
+
+    __slots__ = ("latencies", "statuses")
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+
+    def record(self, latency_ms: float, status: str) -> None:
+        self.latencies.append(latency_ms)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self, duration: float) -> dict:
+        ok = sum(count for status, count in self.statuses.items() if status.startswith("2"))
+        result = {
+            "requests": len(self.latencies),
+            "ok": ok,
+            "throughput_rps": round(ok / duration, 2),
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+        if self.latencies:
+            result.update({
+                "p50_ms": round(percentile(self.latencies, 0.50), 1),
+                "p95_ms": round(percentile(self.latencies, 0.95), 1),
+                "p99_ms": round(percentile(self.latencies, 0.99), 1),
+                "max_ms": round(max(self.latencies), 1),
+            })
+        return result
+
+
+async def run_load(client, context: LoadContext, args) -> Dict[str, RouteStats]:
+    """Открытый поток запросов: пуассоновские прибытия с частотой --rps."""
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    stats = {SCENARIOS[name][0]: RouteStats() for name in names}
+    dropped = RouteStats()
+    semaphore = asyncio.Semaphore(args.max_in_flight)
+    tasks = set()
+
+    start = time.perf_counter()
+    measure_from = start + args.warmup
+    stop_at = measure_from + args.duration
+
+    async def fire(name: str, scheduled: float) -> None:
+        route, scenario = SCENARIOS[name]
+        try:
+            response = await scenario(client, context)
+            status = str(response.status_code)
+        except Exception as e:
+            status = type(e).__name__
+        finally:
+            semaphore.release()
+        if scheduled >= measure_from:
+            stats[route].record((time.perf_counter() - scheduled) * 1000, status)
+
+    scheduled = start
+    while True:
+        scheduled += random.expovariate(args.rps)
+        if scheduled >= stop_at:
+            break
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        name = random.choices(names, weights)[0]
+        if semaphore.locked():
+            # Клиент упёрся в свой предел: запрос не отправлен
+            if scheduled >= measure_from:
+                dropped.record(0.0, "client_dropped")
+            continue
+        await semaphore.acquire()
+        task = asyncio.create_task(fire(name, scheduled))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    if dropped.latencies:
+        stats["(client dropped)"] = dropped
+    return stats
+
+
+def print_report(stats: Dict[str, RouteStats], duration: float, mock_stats: Optional[dict]) -> dict:
+    summaries = {route: route_stats.summary(duration) for route, route_stats in stats.items()}
+    print(f"\n{'Маршрут':<30} {'запр.':>6} {'ок/с':>7} {'p50, мс':>9} {'p95, мс':>9} "
+          f"{'p99, мс':>9} {'max, мс':>9}  коды")
+    for route, summary in summaries.items():
+        if "p50_ms" not in summary:
+            continue
+        codes = ", ".join(f"{status}×{count}" for status, count in summary["statuses"].items())
+        print(f"{route:<30} {summary['requests']:>6} {summary['throughput_rps']:>7.2f} "
+              f"{summary['p50_ms']:>9.1f} {summary['p95_ms']:>9.1f} {summary['p99_ms']:>9.1f} "
+              f"{summary['max_ms']:>9.1f}  {codes}")
+    total_ok = sum(summary["ok"] for summary in summaries.values())
+    print(f"\nВсего: {total_ok / duration:.2f} успешных запросов/с за {duration:.0f} с")
+    if mock_stats:
+        print(f"Mock LLM: {mock_stats}")
+    return summaries
+
+
+async def main_async(args) -> int:
+    import httpx
+
+    environment = None
+    base_url = args.target
+    try:
+        if base_url is None:
+            environment = Environment(args)
+            print(f"🚀 Запуск mock LLM и API ({args.workers} воркер(ов)), каталог {environment.workdir}")
+            base_url = environment.start()
+
+        limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=100)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            print(f"👥 Подготовка {args.users} пользователей...")
+            context = await prepare(client, args.users)
+            print(f"📈 {args.rps} запросов/с, смесь {args.mix}, "
+                  f"прогрев {args.warmup} с, замер {args.duration} с")
+            stats = await run_load(client, context, args)
+
+        summaries = print_report(stats, args.duration, environment.mock_stats() if environment else None)
+        if args.json_path:
+            with open(args.json_path, "w", encoding="utf-8") as f:
+                json.dump({"args": vars(args), "routes": summaries}, f, ensure_ascii=False, indent=2)
+            print(f"💾 Результаты: {args.json_path}")
+        return 0
+    finally:
+        if environment is not None:
+            environment.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main_async(parse_args())))
@@ -3,25 +3,40 @@
 Structured Logging для GhostPen API.
 
 JSON логирование для production-ready приложения.
+
+Записи не пишутся в stdout из обработчика запроса: QueueHandler кладёт
+их в очередь, а форматирование и вывод выполняет фоновый поток
+(QueueListener). DEBUG-записи сэмплируются (LOG_DEBUG_SAMPLE_RATE).
 """
 
+import atexit
 import json
 import logging
+import logging.handlers
+import queue
+import random
 import sys
-from datetime import datetime
+import time
 from typing import Any, Dict, Optional
 from pathlib import Path
 
 from config import settings
 
 
+# Стандартные атрибуты LogRecord: всё остальное пришло через extra
+_RECORD_ATTRS = frozenset(
+    logging.LogRecord("", 0, "", 0, "", None, None).__dict__
+) | {"message", "asctime"}
+
+
 class JSONFormatter(logging.Formatter):
     """JSON форматтер для логов."""
-    
+
     def format(self, record: logging.LogRecord) -> str:
         """Форматирует лог в JSON."""
         log_data = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+                         + f".{int(record.msecs):03d}Z",
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -29,37 +44,24 @@ class JSONFormatter(logging.Formatter):
             "function": record.funcName,
             "line": record.lineno,
         }
-        
+
         # Добавляем exception info, если есть
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
-        
-        # Добавляем дополнительные поля
-        if hasattr(record, "request_id"):
-            log_data["request_id"] = record.request_id
-        
-        if hasattr(record, "user_id"):
-            log_data["user_id"] = record.user_id
-        
-        if hasattr(record, "duration_ms"):
-            log_data["duration_ms"] = record.duration_ms
-        
-        # Добавляем все дополнительные поля
+        elif record.exc_text:
+            log_data["exception"] = record.exc_text
+
+        # Дополнительные поля (request_id, user_id, duration_ms, метрики...)
         for key, value in record.__dict__.items():
-            if key not in [
-                "name", "msg", "args", "created", "filename", "funcName",
-                "levelname", "levelno", "lineno", "module", "msecs",
-                "message", "pathname", "process", "processName", "relativeCreated",
-                "thread", "threadName", "exc_info", "exc_text", "stack_info"
-            ]:
+            if key not in _RECORD_ATTRS:
                 log_data[key] = value
-        
-        return json.dumps(log_data, ensure_ascii=False)
+
+        return json.dumps(log_data, ensure_ascii=False, default=str)
 
 
 class TextFormatter(logging.Formatter):
     """Текстовый форматтер для логов (для development)."""
-    
+
     def __init__(self):
         super().__init__(
             fmt="%(asctime)s [%(levelname)s] %(name)s:%(lineno)d - %(message)s",
@@ -67,41 +69,125 @@ class TextFormatter(logging.Formatter):
         )
 
 
+class DebugSamplingFilter(logging.Filter):
+    """Пропускает только долю DEBUG-записей; остальные уровни — все."""
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.sample_rate >= 1.0:
+            return True
+        return random.random() < self.sample_rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler с ограниченной очередью.
+
+    Если фоновый поток не успевает, запись отбрасывается (и считается),
+    а не блокирует обработчик запроса.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Только подставляем аргументы; JSON собирает фоновый поток.
+        # Запись не копируется: других обработчиков у root logger нет
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _DrainingQueueListener(logging.handlers.QueueListener):
+    """QueueListener, который при остановке дожидается места в полной очереди."""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+
+
 def setup_logging():
     """Настраивает логирование."""
+    global _listener, _queue_handler
+
     # Определяем форматтер
     if settings.LOG_FORMAT == "json":
         formatter = JSONFormatter()
     else:
         formatter = TextFormatter()
-    
+
     # Настраиваем root logger
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, settings.LOG_LEVEL.upper()))
-    
-    # Удаляем существующие handlers
+
+    # Удаляем существующие handlers (и останавливаем прежний фоновый поток)
+    stop_logging()
     root_logger.handlers = []
-    
+
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
-    
+    handlers = [console_handler]
+
     # File handler (опционально, для production)
     if settings.ENVIRONMENT == "production":
         log_dir = Path("logs")
         log_dir.mkdir(exist_ok=True)
         file_handler = logging.FileHandler(log_dir / "ghostpen.log")
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
-    
+        handlers.append(file_handler)
+
+    # Обработчики запросов только кладут запись в очередь
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(DebugSamplingFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+    root_logger.addHandler(_queue_handler)
+    _listener = _DrainingQueueListener(
+        _queue_handler.queue, *handlers, respect_handler_level=True
+    )
+    _listener.start()
+
     # Настраиваем уровни для внешних библиотек
     logging.getLogger("uvicorn").setLevel(logging.WARNING)
     logging.getLogger("fastapi").setLevel(logging.INFO)
-    
+
     return root_logger
 
 
+def stop_logging() -> None:
+    """Дописывает записи из очереди и останавливает фоновый поток."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> Dict[str, Any]:
+    """Заполненность очереди логов и число отброшенных записей."""
+    if _queue_handler is None:
+        return {}
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "max_queue": _queue_handler.queue.maxsize,
+        "dropped": _queue_handler.dropped,
+    }
+
+
 def get_logger(name: str) -> logging.Logger:
     """Получить logger с указанным именем."""
     return logging.getLogger(name)
@@ -109,4 +195,4 @@ def get_logger(name: str) -> logging.Logger:
 
 # Инициализируем логирование при импорте
 logger = setup_logging()
-
+atexit.register(stop_logging)
@@ -5,30 +5,24 @@ FastAPI Backend для GhostPen.
 Предоставляет REST API для генерации постов в авторском стиле.
 """
 
+import base64
+import hashlib
+import logging
+import math
 import time
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
-
-# Rate Limiting (опционально)
-try:
-    from slowapi import Limiter, _rate_limit_exceeded_handler
-    from slowapi.util import get_remote_address
-    from slowapi.errors import RateLimitExceeded
-    RATE_LIMIT_AVAILABLE = True
-except ImportError:
-    RATE_LIMIT_AVAILABLE = False
-    print("⚠️ [RATE_LIMIT] slowapi не установлен, rate limiting отключен")
+from fastapi.responses import FileResponse, JSONResponse, Response
+from pydantic import BaseModel, Field, ValidationError
 
 # Импортируем новые модули
 try:
     from config import settings
-    from logger import get_logger, setup_logging
+    from logger import get_logger, setup_logging, logging_stats
     logger = setup_logging()
     logger.info("🚀 GhostPen API starting...")
 except Exception as e:
@@ -47,8 +41,21 @@ sys.path.insert(0, str(scripts_path))
 
 from ghostpen_generator import GhostPenGenerator
 from style_scorer import StyleScorer
-from database import Database
+from database import create_database
+from async_database import AsyncDatabase
+from cached_database import CachedDatabase
+from http_responses import FastJSONResponse, CompressionMiddleware, dumps
+from auth import get_optional_user, password_hasher, token_cache
 from style_profiler import StyleProfiler
+from profile_store import ProfileStore
+from bm25_index import BM25Index
+from lru_cache import LRUCache
+from rate_limiter import RateLimiter, create_bucket_store, estimate_tokens
+import metrics
+from metrics import MetricsMiddleware, TimedDatabase
+import tracing
+from tracing import TracingMiddleware, span
+from profiling import RequestProfiler, profile_path, profiling_requested, require_admin
 from auth_routes import router as auth_router
 import json
 import os
@@ -60,14 +67,16 @@ try:
     app = FastAPI(
         title=settings.API_TITLE,
         description=settings.API_DESCRIPTION,
-        version=settings.API_VERSION
+        version=settings.API_VERSION,
+        default_response_class=FastJSONResponse
     )
     logger.info(f"✅ FastAPI app initialized: {settings.API_TITLE} v{settings.API_VERSION}")
 except:
     app = FastAPI(
         title="GhostPen API",
         description="API для генерации постов в авторском стиле",
-        version="1.1.0"
+        version="1.1.0",
+        default_response_class=FastJSONResponse
     )
 
 # Глобальный обработчик ошибок
@@ -95,19 +104,44 @@ async def global_exception_handler(request: Request, exc: Exception):
         }
     )
 
-# Rate Limiting (опционально)
-if RATE_LIMIT_AVAILABLE:
+# Rate limiting генерации: token bucket на пользователя, стоимость — токены LLM
+try:
+    RATE_LIMIT_ENABLED = settings.RATE_LIMIT_ENABLED
+    RATE_LIMIT_PER_MINUTE = settings.RATE_LIMIT_PER_MINUTE
+    RATE_LIMIT_TOKENS_PER_MINUTE = settings.RATE_LIMIT_TOKENS_PER_MINUTE
+    RATE_LIMIT_BURST_TOKENS = settings.RATE_LIMIT_BURST_TOKENS
+    RATE_LIMIT_BACKEND = settings.RATE_LIMIT_BACKEND
+    RATE_LIMIT_SQLITE_PATH = settings.RATE_LIMIT_SQLITE_PATH
+    RATE_LIMIT_REDIS_URL = settings.RATE_LIMIT_REDIS_URL
+except:
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_PER_MINUTE = 10
+    RATE_LIMIT_TOKENS_PER_MINUTE = 20_000
+    RATE_LIMIT_BURST_TOKENS = 40_000
+    RATE_LIMIT_BACKEND = "memory"
+    RATE_LIMIT_SQLITE_PATH = "ratelimit.db"
+    RATE_LIMIT_REDIS_URL = None
+
+request_limiter: Optional[RateLimiter] = None
+token_limiter: Optional[RateLimiter] = None
+if RATE_LIMIT_ENABLED:
     try:
-        limiter = Limiter(key_func=get_remote_address)
-        app.state.limiter = limiter
-        app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-        RATE_LIMIT_ENABLED = True
-        print("✅ [RATE_LIMIT] Rate limiting активирован (10 запросов/минуту)")
+        rate_limit_store = create_bucket_store(
+            RATE_LIMIT_BACKEND, RATE_LIMIT_SQLITE_PATH, RATE_LIMIT_REDIS_URL
+        )
+        request_limiter = RateLimiter(
+            rate_limit_store, "requests", RATE_LIMIT_PER_MINUTE, RATE_LIMIT_PER_MINUTE
+        )
+        token_limiter = RateLimiter(
+            rate_limit_store, "tokens", RATE_LIMIT_BURST_TOKENS, RATE_LIMIT_TOKENS_PER_MINUTE
+        )
+        print(
+            f"✅ [RATE_LIMIT] Rate limiting активирован ({RATE_LIMIT_BACKEND}): "
+            f"{RATE_LIMIT_PER_MINUTE} генераций и {RATE_LIMIT_TOKENS_PER_MINUTE} токенов в минуту"
+        )
     except Exception as e:
         print(f"⚠️ [RATE_LIMIT] Rate limiting не активирован: {e}")
         RATE_LIMIT_ENABLED = False
-else:
-    RATE_LIMIT_ENABLED = False
 
 # CORS для фронтенда
 try:
@@ -125,35 +159,174 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Сжатие ответов (brotli/gzip по Accept-Encoding) больше порога
+try:
+    compression_min_bytes = settings.COMPRESSION_MIN_BYTES
+except:
+    compression_min_bytes = 1024
+app.add_middleware(CompressionMiddleware, minimum_size=compression_min_bytes)
+
+# Prometheus метрики (GET /metrics); middleware внешний — время включает сжатие
+try:
+    METRICS_ENABLED = settings.METRICS_ENABLED
+except:
+    METRICS_ENABLED = True
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Трассировка: span на запрос (внешний middleware), ID трассы в каждой записи лога
+try:
+    TRACE_EXPORTER = settings.TRACE_EXPORTER
+    TRACE_FILE = settings.TRACE_FILE
+    TRACE_OTLP_ENDPOINT = settings.TRACE_OTLP_ENDPOINT
+except:
+    TRACE_EXPORTER = "none"
+    TRACE_FILE = "traces.jsonl"
+    TRACE_OTLP_ENDPOINT = "http://localhost:4318/v1/traces"
+tracing.install_log_context()
+app.add_middleware(TracingMiddleware)
+
 # Загружаем профили при старте
 PROFILES_PATH = Path(__file__).parent.parent / "dataset" / "author_profiles.json"
+DATASET_PATH = Path(__file__).parent.parent / "dataset" / "dataset.json"
 generator: Optional[GhostPenGenerator] = None
+# Генератор персональных профилей: один на процесс, префиксы и промпты переиспользуются
+user_generator: Optional[GhostPenGenerator] = None
 scorer: Optional[StyleScorer] = None
-db: Optional[Database] = None
+db: Optional[CachedDatabase] = None
 profiler: Optional[StyleProfiler] = None
+profile_store: Optional[ProfileStore] = None
 
-# Глобальный экземпляр Database (singleton)
+# Глобальный экземпляр БД: PostgreSQL при DATABASE_URL=postgresql://..., иначе SQLite
 try:
     db_path = settings.DATABASE_PATH
+    database_url = settings.DATABASE_URL
     if 'logger' in globals():
-        logger.info(f"📦 Database path: {db_path}")
+        logger.info(f"📦 Database: {'PostgreSQL' if database_url else db_path}")
 except:
     db_path = "ghostpen.db"
+    database_url = None
     if 'logger' in globals():
         logger.warning(f"⚠️ Using default database path: {db_path}")
 
-db = Database(db_path)
+try:
+    db_workers = settings.DATABASE_WORKERS
+    db_pool_size = settings.DATABASE_POOL_SIZE
+except:
+    db_workers = 4
+    db_pool_size = 10
+
+try:
+    USER_CACHE_MAX_ENTRIES = settings.USER_CACHE_MAX_ENTRIES
+    PROFILE_CACHE_MAX_BYTES = settings.PROFILE_CACHE_MAX_BYTES
+except:
+    USER_CACHE_MAX_ENTRIES = 10_000
+    PROFILE_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Время и span каждого метода БД (промахи кэша и запись)
+database_backend = TimedDatabase(create_database(database_url, db_path, max_size=db_pool_size))
+
+# Пользователи и профили читаются через LRU кэш, записи его сбрасывают
+db = CachedDatabase(
+    database_backend,
+    max_users=USER_CACHE_MAX_ENTRIES,
+    profile_cache_bytes=PROFILE_CACHE_MAX_BYTES
+)
+
+# Async-фасад: обработчики не блокируют event loop на запросах к БД
+adb = AsyncDatabase(db, max_workers=db_workers)
+
+try:
+    PIPELINE_TRACK_ALLOCATIONS = settings.PIPELINE_TRACK_ALLOCATIONS
+    PROMPT_CACHE_MAX_BYTES = settings.PROMPT_CACHE_MAX_BYTES
+    PROFILES_RELOAD_INTERVAL = settings.PROFILES_RELOAD_INTERVAL
+    USER_POST_INDEX_MAX_POSTS = settings.USER_POST_INDEX_MAX_POSTS
+    BULK_IMPORT_MAX_POSTS = settings.BULK_IMPORT_MAX_POSTS
+    OPENAI_BASE_URL = settings.OPENAI_BASE_URL
+    OPENAI_STREAM = settings.OPENAI_STREAM
+except:
+    PIPELINE_TRACK_ALLOCATIONS = False
+    PROMPT_CACHE_MAX_BYTES = 4 * 1024 * 1024
+    PROFILES_RELOAD_INTERVAL = 2.0
+    USER_POST_INDEX_MAX_POSTS = 200_000
+    BULK_IMPORT_MAX_POSTS = 10_000
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+    OPENAI_STREAM = os.getenv("OPENAI_STREAM", "false").lower() == "true"
+
+def _forget_user_prompts(user_id: str, index: BM25Index) -> None:
+    """Вытесненный пользователь уходит и из генератора (профиль, индекс, префиксы)."""
+    if user_generator is not None:
+        user_generator.prompt_builder.remove_profile(f"user_{user_id}")
+
 
-def get_db() -> Database:
+# BM25 индексы постов пользователей (для подбора примеров по теме).
+# Бюджет LRU считается в постах: индексы активных пользователей живут в памяти,
+# и только их профили держит общий генератор пользователей
+user_post_indexes = LRUCache(
+    USER_POST_INDEX_MAX_POSTS, sizeof=lambda index: len(index) + 1, on_evict=_forget_user_prompts
+)
+
+
+async def get_user_post_index(user_id: str) -> BM25Index:
+    """Возвращает BM25 индекс постов пользователя (строится один раз)."""
+    index = user_post_indexes.get(user_id)
+    if index is None:
+        posts = await adb.get_user_posts(user_id, columns=('id', 'content'))
+        index = BM25Index()
+        for post in posts:
+            index.add(post['id'], post['content'])
+        user_post_indexes.put(user_id, index)
+    return index
+
+
+def _export_stage_timing(timing: dict) -> None:
+    """Экспортирует тайминг этапа генерации как метрику (гистограмма и structured log)."""
+    metrics.stage_duration.observe(timing["duration_ms"] / 1000, stage=timing["stage"])
+    logger.info(
+        f"pipeline stage {timing['stage']}: {timing['duration_ms']} ms",
+        extra={
+            "metric": "generation_stage_duration_ms",
+            "stage": timing["stage"],
+            "duration_ms": timing["duration_ms"],
+            "allocated_kb": timing["allocated_kb"],
+        }
+    )
+
+
+def create_generator(
+    profiles_path: Optional[Path],
+    api_key: Optional[str],
+    store: Optional[ProfileStore] = None
+) -> GhostPenGenerator:
+    """Создаёт генератор с экспортом таймингов этапов."""
+    new_generator = GhostPenGenerator(
+        profiles_path,
+        api_key,
+        llm_base_url=OPENAI_BASE_URL,
+        llm_stream=OPENAI_STREAM,
+        track_allocations=PIPELINE_TRACK_ALLOCATIONS,
+        prompt_cache_bytes=PROMPT_CACHE_MAX_BYTES,
+        profile_store=store
+    )
+    new_generator.pipeline.add_listener(_export_stage_timing)
+    return new_generator
+
+def get_db() -> CachedDatabase:
     """Dependency для получения Database экземпляра."""
     return db
 
+
+def get_async_db() -> AsyncDatabase:
+    """Dependency для получения AsyncDatabase экземпляра."""
+    return adb
+
 # Импортируем auth_routes после создания get_db
 from auth_routes import router as auth_router
 
 # Переопределяем get_db в auth_routes модуле
 import auth_routes as auth_routes_module
 auth_routes_module.get_db = get_db
+auth_routes_module.get_async_db = get_async_db
 
 # Подключаем auth routes
 app.include_router(auth_router)
@@ -161,14 +334,30 @@ app.include_router(auth_router)
 @app.on_event("startup")
 async def startup_event():
     """Инициализация при старте сервера."""
-    global generator, scorer, profiler
+    global generator, user_generator, scorer, profiler, profile_store
     
     # БД уже инициализирована выше (singleton)
     logger.info("✅ Database initialized")
     
+    if TRACE_EXPORTER == "jsonl":
+        tracing.configure(tracing.JsonlSpanExporter(TRACE_FILE))
+    elif TRACE_EXPORTER == "otlp":
+        tracing.configure(tracing.OTLPHttpSpanExporter(TRACE_OTLP_ENDPOINT))
+    if TRACE_EXPORTER != "none":
+        logger.info(f"✅ Tracing export: {TRACE_EXPORTER}")
+    
     # Инициализируем StyleProfiler
     profiler = StyleProfiler()
     
+    # Хранилище демо-профилей: файл перечитывается в фоне при изменении,
+    # генератор и /api/authors читают один и тот же неизменяемый снимок
+    profile_store = ProfileStore(PROFILES_PATH, poll_interval=PROFILES_RELOAD_INTERVAL)
+    profile_store.subscribe(_rebuild_demo_catalog)
+    profile_store.start()
+    
+    # Профили пользователей добавляются в него из кэша БД при генерации
+    user_generator = create_generator(None, os.getenv("OPENAI_API_KEY"))
+    
     if not PROFILES_PATH.exists():
         print(f"ℹ️  Демо-профили не найдены: {PROFILES_PATH}")
         print(f"   Система будет работать только с персональными профилями пользователей из БД")
@@ -176,11 +365,33 @@ async def startup_event():
         # Инициализируем генератор для демо-авторов (опционально)
         # Для реальной работы передайте OPENAI_API_KEY через переменную окружения
         api_key = os.getenv("OPENAI_API_KEY")  # None = mock режим
-        generator = GhostPenGenerator(PROFILES_PATH, api_key)
+        generator = create_generator(None, api_key, store=profile_store)
         scorer = StyleScorer()
+        # Все посты демо-авторов индексируем для подбора примеров по теме
+        if DATASET_PATH.exists():
+            indexed = generator.prompt_builder.index_dataset(DATASET_PATH)
+            logger.info(f"✅ Post indexes built for {indexed} demo authors")
+        # Префиксы промптов (всё, кроме темы) компилируем заранее и после каждой перезагрузки
+        profile_store.subscribe(lambda snapshot: generator.prompt_builder.precompile())
+        logger.info(f"✅ Prompt prefixes precompiled for {len(profile_store.snapshot)} authors")
         print(f"✅ GhostPen API запущен. Демо-профили загружены из {PROFILES_PATH}")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Остановка фоновых задач."""
+    if profile_store is not None:
+        profile_store.stop()
+    password_hasher.close()
+    tracing.shutdown()
+    if RATE_LIMIT_ENABLED:
+        request_limiter.close()
+        token_limiter.close()
+        rate_limit_store.close()
+    adb.close()
+    db.close()
+
+
 # Pydantic модели для запросов/ответов
 class GenerateRequest(BaseModel):
     author_id: Optional[str] = Field(None, description="ID автора (для демо) или user_id")
@@ -190,11 +401,19 @@ class GenerateRequest(BaseModel):
     sample_posts: Optional[list[str]] = Field(default=[], description="Примеры постов (опционально)")
 
 
+class StageTiming(BaseModel):
+    stage: str
+    duration_ms: float
+    allocated_kb: Optional[float] = None
+
+
 class DebugInfo(BaseModel):
     target_length: int
     model_version: str
     processing_time_ms: int
     prompt_tokens: int
+    stage_timings: List[StageTiming] = []
+    profile: Optional[dict] = None
 
 
 class GenerateResponse(BaseModel):
@@ -235,13 +454,33 @@ async def health():
     # Проверка БД
     try:
         if db:
-            test_user = db.get_user("test")
+            # Мимо кэша: проверяем саму БД
+            test_user = await adb.run(db.backend.get_user, "test")
             health_status["services"]["database"] = True
     except Exception as e:
         health_status["services"]["database"] = False
         health_status["database_error"] = str(e)
         health_status["status"] = "degraded"
     
+    health_status["password_hashing"] = password_hasher.stats()
+    if 'logging_stats' in globals():
+        health_status["logging"] = logging_stats()
+    health_status["tracing"] = tracing.exporter_stats()
+    if RATE_LIMIT_ENABLED:
+        health_status["rate_limit"] = {
+            "backend": RATE_LIMIT_BACKEND,
+            "requests": request_limiter.stats(),
+            "tokens": token_limiter.stats()
+        }
+    
+    # Статистика кэшей
+    health_status["caches"] = db.cache_stats()
+    health_status["caches"]["tokens"] = token_cache.stats()
+    if generator is not None:
+        health_status["caches"]["prompts"] = generator.prompt_builder.cache_stats()
+    if user_generator is not None:
+        health_status["caches"]["user_prompts"] = user_generator.prompt_builder.cache_stats()
+    
     # Проверка OpenAI API (если настроен)
     try:
         api_key = os.getenv("OPENAI_API_KEY")
@@ -252,150 +491,255 @@ async def health():
     return health_status
 
 
-@app.get("/api/authors")
-async def get_authors(user_id: Optional[str] = None):
-    """Получить список доступных авторов."""
-    print(f"📥 [API] Запрос авторов, user_id: {user_id}")
-    authors = []
-    
-    # Добавляем демо-авторов (опционально, только если файл существует)
-    if PROFILES_PATH.exists():
-        # Маппинг имен и профессий для авторов
-        author_info = {
-            "person_01": {"name": "Айдар Нұрғалиев", "profession": "CEO & Основатель"},
-            "person_02": {"name": "Асылбек Қасымов", "profession": "Маркетолог"},
-            "person_03": {"name": "Ерлан Сағындықов", "profession": "Backend Разработчик"},
-            "person_04": {"name": "Жанар Әбілқасымова", "profession": "UI/UX Дизайнер"},
-            "person_05": {"name": "Нұрлан Байжанов", "profession": "Предприниматель"},
-            "person_06": {"name": "Алма Төлеуова", "profession": "Психолог"},
-            "person_07": {"name": "Данияр Мұхамеджанов", "profession": "Digital Маркетолог"},
-            "person_08": {"name": "Руслан Петров", "profession": "Rust Инженер"},
-            "person_09": {"name": "Анна Смирнова", "profession": "Визуальный Дизайнер"},
-            "person_10": {"name": "Дмитрий Иванов", "profession": "Бизнес-Консультант"},
-        }
-        
-        with open(PROFILES_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+def _collect_cache_metrics() -> None:
+    """Обновляет gauge кэшей перед выводом /metrics."""
+    for name, stats in db.cache_stats().items():
+        metrics.observe_cache_stats(name, stats)
+    metrics.observe_cache_stats("tokens", token_cache.stats())
+    metrics.observe_cache_stats("post_indexes", user_post_indexes.stats())
+    if generator is not None:
+        metrics.observe_cache_stats("prompts", generator.prompt_builder.cache_stats())
+    if user_generator is not None:
+        metrics.observe_cache_stats("user_prompts", user_generator.prompt_builder.cache_stats())
+
+
+metrics.registry.add_collector(_collect_cache_metrics)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Метрики в текстовом формате Prometheus."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Метрики отключены")
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# Имена и профессии демо-авторов
+DEMO_AUTHOR_INFO = {
+    "person_01": {"name": "Айдар Нұрғалиев", "profession": "CEO & Основатель"},
+    "person_02": {"name": "Асылбек Қасымов", "profession": "Маркетолог"},
+    "person_03": {"name": "Ерлан Сағындықов", "profession": "Backend Разработчик"},
+    "person_04": {"name": "Жанар Әбілқасымова", "profession": "UI/UX Дизайнер"},
+    "person_05": {"name": "Нұрлан Байжанов", "profession": "Предприниматель"},
+    "person_06": {"name": "Алма Төлеуова", "profession": "Психолог"},
+    "person_07": {"name": "Данияр Мұхамеджанов", "profession": "Digital Маркетолог"},
+    "person_08": {"name": "Руслан Петров", "profession": "Rust Инженер"},
+    "person_09": {"name": "Анна Смирнова", "profession": "Визуальный Дизайнер"},
+    "person_10": {"name": "Дмитрий Иванов", "profession": "Бизнес-Консультант"},
+}
+
+
+class DemoCatalog:
+    """Каталог демо-авторов, заранее сериализованный для одного снимка профилей."""
+
+    __slots__ = ("snapshot_version", "authors", "items_json", "digest", "etag")
+
+    def __init__(self, snapshot=None):
+        self.snapshot_version = snapshot.version if snapshot is not None else "empty"
+        self.authors = [_demo_author_entry(profile) for profile in (snapshot or ())]
+        # Элементы массива без скобок: запись пользователя подклеивается спереди
+        self.items_json = b",".join(dumps(author) for author in self.authors)
+        # Строгий ETag — хэш самих байтов (меняется и при смене DEMO_AUTHOR_INFO)
+        self.digest = hashlib.sha1(self.items_json).hexdigest()[:16]
+        self.etag = f'"{self.digest}"'
+
+
+def _demo_author_entry(profile: dict) -> dict:
+    style = profile.get('style', {})
+    tone = style.get('tone', {})
+    author_id = profile['author_id']
+    
+    # Получаем имя и профессию из маппинга
+    info = DEMO_AUTHOR_INFO.get(author_id, {
+        "name": author_id.replace('_', ' ').title(),
+        "profession": "Content Creator"
+    })
+    
+    return {
+        "id": author_id,
+        "name": info["name"],
+        "profession": info["profession"],
+        "avatar": f"https://api.dicebear.com/7.x/avataaars/svg?seed={author_id}",
+        "platforms": profile.get('platforms', []),
+        "sample_posts": profile.get('sample_posts', []),
+        "stats": {
+            "total_posts": profile.get('total_posts', 0),
+            "platforms_count": len(profile.get('platforms', [])),
+            "formality": tone.get('dominant', 'balanced'),
+            "avgLength": style.get('avg_post_length', 300),
+            "emojiDensity": "High" if style.get('emoji_density', 0) > 1 else "Low"
+        },
+        "is_demo": True
+    }
+
+
+# Пересобирается подпиской на ProfileStore при каждой смене снимка
+demo_catalog = DemoCatalog()
+
+
+def _rebuild_demo_catalog(snapshot) -> None:
+    global demo_catalog
+    demo_catalog = DemoCatalog(snapshot)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверяет заголовок If-None-Match (список ETag или *, сравнение слабое)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+async def _user_author_entry(user_id: str) -> Optional[dict]:
+    """Карточка текущего пользователя для списка авторов."""
+    user = await adb.get_user(user_id)
+    if user:  # Пользователь существует
+        # Агрегаты по платформам вместо чтения всех постов
+        post_stats = await adb.get_user_post_stats(user_id)
+        total_posts = sum(stats["post_count"] for stats in post_stats.values())
+        platforms = list(post_stats)
+        user_profile = await adb.get_profile(user_id)
+        logger.debug(
+            "authors: user card",
+            extra={"user_id": user_id, "total_posts": total_posts, "has_profile": bool(user_profile)}
+        )
         
-        for profile in data.get('profiles', []):
-            style = profile.get('style', {})
-            tone = style.get('tone', {})
-            author_id = profile['author_id']
-            
-            # Получаем имя и профессию из маппинга
-            info = author_info.get(author_id, {
-                "name": author_id.replace('_', ' ').title(),
-                "profession": "Content Creator"
-            })
-            
-            authors.append({
-                "id": author_id,
-                "name": info["name"],
-                "profession": info["profession"],
-                "avatar": f"https://api.dicebear.com/7.x/avataaars/svg?seed={author_id}",
-                "platforms": profile.get('platforms', []),
-                "sample_posts": profile.get('sample_posts', []),
+        # Если есть профиль, используем его данные, иначе дефолтные
+        if user_profile:
+            return {
+                "id": f"user_{user_id}",
+                "name": user.get("name", "Мой профиль"),
+                "profession": "Ваш стиль",
+                "avatar": f"https://api.dicebear.com/7.x/avataaars/svg?seed={user_id}",
+                "platforms": platforms,
+                "sample_posts": user_profile.get("sample_posts", []),
                 "stats": {
-                    "total_posts": profile.get('total_posts', 0),
-                    "platforms_count": len(profile.get('platforms', [])),
-                    "formality": tone.get('dominant', 'balanced'),
-                    "avgLength": style.get('avg_post_length', 300),
-                    "emojiDensity": "High" if style.get('emoji_density', 0) > 1 else "Low"
+                    "total_posts": total_posts,
+                    "platforms_count": len(platforms),
+                    "formality": user_profile.get("style", {}).get("tone", {}).get("dominant", "balanced"),
+                    "avgLength": user_profile.get("style", {}).get("avg_post_length", 300),
+                    "emojiDensity": "High" if user_profile.get("style", {}).get("emoji_density", 0) > 1 else "Low"
                 },
-                "is_demo": True
-            })
-    
-    # Добавляем профиль текущего пользователя, если он залогинен
-    if user_id:
-        print(f"🔍 [API] Поиск пользователя: {user_id}")
-        user = db.get_user(user_id)
-        print(f"🔍 [API] Результат get_user: {user}")
-        if user:  # Пользователь существует
-            print(f"✅ [API] Пользователь найден: {user.get('name', 'N/A')}")
-            user_posts = db.get_user_posts(user_id)
-            user_profile = db.get_profile(user_id)
-            print(f"📊 [API] Постов: {len(user_posts)}, Профиль: {'есть' if user_profile else 'нет'}")
-            
-            # Если есть профиль, используем его данные, иначе дефолтные
-            if user_profile:
-                platforms = list(set([p["platform"] for p in user_posts])) if user_posts else []
-                authors.insert(0, {
-                    "id": f"user_{user_id}",
-                    "name": user.get("name", "Мой профиль"),
-                    "profession": "Ваш стиль",
-                    "avatar": f"https://api.dicebear.com/7.x/avataaars/svg?seed={user_id}",
-                    "platforms": platforms,
-                    "sample_posts": user_profile.get("sample_posts", []),
-                    "stats": {
-                        "total_posts": len(user_posts),
-                        "platforms_count": len(platforms),
-                        "formality": user_profile.get("style", {}).get("tone", {}).get("dominant", "balanced"),
-                        "avgLength": user_profile.get("style", {}).get("avg_post_length", 300),
-                        "emojiDensity": "High" if user_profile.get("style", {}).get("emoji_density", 0) > 1 else "Low"
-                    },
-                    "is_demo": False,
-                    "user_id": user_id
-                })
-            else:
-                # Пользователь есть, но профиль не перестроен - показываем с предупреждением
-                platforms = list(set([p["platform"] for p in user_posts])) if user_posts else []
-                authors.insert(0, {
-                    "id": f"user_{user_id}",
-                    "name": user.get("name", "Мой профиль"),
-                    "profession": "Перестройте профиль" if user_posts else "Добавьте посты",
-                    "avatar": f"https://api.dicebear.com/7.x/avataaars/svg?seed={user_id}",
-                    "platforms": platforms,
-                    "sample_posts": [],
-                    "stats": {
-                        "total_posts": len(user_posts),
-                        "platforms_count": len(platforms),
-                        "formality": "balanced",
-                        "avgLength": 300,
-                        "emojiDensity": "Low"
-                    },
-                    "is_demo": False,
-                    "user_id": user_id,
-                    "needs_rebuild": True  # Флаг, что нужно перестроить профиль
-                })
+                "is_demo": False,
+                "user_id": user_id
+            }
         else:
-            print(f"⚠️ [API] Пользователь не найден в БД: {user_id}")
-            # Попробуем создать пользователя, если его нет (на случай если он был создан, но не сохранился)
-            print(f"🔧 [API] Попытка создать пользователя...")
-            db.create_user(user_id, name="Пользователь")
-            user = db.get_user(user_id)
-            if user:
-                print(f"✅ [API] Пользователь создан, добавляем в список")
-                authors.insert(0, {
-                    "id": f"user_{user_id}",
-                    "name": user.get("name", "Мой профиль"),
-                    "profession": "Добавьте посты",
-                    "avatar": f"https://api.dicebear.com/7.x/avataaars/svg?seed={user_id}",
-                    "platforms": [],
-                    "sample_posts": [],
-                    "stats": {
-                        "total_posts": 0,
-                        "platforms_count": 0,
-                        "formality": "balanced",
-                        "avgLength": 300,
-                        "emojiDensity": "Low"
-                    },
-                    "is_demo": False,
-                    "user_id": user_id,
-                    "needs_rebuild": True
-                })
+            # Пользователь есть, но профиль не перестроен - показываем с предупреждением
+            return {
+                "id": f"user_{user_id}",
+                "name": user.get("name", "Мой профиль"),
+                "profession": "Перестройте профиль" if total_posts else "Добавьте посты",
+                "avatar": f"https://api.dicebear.com/7.x/avataaars/svg?seed={user_id}",
+                "platforms": platforms,
+                "sample_posts": [],
+                "stats": {
+                    "total_posts": total_posts,
+                    "platforms_count": len(platforms),
+                    "formality": "balanced",
+                    "avgLength": 300,
+                    "emojiDensity": "Low"
+                },
+                "is_demo": False,
+                "user_id": user_id,
+                "needs_rebuild": True  # Флаг, что нужно перестроить профиль
+            }
+    else:
+        # Попробуем создать пользователя, если его нет (на случай если он был создан, но не сохранился)
+        logger.warning("authors: user not found, creating", extra={"user_id": user_id})
+        await adb.create_user(user_id, name="Пользователь")
+        user = await adb.get_user(user_id)
+        if user:
+            return {
+                "id": f"user_{user_id}",
+                "name": user.get("name", "Мой профиль"),
+                "profession": "Добавьте посты",
+                "avatar": f"https://api.dicebear.com/7.x/avataaars/svg?seed={user_id}",
+                "platforms": [],
+                "sample_posts": [],
+                "stats": {
+                    "total_posts": 0,
+                    "platforms_count": 0,
+                    "formality": "balanced",
+                    "avgLength": 300,
+                    "emojiDensity": "Low"
+                },
+                "is_demo": False,
+                "user_id": user_id,
+                "needs_rebuild": True
+            }
+    return None
+
+
+@app.get("/api/authors")
+async def get_authors(request: Request, user_id: Optional[str] = None):
+    """
+    Получить список доступных авторов.
+
+    Демо-каталог сериализуется один раз на снимок профилей; на запрос
+    сериализуется только карточка пользователя. Ответ отдаётся со строгим
+    ETag, совпадающий If-None-Match получает 304.
+    """
+    catalog = demo_catalog
+    user_entry = await _user_author_entry(user_id) if user_id else None
     
-    print(f"📤 [API] Возвращаем {len(authors)} авторов")
-    return {"authors": authors}
+    if user_entry is None:
+        items = catalog.items_json
+        etag = catalog.etag
+    else:
+        user_json = dumps(user_entry)
+        items = user_json + b"," + catalog.items_json if catalog.authors else user_json
+        user_hash = hashlib.sha1(user_json).hexdigest()[:16]
+        etag = f'"{catalog.digest}-{user_hash}"'
+    
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    return Response(
+        content=b'{"authors":[' + items + b']}',
+        media_type="application/json",
+        headers=headers
+    )
+
+
+# Оценка стоимости генерации до её начала: промпт без темы и max_tokens ответа
+GENERATION_PROMPT_TOKENS_ESTIMATE = 1500
+GENERATION_MAX_OUTPUT_TOKENS = 500
+
+
+def _rate_limit_key(request: Request, current_user: Optional[dict]) -> str:
+    """Ключ лимита: пользователь из токена, без токена — IP клиента."""
+    if current_user:
+        return f"user:{current_user['user_id']}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+async def _check_rate_limit(limiter: RateLimiter, key: str, cost: float) -> None:
+    """Списывает cost с корзины или отвечает 429 с Retry-After."""
+    allowed, retry_after = await limiter.acquire(key, cost)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Превышен лимит генераций, повторите позже",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
 
 
 @app.post("/api/generate", response_model=GenerateResponse)
-async def generate_post(request_data: GenerateRequest):
+async def generate_post(
+    request: Request,
+    request_data: GenerateRequest,
+    current_user: Optional[dict] = Depends(get_optional_user),
+    profile_request: bool = Depends(profiling_requested)
+):
     """
     Генерирует пост в стиле автора.
     
     Args:
         request: FastAPI Request объект
         request_data: Запрос с параметрами генерации
+        current_user: Пользователь из токена (ключ rate limit), если есть
+        profile_request: Профилировать запрос (?profile=true, только администраторы)
         
     Returns:
         Сгенерированный пост с метриками
@@ -422,115 +766,94 @@ async def generate_post(request_data: GenerateRequest):
             detail="Генератор не инициализирован. Проверьте наличие dataset/author_profiles.json"
         )
     
+    # Списываем оценку стоимости; после генерации она уточняется по факту,
+    # при ошибке возвращается целиком
+    rate_limit_key = None
+    estimated_cost = actual_cost = 0
+    if RATE_LIMIT_ENABLED:
+        rate_limit_key = _rate_limit_key(request, current_user)
+        await _check_rate_limit(request_limiter, rate_limit_key, 1)
+        estimated_cost = (
+            GENERATION_PROMPT_TOKENS_ESTIMATE
+            + estimate_tokens(request_data.topic)
+            + GENERATION_MAX_OUTPUT_TOKENS
+        )
+        try:
+            await _check_rate_limit(token_limiter, rate_limit_key, estimated_cost)
+        except HTTPException:
+            # Генерация не состоялась: запрос не засчитывается
+            await request_limiter.settle(rate_limit_key, -1)
+            raise
+    
     start_time = time.time()
+    metrics.generations_in_flight.inc()
+    request_profiler = RequestProfiler(profile_request)
     
     try:
+        request_profiler.start()
+        
         # Определяем, используем ли мы user_id или author_id
         if request_data.user_id:
             # Работа с персональным профилем пользователя
-            user_profile = db.get_profile(request_data.user_id)
+            user_profile = await adb.get_profile(request_data.user_id)
             if not user_profile:
                 raise HTTPException(status_code=404, detail="Профиль пользователя не найден. Используйте /rebuild-profile")
             
-            # Оптимизированная работа с временными файлами
-            import tempfile
-            import atexit
-            
-            # Создаём временный файл с профилем пользователя
-            temp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8')
-            temp_path = Path(temp_file.name)
+            # Индекс постов строится до передачи профиля генератору: пока
+            # запрос ждёт await, вытеснение из user_post_indexes может убрать
+            # пользователя из общего генератора
+            author_id = user_profile['author_id']
+            post_index = await get_user_post_index(request_data.user_id)
             
-            try:
-                temp_profile = {
-                    "version": "1.0",
-                    "profiles": [user_profile]
-                }
-                json.dump(temp_profile, temp_file, ensure_ascii=False)
-                temp_file.close()
-                
-                # Регистрируем удаление файла при выходе
-                atexit.register(lambda: temp_path.unlink() if temp_path.exists() else None)
-                
-                api_key = os.getenv("OPENAI_API_KEY")
-                print(f"🔑 [GENERATE] Проверка API ключа:")
-                print(f"   - OPENAI_API_KEY в окружении: {'есть' if api_key else 'НЕТ'}")
-                if api_key:
-                    print(f"   - Длина ключа: {len(api_key)} символов")
-                    print(f"   - Первые 10 символов: {api_key[:10]}...")
-                    print(f"   - Начинается с 'sk-': {api_key.startswith('sk-')}")
-                else:
-                    print(f"   ⚠️ API ключ НЕ установлен - будет использоваться MOCK генерация")
-                
-                user_generator = GhostPenGenerator(temp_path, api_key)
-                user_scorer = StyleScorer()
-            except Exception as e:
-                # Удаляем временный файл в случае ошибки
-                if temp_path.exists():
-                    temp_path.unlink()
-                raise
-            
-            # Логируем информацию о профиле пользователя
-            sample_posts_count = len(user_profile.get('sample_posts', []))
-            style = user_profile.get('style', {})
-            tone = style.get('tone', {})
-            
-            print(f"📝 [GENERATE] Профиль пользователя:")
-            print(f"   - author_id: {user_profile['author_id']}")
-            print(f"   - sample_posts в профиле: {sample_posts_count}")
-            if sample_posts_count > 0:
-                print(f"   - Первый пост (первые 100 символов): {user_profile['sample_posts'][0][:100]}...")
-            
-            print(f"📊 [GENERATE] Извлечённые метрики стиля:")
-            print(f"   - Средняя длина поста: {style.get('avg_post_length', 'N/A')} символов")
-            print(f"   - Средняя длина предложения: {style.get('avg_sentence_length', 'N/A'):.2f} слов" if style.get('avg_sentence_length') else "   - Средняя длина предложения: N/A")
-            print(f"   - Плотность эмодзи: {style.get('emoji_density', 0):.2f}")
-            print(f"   - Плотность хэштегов: {style.get('hashtag_density', 0):.2f}")
-            print(f"   - Эмоциональность: {style.get('emotionality', 0):.2f}")
-            print(f"   - Тип структуры: {style.get('structure_type', 'N/A')}")
-            print(f"   - Доминирующий тон: {tone.get('dominant', 'N/A')}")
-            print(f"   - Характерных фраз: {len(user_profile.get('signature_phrases', []))}")
+            # Профиль пользователя (DEBUG, сэмплируется; поля собираются только при включённом уровне)
+            if logger.isEnabledFor(logging.DEBUG):
+                style = user_profile.get('style', {})
+                logger.debug("generate: user profile", extra={
+                    "user_id": request_data.user_id,
+                    "author_id": author_id,
+                    "sample_posts": len(user_profile.get('sample_posts', [])),
+                    "avg_post_length": style.get('avg_post_length'),
+                    "avg_sentence_length": style.get('avg_sentence_length'),
+                    "emoji_density": style.get('emoji_density'),
+                    "hashtag_density": style.get('hashtag_density'),
+                    "structure_type": style.get('structure_type'),
+                    "tone": style.get('tone', {}).get('dominant'),
+                    "signature_phrases": len(user_profile.get('signature_phrases', [])),
+                    "openai_configured": not user_generator.llm.use_mock
+                })
             
+            # Профиль из кэша БД передаётся генератору напрямую (префиксы
+            # промпта пересобираются только при смене версии профиля), а
+            # примеры подбираются по теме из всех постов пользователя.
+            # Между add_profile и generate_post нет await
+            user_generator.prompt_builder.add_profile(user_profile)
+            user_generator.prompt_builder.set_post_index(author_id, post_index)
             try:
                 result = user_generator.generate_post(
-                    author_id=user_profile['author_id'],
+                    author_id=author_id,
                     platform=request_data.social_network,
                     topic=request_data.topic,
                     additional_context=None
                 )
-                
-                # Логируем промпт, который был использован
-                if 'prompt_used' in result:
-                    prompt = result['prompt_used']
-                    if 'ПРИМЕРЫ ПОСТОВ' in prompt:
-                        print(f"✅ [GENERATE] Промпт содержит раздел 'ПРИМЕРЫ ПОСТОВ' - ваши посты используются!")
-                        # Извлекаем секцию с примерами
-                        examples_start = prompt.find('ПРИМЕРЫ ПОСТОВ')
-                        if examples_start != -1:
-                            examples_end = prompt.find('\n\nТРЕБОВАНИЯ ПЛАТФОРМЫ:', examples_start)
-                            if examples_end == -1:
-                                examples_end = prompt.find('\n\nТЕМА ПОСТА:', examples_start)
-                            if examples_end != -1:
-                                examples_section = prompt[examples_start:examples_end]
-                                print(f"📄 [GENERATE] Секция с примерами (первые 300 символов):")
-                                print(f"   {examples_section[:300]}...")
-                    else:
-                        print(f"⚠️ [GENERATE] Промпт НЕ содержит 'ПРИМЕРЫ ПОСТОВ' - проверьте sample_posts")
-                        print(f"📄 [GENERATE] Промпт (первые 500 символов):")
-                        print(f"   {prompt[:500]}...")
-                
-                similarity_scores = user_scorer.score(
-                    result['generated_post'],
-                    user_profile,
-                    request_data.social_network
-                )
             finally:
-                # Удаляем временный файл после использования
-                if temp_path.exists():
-                    try:
-                        temp_path.unlink()
-                        print(f"🗑️ [GENERATE] Временный файл удалён: {temp_path}")
-                    except Exception as e:
-                        print(f"⚠️ [GENERATE] Не удалось удалить временный файл: {e}")
+                # Индекс сверх бюджета LRU не закэширован, и on_evict его
+                # не уберёт: пользователь не остаётся в общем генераторе
+                if request_data.user_id not in user_post_indexes:
+                    user_generator.prompt_builder.remove_profile(author_id)
+            
+            # Без примеров постов стиль пользователя почти не передаётся
+            if 'ПРИМЕРЫ ПОСТОВ' not in result.get('prompt_used', ''):
+                logger.warning(
+                    "generate: prompt has no example posts",
+                    extra={"user_id": request_data.user_id}
+                )
+            elif logger.isEnabledFor(logging.DEBUG):
+                logger.debug("generate: prompt", extra={
+                    "user_id": request_data.user_id,
+                    "prompt_excerpt": result['prompt_used'][:500]
+                })
+            
+            similarity_scores = result.get('style_scores', {})
             
         else:
             # Работа с демо-авторами
@@ -547,22 +870,20 @@ async def generate_post(request_data: GenerateRequest):
                 additional_context=None
             )
             
-            # Получаем профиль для оценки
-            profile = generator.prompt_builder.profiles.get(request_data.author_id)
-            if not profile:
-                raise HTTPException(status_code=404, detail=f"Автор {request_data.author_id} не найден")
-            
-            # Оцениваем стилевое сходство
-            similarity_scores = scorer.score(
-                result['generated_post'],
-                profile,
-                request_data.social_network
-            )
+            # Стилевое сходство считается этапом pipeline (score)
+            similarity_scores = result.get('style_scores', {})
         
         processing_time = int((time.time() - start_time) * 1000)
         
         # Улучшенный подсчет токенов (более точная оценка)
         prompt_text = result.get('prompt_used', '')
+        usage = result.get('llm_usage') or {
+            "prompt_tokens": estimate_tokens(prompt_text),
+            "completion_tokens": estimate_tokens(result['generated_post'])
+        }
+        actual_cost = usage["prompt_tokens"] + usage["completion_tokens"]
+        metrics.llm_tokens.inc(usage["prompt_tokens"], kind="prompt")
+        metrics.llm_tokens.inc(usage["completion_tokens"], kind="completion")
         # Примерная оценка: 1 токен ≈ 0.75 слова для русского языка
         prompt_tokens = int(len(prompt_text.split()) * 0.75)
         
@@ -574,7 +895,9 @@ async def generate_post(request_data: GenerateRequest):
                 target_length=result.get('metrics', {}).get('target_length', 300),
                 model_version="ghostpen-v1.1-enhanced",
                 processing_time_ms=processing_time,
-                prompt_tokens=prompt_tokens
+                prompt_tokens=prompt_tokens,
+                stage_timings=result.get('stage_timings', []),
+                profile=request_profiler.result()
             )
         )
         
@@ -590,14 +913,16 @@ async def generate_post(request_data: GenerateRequest):
         raise HTTPException(status_code=404, detail=f"Файл не найден: {str(e)}")
     except Exception as e:
         # Общие ошибки с улучшенным логированием
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"❌ [GENERATE] Критическая ошибка: {str(e)}")
-        print(f"📋 [GENERATE] Traceback:\n{error_trace}")
+        logger.exception(f"generate: failed: {e}")
         raise HTTPException(
             status_code=500, 
             detail=f"Ошибка генерации: {str(e)}"
         )
+    finally:
+        request_profiler.stop()
+        metrics.generations_in_flight.dec()
+        if rate_limit_key is not None:
+            await token_limiter.settle(rate_limit_key, actual_cost - estimated_cost)
 
 
 # === User Management ===
@@ -616,11 +941,20 @@ class AddPostRequest(BaseModel):
     emojis: Optional[list[str]] = Field(default=[])
 
 
+USER_POST_PLATFORMS = ('linkedin', 'instagram', 'facebook', 'telegram')
+
+# Массовый импорт: проверка и вставка пачками
+BULK_IMPORT_CHUNK_SIZE = 500
+BULK_IMPORT_MAX_ERRORS = 20
+
+POSTS_PAGE_MAX_LIMIT = 500
+
+
 @app.post("/api/users")
 async def create_user(request: CreateUserRequest):
     """Создать нового пользователя."""
     user_id = str(uuid.uuid4())
-    if db.create_user(user_id, request.email, request.name):
+    if await adb.create_user(user_id, request.email, request.name):
         return {"user_id": user_id, "status": "created"}
     raise HTTPException(status_code=400, detail="Пользователь уже существует")
 
@@ -628,7 +962,7 @@ async def create_user(request: CreateUserRequest):
 @app.get("/api/users/{user_id}")
 async def get_user(user_id: str):
     """Получить информацию о пользователе."""
-    user = db.get_user(user_id)
+    user = await adb.get_user(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     return user
@@ -638,14 +972,13 @@ async def get_user(user_id: str):
 async def add_post(user_id: str, request: AddPostRequest):
     """Добавить пост пользователя."""
     # Проверяем существование пользователя
-    if not db.get_user(user_id):
+    if not await adb.get_user(user_id):
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    valid_platforms = ['linkedin', 'instagram', 'facebook', 'telegram']
-    if request.platform not in valid_platforms:
+    if request.platform not in USER_POST_PLATFORMS:
         raise HTTPException(status_code=400, detail=f"Неподдерживаемая платформа")
     
-    post_id = db.add_post(
+    post_id = await adb.add_post(
         user_id=user_id,
         platform=request.platform,
         content=request.content,
@@ -654,52 +987,268 @@ async def add_post(user_id: str, request: AddPostRequest):
         mentions=request.mentions,
         emojis=request.emojis
     )
+    
+    # Обновляем индекс постов, если он уже построен; повторный put
+    # пересчитывает его размер в бюджете USER_POST_INDEX_MAX_POSTS
+    index = user_post_indexes.get(user_id)
+    if index is not None:
+        index.add(post_id, request.content)
+        user_post_indexes.put(user_id, index)
+    
     return {"post_id": post_id, "status": "created"}
 
 
+async def _iter_import_items(request: Request):
+    """
+    Читает тело массового импорта: JSON массив или NDJSON (построчно, потоком).
+
+    Yields:
+        (номер записи, объект)
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        # NDJSON разбирается по мере поступления, тело целиком не буферизуется
+        buffer = b""
+        line_number = 0
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                line_number += 1
+                if line.strip():
+                    yield line_number, _parse_import_line(line, line_number)
+        if buffer.strip():
+            yield line_number + 1, _parse_import_line(buffer, line_number + 1)
+        return
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Тело запроса не является корректным JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Ожидается JSON массив постов или NDJSON")
+    for position, item in enumerate(items, 1):
+        yield position, item
+
+
+def _parse_import_line(line: bytes, line_number: int):
+    try:
+        return json.loads(line)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Строка {line_number}: некорректный JSON")
+
+
+def _validate_import_chunk(chunk: list, posts: list, errors: list) -> None:
+    """Проверяет пачку записей импорта и раскладывает их по posts / errors."""
+    for position, item in chunk:
+        try:
+            post = AddPostRequest.model_validate(item)
+        except ValidationError as e:
+            errors.append({"item": position, "error": e.errors(include_url=False)[0]["msg"]})
+            continue
+        if post.platform not in USER_POST_PLATFORMS:
+            errors.append({"item": position, "error": "Неподдерживаемая платформа"})
+            continue
+        if not post.content.strip():
+            errors.append({"item": position, "error": "Пустой текст поста"})
+            continue
+        posts.append(post.model_dump())
+
+
+@app.post("/api/users/{user_id}/posts/bulk")
+async def import_posts(user_id: str, request: Request, rebuild_profile: bool = False):
+    """
+    Массовый импорт постов пользователя.
+
+    Тело — JSON массив объектов AddPostRequest или NDJSON
+    (Content-Type: application/x-ndjson). Импорт атомарный: при любой
+    ошибке проверки не добавляется ни один пост.
+
+    Args:
+        user_id: ID пользователя
+        rebuild_profile: Перестроить профиль один раз после импорта
+    """
+    if not await adb.get_user(user_id):
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    
+    posts: list = []
+    errors: list = []
+    chunk: list = []
+    received = 0
+    async for position, item in _iter_import_items(request):
+        received += 1
+        if received > BULK_IMPORT_MAX_POSTS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Слишком много постов (максимум {BULK_IMPORT_MAX_POSTS})"
+            )
+        chunk.append((position, item))
+        if len(chunk) >= BULK_IMPORT_CHUNK_SIZE:
+            _validate_import_chunk(chunk, posts, errors)
+            chunk = []
+            if len(errors) >= BULK_IMPORT_MAX_ERRORS:
+                break
+    _validate_import_chunk(chunk, posts, errors)
+    
+    if errors:
+        raise HTTPException(
+            status_code=422,
+            detail={"message": "Импорт отклонён", "errors": errors[:BULK_IMPORT_MAX_ERRORS]}
+        )
+    if not posts:
+        raise HTTPException(status_code=400, detail="Нет постов для импорта")
+    
+    post_ids = await adb.add_posts(user_id, posts, chunk_size=BULK_IMPORT_CHUNK_SIZE)
+    
+    # Индекс постов перестроится лениво при следующей генерации
+    user_post_indexes.pop(user_id)
+    
+    response = {"status": "created", "imported": len(post_ids), "post_ids": post_ids}
+    if rebuild_profile:
+        result = await _rebuild_user_profile(user_id)
+        response["profile_rebuilt"] = result is not None
+        if result is not None:
+            response["total_posts"] = result["total_posts"]
+    return response
+
+
+def _encode_posts_cursor(post: dict) -> str:
+    """Непрозрачный курсор страницы: (timestamp, id) последнего поста."""
+    payload = json.dumps([post['timestamp'], post['id']], ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def _decode_posts_cursor(cursor: str) -> tuple:
+    try:
+        timestamp, post_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    return timestamp, post_id
+
+
 @app.get("/api/users/{user_id}/posts")
-async def get_user_posts(user_id: str, platform: Optional[str] = None):
-    """Получить посты пользователя."""
-    posts = db.get_user_posts(user_id, platform)
-    return {"posts": posts, "count": len(posts)}
+async def get_user_posts(
+    user_id: str,
+    platform: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    Получить посты пользователя постранично (новые первыми).
+
+    Args:
+        platform: Фильтр по платформе
+        limit: Размер страницы (1..500)
+        cursor: next_cursor из предыдущего ответа
+        fields: Колонки через запятую (например, "id,platform,content")
+    """
+    if not 1 <= limit <= POSTS_PAGE_MAX_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit должен быть от 1 до {POSTS_PAGE_MAX_LIMIT}"
+        )
+    columns = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    after = _decode_posts_cursor(cursor) if cursor else None
+    
+    try:
+        posts = await adb.get_user_posts(
+            user_id, platform, limit=limit, after=after, columns=columns
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    next_cursor = _encode_posts_cursor(posts[-1]) if len(posts) == limit else None
+    # Посты из БД уже JSON-совместимы: отдаём без jsonable_encoder
+    return FastJSONResponse({"posts": posts, "count": len(posts), "next_cursor": next_cursor})
+
+
+@app.get("/api/users/{user_id}/posts/search")
+async def search_user_posts(
+    user_id: str,
+    q: str,
+    platform: Optional[str] = None,
+    limit: int = 20
+):
+    """
+    Полнотекстовый поиск по постам пользователя.
+
+    Args:
+        q: Слова (ищутся по префиксу) и "точные фразы" в кавычках
+        platform: Фильтр по платформе
+        limit: Сколько постов вернуть (1..100)
+    """
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Пустой поисковый запрос")
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit должен быть от 1 до 100")
+    
+    results = await adb.search_user_posts(user_id, q, platform=platform, limit=limit)
+    return {"results": results, "count": len(results)}
 
 
 @app.delete("/api/users/{user_id}/posts/{post_id}")
 async def delete_post(user_id: str, post_id: str):
     """Удалить пост пользователя."""
-    if db.delete_post(post_id, user_id):
+    if await adb.delete_post(post_id, user_id):
+        index = user_post_indexes.get(user_id)
+        if index is not None:
+            index.remove(post_id)
+            user_post_indexes.put(user_id, index)
         return {"status": "deleted"}
     raise HTTPException(status_code=404, detail="Пост не найден")
 
 
-@app.post("/api/users/{user_id}/rebuild-profile")
-async def rebuild_profile(user_id: str):
-    """Перестроить стилевой профиль пользователя."""
+async def _rebuild_user_profile(user_id: str) -> Optional[dict]:
+    """Перестраивает и сохраняет профиль пользователя (None, если постов нет)."""
     # Получаем данные пользователя
-    user_data = db.get_user_data_for_profiling(user_id)
+    user_data = await adb.get_user_data_for_profiling(user_id)
     if not user_data:
-        raise HTTPException(status_code=400, detail="У пользователя нет постов")
+        return None
     
     # Анализируем стиль
-    profile = profiler.analyze_author(user_data)
+    with span("profile.analyze_author"), metrics.stage_duration.time(stage="analyze_author"):
+        profile = profiler.analyze_author(user_data)
     
     # Сохраняем профиль
-    db.save_profile(user_id, profile)
+    await adb.save_profile(user_id, profile)
     
     return {
-        "status": "success",
         "profile": profile,
         "total_posts": sum(len(posts) for posts in user_data['platforms'].values())
     }
 
 
+@app.post("/api/users/{user_id}/rebuild-profile")
+async def rebuild_profile(user_id: str, profile_request: bool = Depends(profiling_requested)):
+    """Перестроить стилевой профиль пользователя (?profile=true — с cProfile)."""
+    with RequestProfiler(profile_request) as request_profiler:
+        result = await _rebuild_user_profile(user_id)
+    if result is None:
+        raise HTTPException(status_code=400, detail="У пользователя нет постов")
+    
+    response = {"status": "success", **result}
+    if profile_request:
+        response["cprofile"] = request_profiler.result()
+    return response
+
+
+@app.get("/api/admin/profiles/{profile_id}", include_in_schema=False)
+async def download_request_profile(profile_id: str, admin: dict = Depends(require_admin)):
+    """Скачать .prof файл профилированного запроса (snakeviz, pstats)."""
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+
 @app.get("/api/users/{user_id}/profile")
 async def get_user_profile(user_id: str):
     """Получить стилевой профиль пользователя."""
-    profile = db.get_profile(user_id)
+    profile = await adb.get_profile(user_id)
     if not profile:
         raise HTTPException(status_code=404, detail="Профиль не найден. Используйте /rebuild-profile")
-    return profile
+    return FastJSONResponse(profile)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Метрики GhostPen API в формате Prometheus.
+
+Счётчики, gauge и гистограммы с метками в памяти процесса и их вывод
+в текстовом формате экспозиции (GET /metrics). Без внешних зависимостей:
+при нескольких воркерах каждый отдаёт свои значения, Prometheus
+различает их по instance/pod.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tracing import span
+
+
+# Границы бакетов задержки, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...],
+                   extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric(ABC):
+    """Метрика с набором меток; значения хранятся по кортежу значений меток."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Строки значений в текстовом формате (без HELP/TYPE)."""
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self.samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set_total(self, value: float, **labels) -> None:
+        """Переносит накопленный снаружи итог (счётчик stats() кэша)."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    """Значение, которое может расти и убывать."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Гистограмма с кумулятивными бакетами (_bucket, _sum, _count)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels) -> "_Timer":
+        """Контекстный менеджер: замеряет время блока."""
+        return _Timer(self, labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Набор метрик и функций, обновляющих их перед выводом."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Добавляет функцию, которая вызывается перед каждым выводом (gauge из stats())."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus 0.0.4."""
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception:
+                pass  # Ошибка одного источника не должна ломать /metrics
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# === Метрики GhostPen ===
+registry = MetricsRegistry()
+
+http_request_duration = registry.register(Histogram(
+    "ghostpen_http_request_duration_seconds",
+    "Время обработки HTTP запроса", ("method", "route", "status")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "ghostpen_http_requests_in_flight", "HTTP запросов в обработке"
+))
+stage_duration = registry.register(Histogram(
+    "ghostpen_stage_duration_seconds",
+    "Время внутренних этапов (pipeline генерации, анализ профиля)", ("stage",)
+))
+db_query_duration = registry.register(Histogram(
+    "ghostpen_db_query_duration_seconds", "Время методов базы данных", ("method",)
+))
+generations_in_flight = registry.register(Gauge(
+    "ghostpen_generations_in_flight", "Генераций постов в процессе"
+))
+llm_tokens = registry.register(Counter(
+    "ghostpen_llm_tokens_total", "Токены LLM (prompt/completion)", ("kind",)
+))
+cache_hits = registry.register(Counter(
+    "ghostpen_cache_hits_total", "Попаданий в кэш с запуска", ("cache",)
+))
+cache_misses = registry.register(Counter(
+    "ghostpen_cache_misses_total", "Промахов кэша с запуска", ("cache",)
+))
+cache_hit_ratio = registry.register(Gauge(
+    "ghostpen_cache_hit_ratio", "Доля попаданий в кэш", ("cache",)
+))
+cache_entries = registry.register(Gauge(
+    "ghostpen_cache_entries", "Записей в кэше", ("cache",)
+))
+
+
+def observe_cache_stats(name: str, stats: Dict[str, Any]) -> None:
+    """Переносит stats() кэша (LRUCache) в gauge с меткой cache=name."""
+    cache_hits.set_total(stats.get("hits", 0), cache=name)
+    cache_misses.set_total(stats.get("misses", 0), cache=name)
+    cache_hit_ratio.set(stats.get("hit_rate", 0.0), cache=name)
+    cache_entries.set(stats.get("entries", 0), cache=name)
+
+
+class TimedDatabase:
+    """Прокси бэкенда БД: время каждого публичного метода в db_query_duration и span."""
+
+    def __init__(self, backend: Any):
+        self.backend = backend
+        self._wrappers: Dict[str, Callable[..., Any]] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        wrapper = self._wrappers.get(name)
+        if wrapper is not None:
+            return wrapper
+
+        attr = getattr(self.backend, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def wrapper(*args, **kwargs):
+            with span(f"db.{name}"), db_query_duration.time(method=name):
+                return attr(*args, **kwargs)
+
+        self._wrappers[name] = wrapper
+        return wrapper
+
+
+class MetricsMiddleware:
+    """ASGI middleware: задержка и число HTTP запросов в обработке."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            # Шаблон маршрута, а не путь: /api/users/{user_id}/posts
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status_code)
+            )
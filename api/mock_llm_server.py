@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Mock OpenAI-совместимого LLM сервера для нагрузочных тестов.
+
+Отвечает на POST /v1/chat/completions (обычный ответ и stream=true в SSE)
+с задержкой из заданного распределения, долей ошибок 500/429 и текстом
+из mock генератора GhostPen. API подключается к нему через
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 и любой OPENAI_API_KEY.
+
+Запуск:
+    cd api && python mock_llm_server.py --port 8100 --latency lognormal:800:0.5 --error-rate 0.02
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Текст ответа — от mock генератора GhostPen
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+from ghostpen_generator import LLMInterface
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """
+    Распределение задержки из строки (мс), возвращает генератор секунд.
+
+    Форматы:
+        fixed:MS
+        uniform:MIN:MAX
+        normal:MEAN:STD
+        lognormal:MEDIAN:SIGMA
+        exponential:MEAN
+    """
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed" and len(values) == 1:
+        sample = lambda: values[0]
+    elif kind == "uniform" and len(values) == 2:
+        sample = lambda: random.uniform(values[0], values[1])
+    elif kind == "normal" and len(values) == 2:
+        sample = lambda: random.gauss(values[0], values[1])
+    elif kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0])
+        sample = lambda: random.lognormvariate(mu, values[1])
+    elif kind == "exponential" and len(values) == 1:
+        sample = lambda: random.expovariate(1.0 / values[0])
+    else:
+        raise ValueError(f"Неверное распределение задержки: {spec}")
+    return lambda: max(0.0, sample()) / 1000.0
+
+
+class MockLLMConfig:
+    """Поведение mock сервера."""
+
+    def __init__(self, latency: str = "fixed:0", token_interval_ms: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 chunk_chars: int = 12):
+        """
+        Args:
+            latency: Распределение времени до первого токена (см. parse_latency)
+            token_interval_ms: Пауза между чанками (и их суммарное время без stream)
+            error_rate: Доля ответов 500
+            rate_limit_rate: Доля ответов 429 с Retry-After
+            chunk_chars: Символов в одном чанке
+        """
+        self.latency_spec = latency
+        self.first_token_delay = parse_latency(latency)
+        self.token_interval = token_interval_ms / 1000.0
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.chunk_chars = chunk_chars
+
+
+class MockLLMStats:
+    """Счётчики ответов mock сервера."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {"ok": 0, "stream": 0, "error_500": 0, "error_429": 0}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def enter(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self, outcome: str) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.counts[outcome] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.counts, "max_in_flight": self.max_in_flight}
+
+
+def _usage(prompt: str, text: str) -> Dict[str, int]:
+    prompt_tokens = len(prompt) // 3 + 1
+    completion_tokens = len(text) // 3 + 1
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """Обработчик /v1/chat/completions и /v1/models."""
+
+    protocol_version = "HTTP/1.1"
+    config: MockLLMConfig = MockLLMConfig()
+    stats: MockLLMStats = MockLLMStats()
+    generator = LLMInterface()
+
+    def log_message(self, format, *args):
+        pass  # Лог на каждый запрос искажает замеры
+
+    def _send_json(self, status: int, payload: dict, headers: Dict[str, str] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [
+                {"id": "gpt-3.5-turbo", "object": "model", "owned_by": "mock"}
+            ]})
+        elif self.path == "/stats":
+            self._send_json(200, self.stats.snapshot())
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        stream = bool(request.get("stream"))
+        prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+
+        self.stats.enter()
+        outcome = "error_500"
+        try:
+            time.sleep(self.config.first_token_delay())
+            roll = random.random()
+            if roll < self.config.error_rate:
+                self._send_json(500, {"error": {"message": "mock server error", "type": "server_error"}})
+                return
+            if roll < self.config.error_rate + self.config.rate_limit_rate:
+                outcome = "error_429"
+                self._send_json(429, {"error": {"message": "mock rate limit", "type": "rate_limit_error"}},
+                                headers={"Retry-After": "1"})
+                return
+
+            text = self.generator._mock_generate(prompt)
+            chunks = [text[i:i + self.config.chunk_chars]
+                      for i in range(0, len(text), self.config.chunk_chars)]
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+            model = request.get("model", "gpt-3.5-turbo")
+            if stream:
+                outcome = "stream"
+                self._stream(completion_id, model, chunks, _usage(prompt, text),
+                             bool((request.get("stream_options") or {}).get("include_usage")))
+            else:
+                outcome = "ok"
+                time.sleep(self.config.token_interval * len(chunks))
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": _usage(prompt, text),
+                })
+        finally:
+            self.stats.leave(outcome)
+
+    def _stream(self, completion_id: str, model: str, chunks: List[str],
+                usage: Dict[str, int], include_usage: bool) -> None:
+        """SSE ответ: чанк на каждые chunk_chars символов и [DONE]."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(payload) -> None:
+            data = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+            line = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+            self.wfile.flush()
+
+        base = {"id": completion_id, "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": model}
+        for i, content in enumerate(chunks):
+            if i:
+                time.sleep(self.config.token_interval)
+            delta = {"role": "assistant", "content": content} if i == 0 else {"content": content}
+            event({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if include_usage:
+            event({**base, "choices": [], "usage": usage})
+        event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start_server(config: MockLLMConfig, host: str = "127.0.0.1", port: int = 0):
+    """
+    Запускает mock сервер в фоновом потоке.
+
+    Returns:
+        (сервер, base_url для OPENAI_BASE_URL)
+    """
+    handler = type("ConfiguredMockLLMHandler", (MockLLMHandler,),
+                   {"config": config, "stats": MockLLMStats()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/v1"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-совместимого LLM сервера")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", default="lognormal:800:0.5",
+                        help="Время до первого токена, мс: fixed:MS, uniform:MIN:MAX, "
+                             "normal:MEAN:STD, lognormal:MEDIAN:SIGMA, exponential:MEAN")
+    parser.add_argument("--token-interval", type=float, default=20.0, help="Мс между чанками")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Доля ответов 429")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    config = MockLLMConfig(args.latency, args.token_interval, args.error_rate, args.rate_limit_rate)
+    server, base_url = start_server(config, args.host, args.port)
+    print(f"🤖 Mock LLM: OPENAI_BASE_URL={base_url} (задержка {args.latency}, "
+          f"ошибки {args.error_rate:.0%}, 429 {args.rate_limit_rate:.0%})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"📊 {server.RequestHandlerClass.stats.snapshot()}")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Профилирование отдельных запросов GhostPen API.
+
+Администратор (email из ADMIN_EMAILS, авторизация Bearer токеном)
+добавляет к /api/generate или /rebuild-profile `?profile=true` или
+заголовок `X-GhostPen-Profile: 1`. Запрос выполняется под cProfile:
+сводка самых дорогих функций возвращается в ответе, а полный .prof
+файл (для snakeviz / pstats) скачивается по /api/admin/profiles/{id}.
+"""
+
+import cProfile
+import os
+import pstats
+import re
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import Depends, HTTPException, Query, Request, status
+
+from auth import get_current_user, get_optional_user
+
+try:
+    from config import settings
+    ADMIN_EMAILS = settings.ADMIN_EMAILS
+    PROFILE_DIR = settings.PROFILE_DIR
+    PROFILE_MAX_FILES = settings.PROFILE_MAX_FILES
+    PROFILE_TOP_FUNCTIONS = settings.PROFILE_TOP_FUNCTIONS
+except:
+    ADMIN_EMAILS = os.getenv("ADMIN_EMAILS", "")
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "100"))
+    PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", "25"))
+
+_ADMIN_EMAILS = frozenset(
+    email.strip().lower() for email in ADMIN_EMAILS.split(",") if email.strip()
+)
+PROFILE_HEADER = "x-ghostpen-profile"
+_PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def is_admin(user: Optional[dict]) -> bool:
+    """Пользователь из токена — администратор."""
+    if not user or not user.get("email"):
+        return False
+    return user["email"].lower() in _ADMIN_EMAILS
+
+
+async def require_admin(current_user: dict = Depends(get_current_user)) -> dict:
+    """Dependency: только администраторы."""
+    if not is_admin(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Требуются права администратора")
+    return current_user
+
+
+async def profiling_requested(
+    request: Request,
+    profile: bool = Query(False, description="Профилировать запрос (только администраторы)"),
+    current_user: Optional[dict] = Depends(get_optional_user)
+) -> bool:
+    """Dependency: запрошено ли профилирование (403, если не администратором)."""
+    if not profile and request.headers.get(PROFILE_HEADER) != "1":
+        return False
+    if not is_admin(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Профилирование доступно только администраторам")
+    return True
+
+
+class RequestProfiler:
+    """
+    cProfile одного запроса.
+
+    cProfile профилирует только текущий поток: синхронные этапы генерации
+    и анализа профиля (event loop) попадают в профиль полностью, а вызовы
+    БД в потоках AsyncDatabase видны лишь как ожидание. Пока обработчик
+    ждёт await, в профиль попадают и другие запросы этого event loop,
+    поэтому профилировать лучше на ненагруженном воркере.
+    Одновременно профилируется один запрос на процесс.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, enabled: bool, top: int = PROFILE_TOP_FUNCTIONS,
+                 profile_dir: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES):
+        self.enabled = enabled
+        self.top = top
+        self.profile_dir = Path(profile_dir)
+        self.max_files = max_files
+        self._profile: Optional[cProfile.Profile] = None
+        self._running = False
+
+    def start(self) -> None:
+        """Включает профилирование (409, если уже профилируется другой запрос)."""
+        if not self.enabled:
+            return
+        if not self._lock.acquire(blocking=False):
+            raise HTTPException(status_code=409, detail="Уже профилируется другой запрос")
+        self._profile = cProfile.Profile()
+        self._running = True
+        self._profile.enable()
+
+    def stop(self) -> None:
+        """Выключает профилирование (повторный вызов ничего не делает)."""
+        if self._running:
+            self._profile.disable()
+            self._running = False
+            self._lock.release()
+
+    def __enter__(self) -> "RequestProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self.stop()
+        return False
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """
+        Сохраняет .prof и возвращает сводку (None, если профилирование выключено).
+
+        Returns:
+            {"profile_id", "download", "total_ms", "functions": [...]}
+        """
+        if self._profile is None:
+            return None
+        self.stop()
+
+        profile_id = uuid.uuid4().hex
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        path = self.profile_dir / f"{profile_id}.prof"
+        self._profile.dump_stats(str(path))
+        self._prune(keep=path)
+
+        stats = pstats.Stats(self._profile)
+        functions: List[Dict[str, Any]] = []
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        for (filename, line, name), (primitive_calls, calls, total, cumulative, _) in rows[:self.top]:
+            functions.append({
+                "function": f"{Path(filename).name}:{line}({name})" if line else name,
+                "calls": calls,
+                "total_ms": round(total * 1000, 3),
+                "cumulative_ms": round(cumulative * 1000, 3),
+            })
+
+        return {
+            "profile_id": profile_id,
+            "download": f"/api/admin/profiles/{profile_id}",
+            "total_ms": round(stats.total_tt * 1000, 3),
+            "functions": functions,
+        }
+
+    def _prune(self, keep: Path) -> None:
+        """Удаляет старые .prof файлы сверх max_files (keep — только что сохранённый)."""
+        files = []
+        for path in self.profile_dir.glob("*.prof"):
+            try:
+                files.append((path == keep, path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        files.sort(reverse=True)
+        for _, _, path in files[self.max_files:]:
+            path.unlink(missing_ok=True)
+
+
+def profile_path(profile_id: str) -> Optional[Path]:
+    """Путь к сохранённому профилю (None для неверного или несуществующего ID)."""
+    if not _PROFILE_ID_RE.match(profile_id):
+        return None
+    path = Path(PROFILE_DIR) / f"{profile_id}.prof"
+    return path if path.exists() else None
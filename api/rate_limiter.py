@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Rate limiting генерации для GhostPen API.
+
+Token bucket на пользователя: корзина ёмкостью capacity пополняется со
+скоростью refill_per_second, запрос списывает свою стоимость (для
+/api/generate — оценку токенов LLM). Состояние корзин хранится в
+подключаемом хранилище:
+- MemoryBucketStore — в процессе (один воркер);
+- SQLiteBucketStore — общий файл SQLite (несколько воркеров на хосте);
+- RedisBucketStore — Redis или совместимый сервер (Valkey, KeyDB).
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+# Корзины проверяются на устаревание раз в столько операций
+PRUNE_EVERY = 1000
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов LLM (~3 символа на токен для кириллицы)."""
+    return len(text) // 3 + 1
+
+
+def apply_cost(tokens: float, updated_at: float, now: float, cost: float,
+               capacity: float, refill_per_second: float,
+               force: bool = False) -> Tuple[bool, float]:
+    """
+    Пополняет корзину и пытается списать cost.
+
+    Args:
+        tokens: Остаток в корзине на момент updated_at
+        updated_at: Время последнего изменения
+        now: Текущее время
+        cost: Стоимость (отрицательная — возврат)
+        capacity: Ёмкость корзины
+        refill_per_second: Скорость пополнения
+        force: Списать даже при нехватке (уход в долг до -capacity)
+
+    Returns:
+        (списано ли, новый остаток)
+    """
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * refill_per_second)
+    if tokens >= cost or force:
+        return True, max(-capacity, min(capacity, tokens - cost))
+    return False, tokens
+
+
+class MemoryBucketStore:
+    """
+    Корзины в памяти процесса.
+
+    Хранилище общее для нескольких лимитов, поэтому ёмкость и скорость
+    пополнения хранятся в каждой корзине, и устаревание проверяется по ним.
+    """
+
+    blocking = False
+
+    def __init__(self):
+        # key -> (tokens, updated_at, capacity, refill_per_second)
+        self._buckets: Dict[str, Tuple[float, float, float, float]] = {}
+        self._lock = threading.Lock()
+        self._operations = 0
+
+    def take(self, key: str, cost: float, capacity: float,
+             refill_per_second: float, force: bool = False) -> Tuple[bool, float]:
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))[:2]
+            allowed, tokens = apply_cost(
+                tokens, updated_at, now, cost, capacity, refill_per_second, force
+            )
+            self._buckets[key] = (tokens, now, capacity, refill_per_second)
+            self._operations += 1
+            if self._operations % PRUNE_EVERY == 0:
+                self._prune(now)
+        return allowed, tokens
+
+    def _prune(self, now: float) -> None:
+        # Полная корзина ничем не отличается от отсутствующей
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if bucket[0] + (now - bucket[1]) * bucket[3] < bucket[2]
+        }
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBucketStore:
+    """
+    Корзины в файле SQLite, общем для всех воркеров.
+
+    Списание выполняется в транзакции BEGIN IMMEDIATE, поэтому
+    параллельные воркеры не теряют списания друг друга. Ёмкость и скорость
+    пополнения хранятся в строке корзины: по ним удаляются устаревшие.
+    """
+
+    blocking = True
+
+    def __init__(self, db_path: str = "ratelimit.db"):
+        self._conn = sqlite3.connect(db_path, timeout=5.0, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                capacity REAL NOT NULL,
+                refill_per_second REAL NOT NULL
+            )
+        """)
+        self._lock = threading.Lock()
+        self._operations = 0
+
+    def take(self, key: str, cost: float, capacity: float,
+             refill_per_second: float, force: bool = False) -> Tuple[bool, float]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens, updated_at = row if row else (capacity, now)
+                allowed, tokens = apply_cost(
+                    tokens, updated_at, now, cost, capacity, refill_per_second, force
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO rate_limit_buckets "
+                    "(key, tokens, updated_at, capacity, refill_per_second) VALUES (?, ?, ?, ?, ?)",
+                    (key, tokens, now, capacity, refill_per_second)
+                )
+                self._operations += 1
+                if self._operations % PRUNE_EVERY == 0:
+                    # Корзины, которые успели бы наполниться целиком (по своим параметрам)
+                    self._conn.execute(
+                        "DELETE FROM rate_limit_buckets "
+                        "WHERE updated_at < ? - 2 * capacity / refill_per_second",
+                        (now,)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return allowed, tokens
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# Пополнение и списание одним атомарным скриптом на сервере
+_REDIS_TAKE_SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local capacity = tonumber(ARGV[2])
+local rate = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local cost = tonumber(ARGV[1])
+local allowed = 0
+if tokens >= cost or ARGV[5] == '1' then
+    allowed = 1
+    tokens = math.max(-capacity, math.min(capacity, tokens - cost))
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(2 * capacity / rate))
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketStore:
+    """Корзины в Redis (или совместимом сервере), общие для всех воркеров."""
+
+    blocking = True
+
+    def __init__(self, redis_url: str = "redis://localhost:6379/0"):
+        if not REDIS_AVAILABLE:
+            raise ImportError("Для RATE_LIMIT_BACKEND=redis установите redis")
+        self._client = redis.Redis.from_url(redis_url)
+        self._take = self._client.register_script(_REDIS_TAKE_SCRIPT)
+
+    def take(self, key: str, cost: float, capacity: float,
+             refill_per_second: float, force: bool = False) -> Tuple[bool, float]:
+        allowed, tokens = self._take(
+            keys=[f"ghostpen:ratelimit:{key}"],
+            args=[cost, capacity, refill_per_second, time.time(), "1" if force else "0"]
+        )
+        return bool(allowed), float(tokens)
+
+    def close(self) -> None:
+        self._client.close()
+
+
+def create_bucket_store(backend: str = "memory", sqlite_path: str = "ratelimit.db",
+                        redis_url: Optional[str] = None):
+    """
+    Создаёт хранилище корзин.
+
+    Args:
+        backend: "memory", "sqlite" или "redis"
+        sqlite_path: Файл SQLite (для "sqlite")
+        redis_url: URL сервера (для "redis")
+    """
+    if backend == "memory":
+        return MemoryBucketStore()
+    if backend == "sqlite":
+        return SQLiteBucketStore(sqlite_path)
+    if backend == "redis":
+        return RedisBucketStore(redis_url or "redis://localhost:6379/0")
+    raise ValueError(f"Неизвестный RATE_LIMIT_BACKEND: {backend}")
+
+
+class RateLimiter:
+    """Token bucket с ключом по пользователю поверх хранилища корзин."""
+
+    def __init__(self, store: Any, name: str, capacity: float, per_minute: float):
+        """
+        Args:
+            store: Хранилище корзин (общее для нескольких лимитов)
+            name: Имя лимита (префикс ключей в хранилище)
+            capacity: Ёмкость корзины (максимальный всплеск)
+            per_minute: Пополнение корзины в минуту
+        """
+        if capacity <= 0 or per_minute <= 0:
+            raise ValueError(f"Лимит {name}: ёмкость и пополнение должны быть больше нуля")
+        self.store = store
+        self.name = name
+        self.capacity = float(capacity)
+        self.refill_per_second = per_minute / 60.0
+        self.allowed = 0
+        self.rejected = 0
+        # Хранилища с вводом-выводом работают вне event loop
+        self._executor = ThreadPoolExecutor(max_workers=1) if store.blocking else None
+
+    async def _take(self, key: str, cost: float, force: bool) -> Tuple[bool, float]:
+        args = (f"{self.name}:{key}", cost, self.capacity, self.refill_per_second, force)
+        if self._executor is None:
+            return self.store.take(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.store.take, *args)
+
+    async def acquire(self, key: str, cost: float = 1.0) -> Tuple[bool, float]:
+        """
+        Списывает cost, если в корзине хватает.
+
+        Returns:
+            (разрешён ли запрос, через сколько секунд повторить при отказе)
+        """
+        cost = min(float(cost), self.capacity)
+        allowed, tokens = await self._take(key, cost, force=False)
+        if allowed:
+            self.allowed += 1
+            return True, 0.0
+        self.rejected += 1
+        return False, (cost - tokens) / self.refill_per_second
+
+    async def settle(self, key: str, delta: float) -> None:
+        """Досписывает (delta > 0) или возвращает (delta < 0) разницу с оценкой."""
+        if delta:
+            await self._take(key, delta, force=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика лимита в этом процессе."""
+        return {
+            "capacity": self.capacity,
+            "per_minute": self.refill_per_second * 60,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+    def close(self) -> None:
+        """Останавливает поток хранилища (хранилище закрывается отдельно)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
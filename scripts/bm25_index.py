@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Локальный BM25 индекс для GhostPen.
+
+Инвертированный индекс постов автора для выбора примеров, наиболее
+релевантных теме. Запрос обходит только списки вхождений терминов темы,
+поэтому остаётся быстрым и для десятков тысяч постов.
+"""
+
+import heapq
+import math
+import re
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+
+# Частые служебные слова, не несущие темы
+STOP_WORDS = {
+    'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то', 'все',
+    'она', 'так', 'его', 'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за', 'бы', 'по',
+    'только', 'ее', 'мне', 'было', 'вот', 'от', 'меня', 'еще', 'нет', 'о', 'об', 'из',
+    'ему', 'теперь', 'когда', 'даже', 'ну', 'ли', 'если', 'уже', 'или', 'ни', 'быть',
+    'был', 'до', 'вас', 'нибудь', 'уж', 'вам', 'там', 'потом', 'себя', 'ничего', 'ей',
+    'может', 'они', 'тут', 'где', 'есть', 'надо', 'ней', 'для', 'мы', 'тебя', 'их',
+    'чем', 'была', 'сам', 'чтоб', 'без', 'будто', 'чего', 'раз', 'тоже', 'себе', 'под',
+    'это', 'этот', 'эта', 'эти', 'при', 'про',
+    'the', 'a', 'an', 'of', 'to', 'in', 'and', 'or', 'is', 'for', 'on', 'with',
+}
+
+
+class BM25Index:
+    """Инвертированный индекс с ранжированием Okapi BM25."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, stem_length: int = 6):
+        """
+        Args:
+            k1: Насыщение частоты термина
+            b: Нормализация по длине документа
+            stem_length: Длина префикса слова, используемого как основа (грубый стемминг)
+        """
+        self.k1 = k1
+        self.b = b
+        self.stem_length = stem_length
+        self._word_pattern = re.compile(r'\w+', flags=re.UNICODE)
+
+        # термин -> {doc_id: частота}
+        self._postings: Dict[str, Dict[Hashable, int]] = {}
+        self._doc_lengths: Dict[Hashable, int] = {}
+        self._documents: Dict[Hashable, str] = {}
+        self._total_length = 0
+        # Счётчик изменений (для ключей кэшей)
+        self.version = 0
+
+    def tokenize(self, text: str) -> List[str]:
+        """Разбивает текст на основы слов без стоп-слов."""
+        tokens = []
+        for word in self._word_pattern.findall(text.lower()):
+            if len(word) < 2 or word in STOP_WORDS or word.isdigit():
+                continue
+            tokens.append(word[:self.stem_length])
+        return tokens
+
+    def add(self, doc_id: Hashable, text: str) -> None:
+        """Добавляет документ (повторное добавление заменяет его)."""
+        if doc_id in self._documents:
+            self.remove(doc_id)
+
+        tokens = self.tokenize(text)
+        frequencies: Dict[str, int] = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        for token, count in frequencies.items():
+            self._postings.setdefault(token, {})[doc_id] = count
+
+        self._documents[doc_id] = text
+        self._doc_lengths[doc_id] = len(tokens)
+        self._total_length += len(tokens)
+        self.version += 1
+
+    def remove(self, doc_id: Hashable) -> None:
+        """Удаляет документ из индекса."""
+        text = self._documents.pop(doc_id, None)
+        if text is None:
+            return
+        for token in set(self.tokenize(text)):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[token]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        self.version += 1
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        """ID документов в порядке добавления."""
+        return iter(self._documents)
+
+    def get(self, doc_id: Hashable) -> Optional[str]:
+        """Возвращает текст документа."""
+        return self._documents.get(doc_id)
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[Hashable, float]]:
+        """
+        Ищет документы, наиболее релевантные запросу.
+
+        Args:
+            query: Текст запроса (тема поста)
+            top_k: Сколько документов вернуть
+
+        Returns:
+            Список (doc_id, score) по убыванию релевантности
+        """
+        n_docs = len(self._documents)
+        if n_docs == 0:
+            return []
+
+        avg_length = self._total_length / n_docs or 1.0
+        scores: Dict[Hashable, float] = {}
+        for token in set(self.tokenize(query)):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
@@ -7,20 +7,34 @@ GhostPen Generator — основной модуль генерации пост
 """
 
 import json
+import logging
 import re
 import sys
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 
 # Добавляем путь к скриптам для импорта
 sys.path.insert(0, str(Path(__file__).parent))
-from prompt_builder import PromptBuilder
+from prompt_builder import PromptBuilder, DEFAULT_PROMPT_CACHE_BYTES
+from profile_store import ProfileStore
+from near_duplicates import NearDuplicateDetector
+from pipeline import GenerationPipeline
+from style_scorer import StyleScorer
+from tracing import span
+
+logger = logging.getLogger(__name__)
 
 
 class PostProcessor:
     """Обработчик сгенерированных постов."""
     
-    def __init__(self):
+    def __init__(self, duplicate_threshold: float = 0.5):
+        """
+        Args:
+            duplicate_threshold: Порог сходства (0-1), выше которого предложение считается повтором
+        """
+        self.duplicate_threshold = duplicate_threshold
         self.emoji_pattern = re.compile(
             "["
             "\U0001F600-\U0001F64F"
@@ -31,6 +45,8 @@ class PostProcessor:
             "\U000024C2-\U0001F251"
             "]+", flags=re.UNICODE
         )
+        # Предложение: текст до знака препинания вместе с самими знаками
+        self.sentence_pattern = re.compile(r'[^.!?]+[.!?]*|[.!?]+')
     
     def process(
         self,
@@ -43,6 +59,9 @@ class PostProcessor:
         """
         Обрабатывает сгенерированный текст.
         
+        Текст разбивается на предложения один раз, все этапы работают
+        со списком предложений, а склейка выполняется в самом конце.
+        
         Args:
             text: Сгенерированный текст
             target_length: Целевая длина
@@ -56,17 +75,20 @@ class PostProcessor:
         # Убираем лишние пробелы и переносы
         text = self._clean_whitespace(text)
         
+        # Единая сегментация на предложения
+        sentences = self._split_sentences(text)
+        
         # Корректируем длину
-        text = self._adjust_length(text, target_length)
+        sentences = self._adjust_length(sentences, target_length)
         
         # Убираем повторы
-        text = self._remove_repetitions(text)
+        sentences = self._remove_repetitions(sentences)
         
         # Корректируем эмодзи (если нужно)
-        text = self._adjust_emojis(text, emoji_density)
+        sentences = self._adjust_emojis(sentences, emoji_density)
         
-        # Корректируем структуру
-        text = self._adjust_structure(text, structure_type)
+        # Корректируем структуру и склеиваем
+        text = self._adjust_structure(sentences, structure_type)
         
         return text.strip()
     
@@ -80,133 +102,131 @@ class PostProcessor:
         text = re.sub(r'\n +', '\n', text)
         return text.strip()
     
-    def _adjust_length(self, text: str, target_length: int) -> str:
+    def _split_sentences(self, text: str) -> List[str]:
+        """Разбивает текст на предложения вместе с завершающими знаками."""
+        sentences = []
+        for match in self.sentence_pattern.finditer(text):
+            sentence = match.group().strip()
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+    
+    @staticmethod
+    def _joined_length(sentences: List[str]) -> int:
+        """Длина текста после склейки предложений через пробел."""
+        if not sentences:
+            return 0
+        return sum(len(s) for s in sentences) + len(sentences) - 1
+    
+    def _adjust_length(self, sentences: List[str], target_length: int) -> List[str]:
         """Улучшенная корректировка длины текста."""
-        current_length = len(text)
+        current_length = self._joined_length(sentences)
         tolerance = target_length * 0.25  # 25% допуск (увеличено)
+        limit = int(target_length + tolerance)
         
-        if current_length < target_length - tolerance:
-            # Текст слишком короткий - оставляем как есть
-            return text
-        elif current_length > target_length + tolerance:
-            # Улучшенное обрезание: по предложениям, сохраняя смысл
-            sentences = re.split(r'([.!?]+)', text)
-            result = ""
-            for i in range(0, len(sentences) - 1, 2):
-                if i + 1 < len(sentences):
-                    candidate = result + sentences[i] + sentences[i + 1]
-                    if len(candidate) <= target_length + tolerance:
-                        result = candidate
-                    else:
-                        # Если добавление предложения превышает лимит, останавливаемся
-                        break
-            
-            # Если результат слишком короткий, берем первые N символов
-            if len(result) < target_length * 0.5:
-                # Обрезаем по словам, чтобы не обрывать слово
-                words = text[:target_length + tolerance].split()
-                result = ' '.join(words[:-1]) if len(words) > 1 else text[:target_length]
-            
-            return result if result else text[:target_length]
+        if current_length <= limit:
+            # Текст короткий или в пределах допуска - оставляем как есть
+            return sentences
         
-        return text
+        # Улучшенное обрезание: по предложениям, сохраняя смысл
+        result = []
+        length = 0
+        for sentence in sentences:
+            added = len(sentence) + (1 if result else 0)
+            if length + added > limit:
+                # Если добавление предложения превышает лимит, останавливаемся
+                break
+            result.append(sentence)
+            length += added
+        
+        # Если результат слишком короткий, берем первые N символов
+        if length < target_length * 0.5:
+            text = ' '.join(sentences)
+            # Обрезаем по словам, чтобы не обрывать слово
+            words = text[:limit].split()
+            cut = ' '.join(words[:-1]) if len(words) > 1 else text[:target_length]
+            return [cut] if cut else result
+        
+        return result
     
-    def _remove_repetitions(self, text: str) -> str:
-        """Улучшенное удаление повторов фраз."""
-        sentences = re.split(r'([.!?]+)', text)
+    def _remove_repetitions(self, sentences: List[str]) -> List[str]:
+        """Удаляет повторы и почти-повторы предложений (MinHash)."""
+        detector = NearDuplicateDetector(threshold=self.duplicate_threshold)
         result = []
-        seen_phrases = set()
-        
-        for i in range(0, len(sentences) - 1, 2):
-            if i + 1 < len(sentences):
-                sentence = (sentences[i] + sentences[i + 1]).strip()
-                if not sentence:
-                    continue
-                
-                # Улучшенная проверка на повторы
-                words = sentence.lower().split()
-                if len(words) < 3:  # Слишком короткие предложения пропускаем
-                    result.append(sentence)
-                    continue
-                
-                # Проверяем первые 6 слов и последние 3
-                phrase_key_start = ' '.join(words[:6])
-                phrase_key_end = ' '.join(words[-3:]) if len(words) > 3 else ''
-                
-                # Проверяем на похожесть (не точное совпадение)
-                is_repetition = False
-                for seen in seen_phrases:
-                    if phrase_key_start in seen or seen in phrase_key_start:
-                        if len(sentence) > 30:  # Длинные предложения проверяем строже
-                            is_repetition = True
-                            break
-                
-                if not is_repetition:
-                    result.append(sentence)
-                    seen_phrases.add(phrase_key_start)
-                    if phrase_key_end:
-                        seen_phrases.add(phrase_key_end)
-        
-        return ' '.join(result) if result else text
+        
+        for index, sentence in enumerate(sentences):
+            if len(sentence.split()) < 3:  # Слишком короткие предложения пропускаем
+                result.append(sentence)
+                continue
+            
+            duplicate_of = detector.check_and_add(index, sentence)
+            # Короткие предложения допускаем повторять (риторика, связки)
+            if duplicate_of is None or len(sentence) <= 30:
+                result.append(sentence)
+        
+        return result if result else sentences
     
-    def _adjust_emojis(self, text: str, target_density: float) -> str:
+    def _adjust_emojis(self, sentences: List[str], target_density: float) -> List[str]:
         """Корректирует количество эмодзи."""
-        emojis = self.emoji_pattern.findall(text)
-        current_count = len(emojis)
+        current_count = sum(len(self.emoji_pattern.findall(s)) for s in sentences)
         target_count = int(target_density)
         
-        if current_count > target_count + 1:
-            # Убираем лишние эмодзи (оставляем первые)
-            emoji_positions = []
-            for match in self.emoji_pattern.finditer(text):
-                emoji_positions.append((match.start(), match.end()))
-            
-            # Удаляем эмодзи, начиная с конца
-            for start, end in reversed(emoji_positions[target_count:]):
-                text = text[:start] + text[end:]
+        if current_count <= target_count + 1:
+            return sentences
+        
+        # Убираем лишние эмодзи (оставляем первые) за один проход
+        remaining = target_count
+        
+        def keep_first(match):
+            nonlocal remaining
+            if remaining > 0:
+                remaining -= 1
+                return match.group()
+            return ''
         
-        return text
+        return [self.emoji_pattern.sub(keep_first, s) for s in sentences]
     
-    def _adjust_structure(self, text: str, structure_type: str) -> str:
-        """Корректирует структуру текста."""
-        # Убеждаемся, что есть абзацы
-        if '\n\n' not in text and len(text) > 200:
-            # Разбиваем по предложениям и создаём абзацы
-            sentences = re.split(r'([.!?]+)', text)
-            paragraphs = []
-            current_para = []
-            
-            for i in range(0, len(sentences) - 1, 2):
-                if i + 1 < len(sentences):
-                    sentence = (sentences[i] + sentences[i + 1]).strip()
-                    current_para.append(sentence)
-                    # Каждые 2-3 предложения - новый абзац
-                    if len(current_para) >= 2:
-                        paragraphs.append(' '.join(current_para))
-                        current_para = []
-            
-            if current_para:
-                paragraphs.append(' '.join(current_para))
-            
-            if paragraphs:
-                return '\n\n'.join(paragraphs)
+    def _adjust_structure(self, sentences: List[str], structure_type: str) -> str:
+        """Корректирует структуру текста и склеивает предложения."""
+        has_paragraphs = any('\n\n' in s for s in sentences)
         
-        return text
+        # Убеждаемся, что есть абзацы
+        if not has_paragraphs and self._joined_length(sentences) > 200:
+            # Каждые 2 предложения - новый абзац
+            paragraphs = [
+                ' '.join(sentences[i:i + 2])
+                for i in range(0, len(sentences), 2)
+            ]
+            return '\n\n'.join(paragraphs)
+        
+        return ' '.join(sentences)
+
+
+@lru_cache(maxsize=8)
+def _openai_client(api_key: str, base_url: Optional[str]):
+    """Клиент OpenAI на процесс: пул соединений переиспользуется между генерациями."""
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, base_url=base_url)
 
 
 class LLMInterface:
     """Интерфейс для работы с LLM."""
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-3.5-turbo"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-3.5-turbo",
+                 base_url: Optional[str] = None, stream: bool = False):
         """
         Инициализация LLM интерфейса.
         
         Args:
             api_key: API ключ (если None, используется mock)
             model: Модель для использования
+            base_url: OpenAI-совместимый сервер (None — api.openai.com)
+            stream: Получать ответ потоком (SSE)
         """
         self.api_key = api_key
         self.model = model
+        self.base_url = base_url
+        self.stream = stream
         self.use_mock = api_key is None
     
     def generate(self, prompt: str, max_tokens: int = 500) -> str:
@@ -220,19 +240,36 @@ class LLMInterface:
         Returns:
             Сгенерированный текст
         """
+        return self.generate_with_usage(prompt, max_tokens)[0]
+    
+    def generate_with_usage(self, prompt: str, max_tokens: int = 500) -> Tuple[str, Dict[str, int]]:
+        """
+        Генерирует текст и возвращает расход токенов.
+        
+        Returns:
+            (текст, {"prompt_tokens", "completion_tokens"}) — от API, а для
+            mock генерации оценка по длине текста
+        """
         if self.use_mock:
-            print("⚠️ [LLM] Используется MOCK генерация (API ключ не установлен)")
-            return self._mock_generate(prompt)
+            logger.debug("LLM: mock generation (API key not set)")
+            return self._mock_result(prompt)
         else:
-            print(f"✅ [LLM] Используется реальный OpenAI API (ключ: {self.api_key[:10]}...)")
             try:
-                result = self._openai_generate(prompt, max_tokens)
-                print(f"✅ [LLM] Генерация успешна, длина: {len(result)} символов")
-                return result
+                with span("llm.openai", model=self.model, max_tokens=max_tokens) as attempt:
+                    result, usage = self._openai_generate(prompt, max_tokens)
+                    attempt.set_attribute("llm.prompt_tokens", usage["prompt_tokens"])
+                    attempt.set_attribute("llm.completion_tokens", usage["completion_tokens"])
+                logger.debug("LLM: generated %d chars with %s", len(result), self.model)
+                return result, usage
             except Exception as e:
-                print(f"❌ [LLM] Ошибка OpenAI API: {e}")
-                print("⚠️ [LLM] Переключаемся на mock генерацию")
-                return self._mock_generate(prompt)
+                logger.warning("LLM: OpenAI API error, falling back to mock: %s", e)
+                return self._mock_result(prompt)
+    
+    def _mock_result(self, prompt: str) -> Tuple[str, Dict[str, int]]:
+        with span("llm.mock"):
+            text = self._mock_generate(prompt)
+        # ~3 символа на токен для кириллицы
+        return text, {"prompt_tokens": len(prompt) // 3 + 1, "completion_tokens": len(text) // 3 + 1}
     
     def _mock_generate(self, prompt: str) -> str:
         """Mock генерация для тестирования - извлекает тему и генерирует текст."""
@@ -325,13 +362,11 @@ class LLMInterface:
 
 Что вы думаете об этом?"""
     
-    def _openai_generate(self, prompt: str, max_tokens: int) -> str:
+    def _openai_generate(self, prompt: str, max_tokens: int) -> Tuple[str, Dict[str, int]]:
         """Генерация через OpenAI API."""
         try:
-            from openai import OpenAI
-            
-            client = OpenAI(api_key=self.api_key)
-            response = client.chat.completions.create(
+            client = _openai_client(self.api_key, self.base_url)
+            request = dict(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "Ты эксперт по созданию контента для социальных сетей."},
@@ -340,14 +375,45 @@ class LLMInterface:
                 max_tokens=max_tokens,
                 temperature=0.7
             )
+            if self.stream:
+                return self._openai_stream(client, request)
             
-            return response.choices[0].message.content.strip()
+            response = client.chat.completions.create(**request)
+            
+            usage = {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens
+            }
+            return response.choices[0].message.content.strip(), usage
         except ImportError:
-            print("⚠️  OpenAI не установлен, используется mock")
-            return self._mock_generate(prompt)
+            logger.warning("LLM: openai is not installed, using mock")
+            return self._mock_result(prompt)
         except Exception as e:
-            print(f"⚠️  Ошибка при генерации: {e}, используется mock")
-            return self._mock_generate(prompt)
+            logger.warning("LLM: generation failed, using mock: %s", e)
+            return self._mock_result(prompt)
+    
+    def _openai_stream(self, client, request: Dict[str, Any]) -> Tuple[str, Dict[str, int]]:
+        """Потоковая генерация: текст собирается из чанков, расход — из последнего."""
+        parts: List[str] = []
+        usage = None
+        chunks = client.chat.completions.create(
+            stream=True, stream_options={"include_usage": True}, **request
+        )
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            if chunk.usage is not None:
+                usage = {
+                    "prompt_tokens": chunk.usage.prompt_tokens,
+                    "completion_tokens": chunk.usage.completion_tokens
+                }
+        text = "".join(parts).strip()
+        if usage is None:
+            usage = {
+                "prompt_tokens": len(request["messages"][-1]["content"]) // 3 + 1,
+                "completion_tokens": len(text) // 3 + 1
+            }
+        return text, usage
 
 
 class GhostPenGenerator:
@@ -355,21 +421,44 @@ class GhostPenGenerator:
     
     def __init__(
         self,
-        profiles_path: Path,
+        profiles_path: Optional[Path] = None,
         llm_api_key: Optional[str] = None,
-        llm_model: str = "gpt-3.5-turbo"
+        llm_model: str = "gpt-3.5-turbo",
+        llm_base_url: Optional[str] = None,
+        llm_stream: bool = False,
+        track_allocations: bool = False,
+        prompt_cache_bytes: int = DEFAULT_PROMPT_CACHE_BYTES,
+        profile_store: Optional[ProfileStore] = None
     ):
         """
         Инициализация генератора.
         
         Args:
-            profiles_path: Путь к файлу с профилями
+            profiles_path: Путь к файлу с профилями (если не задан profile_store)
             llm_api_key: API ключ для LLM (опционально)
             llm_model: Модель LLM
+            llm_base_url: OpenAI-совместимый сервер (например, mock для нагрузочных тестов)
+            llm_stream: Получать ответ LLM потоком
+            track_allocations: Замерять выделение памяти по этапам pipeline
+            prompt_cache_bytes: Бюджет кэша промптов в байтах
+            profile_store: Хранилище профилей с горячей перезагрузкой
         """
-        self.prompt_builder = PromptBuilder(profiles_path)
-        self.llm = LLMInterface(llm_api_key, llm_model)
+        if profile_store is not None:
+            self.prompt_builder = PromptBuilder(cache_max_bytes=prompt_cache_bytes)
+            # Новые снимки профилей подхватываются без перезапуска
+            profile_store.subscribe(self.prompt_builder.load_snapshot)
+        else:
+            self.prompt_builder = PromptBuilder(profiles_path, cache_max_bytes=prompt_cache_bytes)
+        self.llm = LLMInterface(llm_api_key, llm_model, llm_base_url, llm_stream)
         self.processor = PostProcessor()
+        self.scorer = StyleScorer()
+        
+        # Этапы генерации; любой можно отключить через pipeline.disable(name)
+        self.pipeline = GenerationPipeline(track_allocations=track_allocations)
+        self.pipeline.register("build_prompt", self._stage_build_prompt)
+        self.pipeline.register("llm_generate", self._stage_llm_generate)
+        self.pipeline.register("post_process", self._stage_post_process)
+        self.pipeline.register("score", self._stage_score)
     
     def generate_post(
         self,
@@ -388,48 +477,82 @@ class GhostPenGenerator:
             additional_context: Дополнительный контекст
             
         Returns:
-            Словарь с результатом генерации
+            Словарь с результатом генерации (включая `stage_timings` по этапам)
         """
-        # 1. Строим промпт
-        prompt = self.prompt_builder.build_prompt(
-            author_id, platform, topic, additional_context
-        )
-        
-        # 2. Получаем профиль для параметров обработки
-        profile = self.prompt_builder.profiles[author_id]
+        # Параметры обработки из профиля
+        profile = self.prompt_builder.profiles.get(author_id)
+        if profile is None:
+            raise ValueError(f"Профиль автора {author_id} не найден")
         style = profile.get('style', {})
         platform_style = profile.get('platform_specific', {}).get(platform, {})
         
-        target_length = platform_style.get('avg_length', style.get('avg_post_length', 300))
-        emoji_density = platform_style.get('emoji_density', style.get('emoji_density', 0))
-        hashtag_density = platform_style.get('hashtag_density', style.get('hashtag_density', 0))
-        structure_type = style.get('structure_type', 'paragraphs')
-        
-        # 3. Генерируем через LLM
-        raw_text = self.llm.generate(prompt, max_tokens=500)
-        
-        # 4. Обрабатываем результат
-        processed_text = self.processor.process(
-            raw_text,
-            target_length,
-            emoji_density,
-            hashtag_density,
-            structure_type
-        )
+        context = {
+            "author_id": author_id,
+            "platform": platform,
+            "topic": topic,
+            "additional_context": additional_context,
+            "profile": profile,
+            "target_length": platform_style.get('avg_length', style.get('avg_post_length', 300)),
+            "emoji_density": platform_style.get('emoji_density', style.get('emoji_density', 0)),
+            "hashtag_density": platform_style.get('hashtag_density', style.get('hashtag_density', 0)),
+            "structure_type": style.get('structure_type', 'paragraphs'),
+            "prompt": "",
+            "raw_text": "",
+        }
+        self.pipeline.run(context)
+        
+        # Если post-processing отключен, отдаём сырой текст
+        processed_text = context.get("processed_text", context["raw_text"])
+        target_length = context["target_length"]
         
         return {
             "author_id": author_id,
             "platform": platform,
             "topic": topic,
             "generated_post": processed_text,
-            "raw_post": raw_text,
-            "prompt_used": prompt,
+            "raw_post": context["raw_text"],
+            "prompt_used": context["prompt"],
+            "style_scores": context.get("style_scores", {}),
+            "llm_usage": context.get("llm_usage"),
+            "stage_timings": context["stage_timings"],
             "metrics": {
                 "length": len(processed_text),
                 "target_length": target_length,
-                "length_match": abs(len(processed_text) - target_length) / target_length < 0.3
+                "length_match": abs(len(processed_text) - target_length) / target_length < 0.3 if target_length else False
             }
         }
+    
+    # === Этапы pipeline ===
+    
+    def _stage_build_prompt(self, context: Dict[str, Any]) -> None:
+        """1. Строим промпт."""
+        context["prompt"] = self.prompt_builder.build_prompt(
+            context["author_id"], context["platform"], context["topic"], context["additional_context"]
+        )
+    
+    def _stage_llm_generate(self, context: Dict[str, Any]) -> None:
+        """2. Генерируем через LLM."""
+        context["raw_text"], context["llm_usage"] = self.llm.generate_with_usage(
+            context["prompt"], max_tokens=500
+        )
+    
+    def _stage_post_process(self, context: Dict[str, Any]) -> None:
+        """3. Обрабатываем результат."""
+        context["processed_text"] = self.processor.process(
+            context["raw_text"],
+            context["target_length"],
+            context["emoji_density"],
+            context["hashtag_density"],
+            context["structure_type"]
+        )
+    
+    def _stage_score(self, context: Dict[str, Any]) -> None:
+        """4. Оцениваем стилевое сходство."""
+        context["style_scores"] = self.scorer.score(
+            context.get("processed_text", context["raw_text"]),
+            context["profile"],
+            context["platform"]
+        )
 
 
 def main():
@@ -460,6 +583,10 @@ def main():
         print("=" * 80)
         print(f"\nДлина: {result['metrics']['length']} символов (цель: {result['metrics']['target_length']})")
         print(f"Соответствие длине: {'✓' if result['metrics']['length_match'] else '✗'}")
+        print(f"Стилевое сходство: {result['style_scores'].get('overall_score', 0):.2f}")
+        print("\nЭтапы:")
+        for timing in result['stage_timings']:
+            print(f"  {timing['stage']:15s} {timing['duration_ms']:8.2f} мс")
     except ValueError as e:
         print(f"❌ Ошибка: {e}")
         sys.exit(1)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+LRU кэш с ограничением по объёму памяти для GhostPen.
+
+Вытесняет давно неиспользованные записи, когда суммарный размер значений
+превышает бюджет в байтах, и считает попадания, промахи и вытеснения.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """Потокобезопасный LRU кэш с бюджетом в байтах."""
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = sys.getsizeof,
+                 on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        """
+        Args:
+            max_bytes: Максимальный суммарный размер значений в байтах
+            sizeof: Функция оценки размера значения
+            on_evict: Вызывается (вне блокировки) для записей, вытесненных по бюджету
+        """
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._on_evict = on_evict
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Возвращает значение и помечает его как недавно использованное (None при промахе)."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Кладёт значение, вытесняя самые старые записи сверх бюджета."""
+        size = self._sizeof(value)
+        evicted = []
+        with self._lock:
+            replaced = key in self._data
+            if replaced:
+                previous = self._data.pop(key)
+                self.current_bytes -= self._sizes[key]
+            if size > self.max_bytes:
+                # Значение больше всего бюджета — не кэшируем; прежняя
+                # запись по этому ключу уходит как вытесненная
+                self._sizes.pop(key, None)
+                if replaced:
+                    self.evictions += 1
+                    evicted.append((key, previous))
+            else:
+                self._data[key] = value
+                self._sizes[key] = size
+                self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                old_key, old_value = self._data.popitem(last=False)
+                self.current_bytes -= self._sizes.pop(old_key)
+                self.evictions += 1
+                evicted.append((old_key, old_value))
+        if self._on_evict is not None:
+            for old_key, old_value in evicted:
+                self._on_evict(old_key, old_value)
+
+    def pop(self, key: Hashable) -> None:
+        """Удаляет запись (инвалидация)."""
+        with self._lock:
+            if key in self._data:
+                del self._data[key]
+                self.current_bytes -= self._sizes.pop(key)
+
+    def clear(self) -> None:
+        """Очищает кэш (статистика сохраняется)."""
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика кэша."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
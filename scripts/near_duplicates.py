@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate детектор для GhostPen.
+
+Находит почти одинаковые тексты (предложения, посты) через MinHash
+по символьным шинглам и LSH-бакеты. Сигнатура строится за один проход
+по шинглам (one permutation hashing), а проверка одного текста не зависит
+от количества уже добавленных, поэтому дедупликация списка линейна.
+"""
+
+import re
+import zlib
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+
+_MASK_64 = (1 << 64) - 1
+_GOLDEN_64 = 0x9E3779B97F4A7C15
+
+
+class NearDuplicateDetector:
+    """Детектор почти-дубликатов на основе MinHash + LSH."""
+
+    def __init__(
+        self,
+        threshold: float = 0.5,
+        shingle_size: int = 4,
+        num_perm: int = 64,
+        seed: int = 42
+    ):
+        """
+        Инициализация детектора.
+
+        Args:
+            threshold: Порог сходства Жаккара (0-1), выше которого тексты считаются дубликатами
+            shingle_size: Размер символьного шингла
+            num_perm: Длина MinHash сигнатуры
+            seed: Seed хэширования (сигнатуры стабильны между процессами)
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold должен быть в диапазоне (0, 1]")
+
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.num_perm = num_perm
+        self.seed = seed
+        self.bands, self.rows = self._choose_bands(num_perm, threshold)
+        self._word_pattern = re.compile(r'\w+', flags=re.UNICODE)
+
+        self._buckets: List[Dict[Tuple[int, ...], List[Hashable]]] = [
+            {} for _ in range(self.bands)
+        ]
+        self._signatures: Dict[Hashable, Tuple[int, ...]] = {}
+
+    @staticmethod
+    def _choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+        """Подбирает число бакетов LSH так, чтобы порог срабатывания был чуть ниже threshold."""
+        best = (num_perm, 1)
+        best_error = float('inf')
+        for bands in range(1, num_perm + 1):
+            if num_perm % bands:
+                continue
+            rows = num_perm // bands
+            lsh_threshold = (1 / bands) ** (1 / rows)
+            # Ложные пропуски хуже лишних кандидатов: порог LSH держим ниже
+            error = abs(lsh_threshold - threshold * 0.85)
+            if error < best_error:
+                best, best_error = (bands, rows), error
+        return best
+
+    def shingles(self, text: str) -> Set[int]:
+        """Возвращает множество 64-битных хэшей символьных шинглов нормализованного текста."""
+        normalized = ' '.join(self._word_pattern.findall(text.lower()))
+        k = self.shingle_size
+        if len(normalized) <= k:
+            pieces = [normalized]
+        else:
+            pieces = [normalized[i:i + k] for i in range(len(normalized) - k + 1)]
+        return {
+            ((zlib.crc32(piece.encode('utf-8'), self.seed) + 1) * _GOLDEN_64) & _MASK_64
+            for piece in pieces
+        }
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        """
+        Вычисляет MinHash сигнатуру текста.
+
+        Каждый шингл хэшируется один раз и попадает в одну из num_perm корзин,
+        в корзине хранится минимум. Пустые корзины заполняются из соседних
+        непустых (densification), чтобы короткие тексты не совпадали по пустотам.
+        """
+        n = self.num_perm
+        slots: List[Optional[int]] = [None] * n
+        for h in self.shingles(text):
+            slot, value = h % n, h // n
+            current = slots[slot]
+            if current is None or value < current:
+                slots[slot] = value
+
+        if None in slots:
+            original = list(slots)
+            for i in range(n):
+                if original[i] is None:
+                    # Ближайшая непустая корзина справа (по кругу) + смещение
+                    offset = 1
+                    while original[(i + offset) % n] is None:
+                        offset += 1
+                    slots[i] = original[(i + offset) % n] + offset
+        return tuple(slots)
+
+    def similarity(self, sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        """Оценка сходства Жаккара по двум сигнатурам."""
+        matches = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+        return matches / self.num_perm
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> Iterable[Tuple[int, ...]]:
+        for band in range(self.bands):
+            start = band * self.rows
+            yield signature[start:start + self.rows]
+
+    def find_duplicate(self, text: str, signature: Optional[Tuple[int, ...]] = None) -> Optional[Hashable]:
+        """
+        Ищет среди добавленных текстов почти-дубликат.
+
+        Returns:
+            Ключ найденного дубликата или None
+        """
+        signature = signature or self.signature(text)
+        checked: Set[Hashable] = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            for key in self._buckets[band].get(band_key, ()):
+                if key in checked:
+                    continue
+                checked.add(key)
+                if self.similarity(signature, self._signatures[key]) >= self.threshold:
+                    return key
+        return None
+
+    def add(self, key: Hashable, text: str, signature: Optional[Tuple[int, ...]] = None) -> None:
+        """Добавляет текст в индекс под ключом key."""
+        signature = signature or self.signature(text)
+        self._signatures[key] = signature
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def check_and_add(self, key: Hashable, text: str) -> Optional[Hashable]:
+        """
+        Проверяет текст на дубликат и добавляет его в индекс, если он уникален.
+
+        Returns:
+            Ключ найденного дубликата или None (текст добавлен)
+        """
+        signature = self.signature(text)
+        duplicate_of = self.find_duplicate(text, signature)
+        if duplicate_of is None:
+            self.add(key, text, signature)
+        return duplicate_of
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+
+def deduplicate(texts: List[str], threshold: float = 0.5, **kwargs) -> List[int]:
+    """
+    Удаляет почти-дубликаты из списка текстов (например, постов пользователя).
+
+    Args:
+        texts: Список текстов
+        threshold: Порог сходства Жаккара
+
+    Returns:
+        Индексы текстов, которые нужно оставить (первое вхождение)
+    """
+    detector = NearDuplicateDetector(threshold=threshold, **kwargs)
+    return [i for i, text in enumerate(texts) if detector.check_and_add(i, text) is None]
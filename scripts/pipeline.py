@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Pipeline генерации GhostPen.
+
+Последовательность именованных этапов (prompt → LLM → post-processing → scoring),
+каждый из которых можно отключить. Для каждого этапа замеряется время
+и (опционально) объём выделенной памяти.
+"""
+
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from tracing import span
+
+
+StageFunc = Callable[[Dict[str, Any]], None]
+StageListener = Callable[[Dict[str, Any]], None]
+
+
+class PipelineStage:
+    """Этап pipeline: имя, функция и флаг включения."""
+
+    def __init__(self, name: str, func: StageFunc, enabled: bool = True):
+        self.name = name
+        self.func = func
+        self.enabled = enabled
+
+    def __repr__(self) -> str:
+        return f"PipelineStage({self.name!r}, enabled={self.enabled})"
+
+
+class GenerationPipeline:
+    """Pipeline из зарегистрированных этапов с замером времени каждого."""
+
+    def __init__(self, track_allocations: bool = False):
+        """
+        Args:
+            track_allocations: Замерять пиковое выделение памяти на этапе (tracemalloc, медленнее)
+        """
+        self.track_allocations = track_allocations
+        self._stages: List[PipelineStage] = []
+        self._listeners: List[StageListener] = []
+
+    @property
+    def stages(self) -> List[PipelineStage]:
+        """Этапы в порядке выполнения."""
+        return list(self._stages)
+
+    def register(
+        self,
+        name: str,
+        func: StageFunc,
+        enabled: bool = True,
+        before: Optional[str] = None
+    ) -> None:
+        """
+        Регистрирует этап.
+
+        Args:
+            name: Уникальное имя этапа
+            func: Функция этапа, получает и изменяет контекст
+            enabled: Включён ли этап
+            before: Имя этапа, перед которым вставить новый (по умолчанию в конец)
+        """
+        if any(stage.name == name for stage in self._stages):
+            raise ValueError(f"Этап {name} уже зарегистрирован")
+
+        stage = PipelineStage(name, func, enabled)
+        if before is None:
+            self._stages.append(stage)
+        else:
+            self._stages.insert(self._index(before), stage)
+
+    def enable(self, name: str) -> None:
+        """Включает этап."""
+        self._stages[self._index(name)].enabled = True
+
+    def disable(self, name: str) -> None:
+        """Отключает этап."""
+        self._stages[self._index(name)].enabled = False
+
+    def add_listener(self, listener: StageListener) -> None:
+        """Добавляет обработчик, вызываемый с таймингом после каждого этапа (метрики, логи)."""
+        self._listeners.append(listener)
+
+    def _index(self, name: str) -> int:
+        for i, stage in enumerate(self._stages):
+            if stage.name == name:
+                return i
+        raise KeyError(f"Этап {name} не найден")
+
+    def run(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Выполняет включённые этапы по порядку.
+
+        Args:
+            context: Общий контекст этапов
+
+        Returns:
+            Контекст с результатами и списком таймингов в `stage_timings`
+        """
+        timings = context.setdefault('stage_timings', [])
+        trace_memory = self.track_allocations
+        if trace_memory and not tracemalloc.is_tracing():
+            # Трассировка остаётся включённой: параллельные запросы не должны её выключать
+            tracemalloc.start()
+
+        for stage in self._stages:
+            if not stage.enabled:
+                continue
+
+            if trace_memory:
+                tracemalloc.reset_peak()
+                memory_before = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            try:
+                with span(f"pipeline.{stage.name}"):
+                    stage.func(context)
+            finally:
+                timing = {
+                    "stage": stage.name,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                    "allocated_kb": None
+                }
+                if trace_memory:
+                    peak = tracemalloc.get_traced_memory()[1]
+                    timing["allocated_kb"] = round(max(peak - memory_before, 0) / 1024, 1)
+                timings.append(timing)
+                for listener in self._listeners:
+                    try:
+                        listener(timing)
+                    except Exception:
+                        pass  # Метрики не должны ломать генерацию
+
+        return context
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Хранилище профилей авторов для GhostPen.
+
+Загружает author_profiles.json в неизменяемый снимок и следит за файлом
+по mtime в фоновом потоке. При изменении файл парсится вне пути запроса,
+а новый снимок атомарно подменяет старый: запросы всегда читают целый
+снимок и никогда не платят за разбор JSON.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+
+def profile_version(profile: Dict[str, Any]) -> str:
+    """Версия профиля — короткий хэш его содержимого."""
+    payload = json.dumps(profile, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class ProfileSnapshot:
+    """Неизменяемый снимок профилей (профили не изменяются после загрузки)."""
+
+    __slots__ = ("profiles", "versions", "order", "file_signature", "loaded_at", "version")
+
+    def __init__(
+        self,
+        profiles: List[Dict[str, Any]],
+        file_signature: Optional[Tuple[int, int]] = None
+    ):
+        self.profiles: Mapping[str, Dict[str, Any]] = MappingProxyType(
+            {p['author_id']: p for p in profiles}
+        )
+        self.versions: Mapping[str, str] = MappingProxyType(
+            {author_id: profile_version(p) for author_id, p in self.profiles.items()}
+        )
+        self.order: Tuple[str, ...] = tuple(self.profiles)
+        self.file_signature = file_signature
+        self.loaded_at = time.time()
+        # Версия всего снимка (для ETag и ключей кэшей)
+        self.version = hashlib.sha1(
+            "|".join(f"{a}:{v}" for a, v in self.versions.items()).encode('utf-8')
+        ).hexdigest()[:16]
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if hasattr(self, name):
+            raise AttributeError("ProfileSnapshot неизменяем")
+        object.__setattr__(self, name, value)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __iter__(self):
+        """Профили в порядке файла."""
+        return (self.profiles[author_id] for author_id in self.order)
+
+
+SnapshotListener = Callable[[ProfileSnapshot], None]
+
+
+class ProfileStore:
+    """Хранилище профилей с горячей перезагрузкой по mtime."""
+
+    def __init__(self, profiles_path: Path, poll_interval: float = 2.0):
+        """
+        Args:
+            profiles_path: Путь к author_profiles.json
+            poll_interval: Период проверки файла в секундах (0 — без фонового потока)
+        """
+        self.profiles_path = Path(profiles_path)
+        self.poll_interval = poll_interval
+        self._snapshot = ProfileSnapshot([])
+        self._listeners: List[SnapshotListener] = []
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reload_if_changed()
+
+    @property
+    def snapshot(self) -> ProfileSnapshot:
+        """Текущий снимок (чтение ссылки атомарно)."""
+        return self._snapshot
+
+    def subscribe(self, listener: SnapshotListener) -> None:
+        """Подписывает обработчик на смену снимка и сразу вызывает его с текущим."""
+        self._listeners.append(listener)
+        listener(self._snapshot)
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.profiles_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def reload_if_changed(self) -> bool:
+        """
+        Перечитывает файл, если изменились его mtime или размер.
+
+        Returns:
+            True, если снимок был заменён
+        """
+        with self._reload_lock:
+            signature = self._file_signature()
+            if signature == self._snapshot.file_signature:
+                return False
+
+            if signature is None:
+                snapshot = ProfileSnapshot([], None)
+            else:
+                try:
+                    with open(self.profiles_path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    snapshot = ProfileSnapshot(data.get('profiles', []), signature)
+                except (OSError, ValueError, KeyError) as e:
+                    # Файл мог быть записан не полностью — оставляем прежний снимок
+                    print(f"⚠️ [ProfileStore] Не удалось загрузить {self.profiles_path}: {e}")
+                    return False
+
+            # Атомарная подмена ссылки
+            self._snapshot = snapshot
+
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"⚠️ [ProfileStore] Ошибка обработчика обновления профилей: {e}")
+        print(f"✅ [ProfileStore] Загружено профилей: {len(snapshot)} (версия {snapshot.version})")
+        return True
+
+    def start(self) -> None:
+        """Запускает фоновую проверку файла."""
+        if self.poll_interval <= 0 or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._watch, name="profile-store-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Останавливает фоновую проверку."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+    def _watch(self) -> None:
+        while not self._stop_event.wait(self.poll_interval):
+            self.reload_if_changed()
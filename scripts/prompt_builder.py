@@ -4,11 +4,37 @@ Prompt Builder для GhostPen.
 
 Строит идеальные промпты для LLM на основе стилевого профиля автора,
 требований платформы и темы поста.
+
+Промпт состоит из стабильного префикса (инструкция, стиль, примеры, правила
+платформы, формат), который компилируется один раз на (автор, платформа,
+версия профиля), и темы, которая добавляется в самый конец. Благодаря общему
+префиксу сборка промпта сводится к конкатенации, а у LLM-провайдера
+срабатывает кэширование префикса промпта.
 """
 
 import json
+import logging
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
+
+from bm25_index import BM25Index
+from lru_cache import LRUCache
+from profile_store import ProfileSnapshot, profile_version
+
+logger = logging.getLogger(__name__)
+
+
+# Бюджет кэша готовых промптов по умолчанию (4 МБ)
+DEFAULT_PROMPT_CACHE_BYTES = 4 * 1024 * 1024
+
+# Бюджет токенов на секцию примеров, подобранных по теме
+DEFAULT_EXAMPLES_TOKEN_BUDGET = 600
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов (1 токен ≈ 0.75 слова)."""
+    return int(len(text.split()) / 0.75)
 
 
 class PromptBuilder:
@@ -50,15 +76,32 @@ class PromptBuilder:
         }
     }
     
-    def __init__(self, profiles_path: Optional[Path] = None):
+    def __init__(
+        self,
+        profiles_path: Optional[Path] = None,
+        cache_max_bytes: int = DEFAULT_PROMPT_CACHE_BYTES,
+        examples_token_budget: int = DEFAULT_EXAMPLES_TOKEN_BUDGET,
+        max_examples: int = 3
+    ):
         """
         Инициализация Prompt Builder.
         
         Args:
             profiles_path: Путь к файлу с профилями авторов
+            cache_max_bytes: Бюджет LRU кэша готовых промптов в байтах
+            examples_token_budget: Бюджет токенов на примеры, подобранные по теме
+            max_examples: Максимум примеров в промпте
         """
         self.profiles = {}
-        self._prompt_cache = {}  # Кэш промптов для оптимизации
+        self.profile_versions: Dict[str, str] = {}
+        self.examples_token_budget = examples_token_budget
+        self.max_examples = max_examples
+        # BM25 индексы всех постов автора: author_id -> индекс
+        self.post_indexes: Dict[str, BM25Index] = {}
+        # LRU кэш промптов: (author_id, platform, версия профиля, тема) -> промпт
+        self._prompt_cache = LRUCache(cache_max_bytes)
+        # Скомпилированные префиксы: (author_id, platform, версия профиля) -> текст
+        self._prefix_cache: Dict[Tuple[str, str, str], str] = {}
         if profiles_path and profiles_path.exists():
             self.load_profiles(profiles_path)
     
@@ -67,7 +110,152 @@ class PromptBuilder:
         with open(profiles_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
             for profile in data.get('profiles', []):
-                self.profiles[profile['author_id']] = profile
+                self.add_profile(profile)
+    
+    def add_profile(self, profile: Dict[str, Any]) -> None:
+        """
+        Добавляет (или обновляет) профиль и сбрасывает его устаревшие префиксы.
+        
+        Профили не изменяются после загрузки, поэтому тот же объект (профиль
+        из кэша БД) принимается без повторной сериализации для версии.
+        """
+        author_id = profile['author_id']
+        if self.profiles.get(author_id) is profile:
+            return
+        version = self.profile_version(profile)
+        if self.profile_versions.get(author_id) != version:
+            self._prefix_cache = {
+                key: prefix for key, prefix in self._prefix_cache.items()
+                if key[0] != author_id
+            }
+        self.profiles[author_id] = profile
+        self.profile_versions[author_id] = version
+    
+    def remove_profile(self, author_id: str) -> None:
+        """Удаляет профиль, его индекс постов и префиксы (промпты вытеснит LRU)."""
+        self.profiles.pop(author_id, None)
+        self.profile_versions.pop(author_id, None)
+        self.post_indexes.pop(author_id, None)
+        self._prefix_cache = {
+            key: prefix for key, prefix in self._prefix_cache.items()
+            if key[0] != author_id
+        }
+    
+    def load_snapshot(self, snapshot: ProfileSnapshot) -> None:
+        """
+        Подменяет профили снимком из ProfileStore.
+        
+        Словари заменяются целиком (атомарно для читающих запросов),
+        префиксы изменившихся и удалённых профилей сбрасываются.
+        """
+        versions = dict(snapshot.versions)
+        self._prefix_cache = {
+            key: prefix for key, prefix in self._prefix_cache.items()
+            if versions.get(key[0]) == key[2]
+        }
+        self.profiles = dict(snapshot.profiles)
+        self.profile_versions = versions
+    
+    profile_version = staticmethod(profile_version)
+    
+    def set_post_index(self, author_id: str, index: BM25Index) -> None:
+        """Подключает индекс постов автора: примеры будут подбираться по теме."""
+        if self.post_indexes.get(author_id) is index:
+            return
+        self.post_indexes[author_id] = index
+        # Примеры уходят из префикса в тематическую часть промпта
+        self._prefix_cache = {
+            key: prefix for key, prefix in self._prefix_cache.items()
+            if key[0] != author_id
+        }
+    
+    def index_posts(self, author_id: str, posts: List[str]) -> BM25Index:
+        """Строит BM25 индекс по постам автора и подключает его."""
+        index = BM25Index()
+        for i, content in enumerate(posts):
+            index.add(i, content)
+        self.set_post_index(author_id, index)
+        return index
+    
+    def index_dataset(self, dataset_path: Path) -> int:
+        """
+        Индексирует все посты авторов из датасета (dataset.json).
+        
+        Returns:
+            Количество проиндексированных авторов
+        """
+        with open(dataset_path, 'r', encoding='utf-8') as f:
+            dataset = json.load(f)
+        
+        indexed = 0
+        for author in dataset.get('authors', []):
+            posts = [
+                post['content']
+                for platform_posts in author.get('platforms', {}).values()
+                for post in platform_posts
+            ]
+            if posts:
+                self.index_posts(author['author_id'], posts)
+                indexed += 1
+        return indexed
+    
+    def precompile(self, author_id: Optional[str] = None) -> int:
+        """
+        Заранее компилирует префиксы для всех платформ.
+        
+        Args:
+            author_id: ID автора (по умолчанию все загруженные авторы)
+            
+        Returns:
+            Количество скомпилированных префиксов
+        """
+        author_ids = [author_id] if author_id else list(self.profiles)
+        for current_id in author_ids:
+            for platform in self.PLATFORM_RULES:
+                self.get_prefix(current_id, platform)
+        return len(author_ids) * len(self.PLATFORM_RULES)
+    
+    def get_prefix(self, author_id: str, platform: str) -> str:
+        """
+        Возвращает стабильный префикс промпта для (автор, платформа).
+        
+        Префикс не зависит от темы и пересобирается только при смене версии профиля.
+        """
+        if author_id not in self.profiles:
+            raise ValueError(f"Профиль автора {author_id} не найден")
+        
+        key = (author_id, platform, self.profile_versions[author_id])
+        prefix = self._prefix_cache.get(key)
+        if prefix is None:
+            prefix = self._build_prefix(
+                self.profiles[author_id], platform,
+                include_examples=author_id not in self.post_indexes
+            )
+            self._prefix_cache[key] = prefix
+        return prefix
+    
+    def _build_prefix(self, profile: Dict, platform: str, include_examples: bool = True) -> str:
+        """
+        Собирает неизменяемую для (автор, платформа) часть промпта.
+        
+        Если у автора есть индекс постов, примеры зависят от темы
+        и добавляются после префикса, а не внутри него.
+        """
+        platform_rules = self.PLATFORM_RULES.get(platform, self.PLATFORM_RULES["facebook"])
+        
+        prompt_parts = [
+            # 1. Основная инструкция
+            self._build_main_instruction(profile, platform),
+            # 2. Стилевые характеристики
+            self._build_style_section(profile, platform),
+            # 3. Примеры постов (sample_posts профиля)
+            self._build_examples_section(profile) if include_examples else "",
+            # 4. Правила платформы
+            self._build_platform_rules(platform_rules),
+            # 5. Требования к формату
+            self._build_format_requirements(profile, platform),
+        ]
+        return "\n\n".join(part for part in prompt_parts if part)
     
     def build_prompt(
         self,
@@ -85,58 +273,45 @@ class PromptBuilder:
             platform: Платформа (linkedin, instagram, facebook, telegram)
             topic: Тема поста
             additional_context: Дополнительный контекст (опционально)
+            use_cache: Использовать кэш промптов
             
         Returns:
             Готовый промпт для LLM
         """
-        # Проверка кэша (только для одинаковых запросов без дополнительного контекста)
-        cache_key = f"{author_id}:{platform}:{topic}" if use_cache and not additional_context else None
-        if cache_key and cache_key in self._prompt_cache:
-            return self._prompt_cache[cache_key]
-        
-        if author_id not in self.profiles:
-            raise ValueError(f"Профиль автора {author_id} не найден")
-        
-        profile = self.profiles[author_id]
-        platform_rules = self.PLATFORM_RULES.get(platform, self.PLATFORM_RULES["facebook"])
-        
-        # Строим промпт
-        prompt_parts = []
+        # Проверка кэша (только для одинаковых запросов без дополнительного контекста).
+        # Версия профиля в ключе: после перестройки профиля старый промпт не вернётся
+        index = self.post_indexes.get(author_id)
+        cache_key = None
+        if use_cache and not additional_context and author_id in self.profile_versions:
+            cache_key = (
+                author_id, platform, self.profile_versions[author_id],
+                index.version if index is not None else None, topic
+            )
+            cached = self._prompt_cache.get(cache_key)
+            if cached is not None:
+                return cached
         
-        # 1. Основная инструкция
-        prompt_parts.append(self._build_main_instruction(profile, platform, topic))
+        # Стабильный префикс (+ примеры по теме) + тема в самом конце
+        prompt = self.get_prefix(author_id, platform)
+        if index is not None:
+            examples = self._build_relevant_examples_section(index, topic)
+            if examples:
+                prompt += "\n\n" + examples
+        prompt += "\n\n" + self._build_topic_section(topic, additional_context)
         
-        # 2. Стилевые характеристики
-        prompt_parts.append(self._build_style_section(profile, platform))
-        
-        # 3. Примеры постов
-        prompt_parts.append(self._build_examples_section(profile))
-        
-        # 4. Правила платформы
-        prompt_parts.append(self._build_platform_rules(platform_rules))
-        
-        # 5. Тема и контекст
-        prompt_parts.append(self._build_topic_section(topic, additional_context))
-        
-        # 6. Требования к формату
-        prompt_parts.append(self._build_format_requirements(profile, platform))
-        
-        prompt = "\n\n".join(prompt_parts)
-        
-        # Кэшируем промпт
+        # Кэшируем промпт (LRU, вытеснение по бюджету в байтах)
         if cache_key:
-            self._prompt_cache[cache_key] = prompt
-            # Ограничиваем размер кэша (максимум 100 промптов)
-            if len(self._prompt_cache) > 100:
-                # Удаляем самый старый (FIFO)
-                oldest_key = next(iter(self._prompt_cache))
-                del self._prompt_cache[oldest_key]
+            self._prompt_cache.put(cache_key, prompt)
         
         return prompt
     
-    def _build_main_instruction(self, profile: Dict, platform: str, topic: str) -> str:
-        """Строит основную инструкцию."""
-        return f"""Ты пишешь пост в стиле автора {profile['author_id']} для платформы {platform.upper()} на тему "{topic}".
+    def cache_stats(self) -> Dict[str, Any]:
+        """Статистика кэша промптов (hits, misses, evictions, bytes)."""
+        return self._prompt_cache.stats()
+    
+    def _build_main_instruction(self, profile: Dict, platform: str) -> str:
+        """Строит основную инструкцию (без темы — она идёт в конце промпта)."""
+        return f"""Ты пишешь пост в стиле автора {profile['author_id']} для платформы {platform.upper()} на тему, указанную в конце.
 
 Твоя задача: создать пост, который звучит как настоящий контент этого автора, но подходит под требования платформы."""
     
@@ -183,11 +358,9 @@ class PromptBuilder:
         """Строит секцию с примерами постов."""
         sample_posts = profile.get('sample_posts', [])
         if not sample_posts:
-            print(f"⚠️ [PromptBuilder] Нет sample_posts в профиле {profile.get('author_id', 'unknown')}")
+            logger.debug("PromptBuilder: no sample_posts in profile %s", profile.get('author_id', 'unknown'))
             return ""
         
-        print(f"✅ [PromptBuilder] Используем {len(sample_posts)} примеров постов для {profile.get('author_id', 'unknown')}")
-        
         examples_text = "ПРИМЕРЫ ПОСТОВ ЭТОГО АВТОРА:\n\n"
         for i, post in enumerate(sample_posts[:3], 1):
             # Если post - это словарь, извлекаем content
@@ -196,10 +369,45 @@ class PromptBuilder:
             else:
                 post_content = str(post)
             examples_text += f"Пример {i}:\n{post_content}\n\n"
-            print(f"   📄 Пример {i} добавлен (длина: {len(post_content)} символов)")
         
         return examples_text.strip()
     
+    def select_examples(self, index: BM25Index, topic: str) -> List[str]:
+        """
+        Выбирает самые релевантные теме посты в пределах бюджета токенов.
+        
+        Если по теме ничего не нашлось, берутся первые посты индекса.
+        """
+        candidates = [index.get(doc_id) for doc_id, _ in index.search(topic, top_k=self.max_examples * 4)]
+        if not candidates:
+            # ID документов — любые (UUID постов пользователя), не только номера
+            candidates = [index.get(doc_id) for doc_id in islice(index, self.max_examples * 4)]
+        
+        selected = []
+        budget = self.examples_token_budget
+        for content in candidates:
+            if not content:
+                continue
+            tokens = estimate_tokens(content)
+            if tokens > budget:
+                continue
+            selected.append(content)
+            budget -= tokens
+            if len(selected) >= self.max_examples:
+                break
+        return selected
+    
+    def _build_relevant_examples_section(self, index: BM25Index, topic: str) -> str:
+        """Строит секцию с примерами постов, подобранными по теме."""
+        examples = self.select_examples(index, topic)
+        if not examples:
+            return ""
+        
+        examples_text = "ПРИМЕРЫ ПОСТОВ ЭТОГО АВТОРА НА БЛИЗКИЕ ТЕМЫ:\n\n"
+        for i, post_content in enumerate(examples, 1):
+            examples_text += f"Пример {i}:\n{post_content}\n\n"
+        return examples_text.strip()
+    
     def _build_platform_rules(self, platform_rules: Dict) -> str:
         """Строит секцию с правилами платформы."""
         return f"""ТРЕБОВАНИЯ ПЛАТФОРМЫ:
@@ -233,7 +441,7 @@ class PromptBuilder:
         
         format_text += "- Не добавляй лишних символов или форматирования\n"
         format_text += "- Пост должен звучать естественно и человечно\n"
-        format_text += "\nСгенерируй пост, который соответствует всем требованиям выше."
+        format_text += "\nСгенерируй пост на тему ниже, который соответствует всем требованиям выше."
         
         return format_text
     
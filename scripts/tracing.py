@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Трассировка запросов GhostPen.
+
+Span — именованный интервал с trace_id, span_id и родителем. Текущий span
+хранится в contextvars, поэтому вложенные `with span(...)` (API → pipeline
+→ LLM → БД) автоматически становятся его детьми, в том числе в потоках,
+запущенных с copy_context(). Завершённые spans уходят в экспортёр:
+JSONL файл или OTLP/HTTP коллектор (JSON), в фоновом потоке пачками.
+"""
+
+import contextvars
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class Span:
+    """Интервал трассировки."""
+
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "name", "attributes",
+        "start_ns", "end_ns", "status"
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Span в виде OTLP JSON (поля как в opentelemetry-proto)."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()
+            ],
+            "status": {"code": 2 if self.status == "error" else 1},
+        }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "ghostpen_current_span", default=None
+)
+_exporter: Optional["BatchSpanExporter"] = None
+
+
+def new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+
+def current_span() -> Optional[Span]:
+    """Текущий span (None вне трассировки)."""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None,
+         **attributes) -> Iterator[Span]:
+    """
+    Открывает span как потомка текущего (или корень новой трассы).
+
+    Args:
+        name: Имя операции
+        trace_id: Продолжить внешнюю трассу (для корневого span запроса)
+        parent_id: Внешний родитель (из заголовка traceparent)
+        **attributes: Атрибуты span
+    """
+    parent = _current_span.get()
+    if parent is not None and trace_id is None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    current = Span(name, trace_id or new_trace_id(), parent_id, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.attributes["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        if _exporter is not None:
+            _exporter.submit(current)
+
+
+class BatchSpanExporter(ABC):
+    """Фоновая отправка spans пачками; при переполнении очереди spans отбрасываются."""
+
+    def __init__(self, max_queue: int = 10_000, batch_size: int = 512, interval: float = 1.0):
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ghostpen-tracing", daemon=True)
+        self._thread.start()
+
+    def submit(self, finished: Span) -> None:
+        try:
+            self._queue.put_nowait(finished)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self) -> List[Span]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._stop.wait(self.interval)
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                try:
+                    self.export(batch)
+                except Exception as e:
+                    logging.getLogger(__name__).warning("tracing: export failed: %s", e)
+
+    @abstractmethod
+    def export(self, batch: List[Span]) -> None:
+        """Отправляет пачку завершённых spans (вызывается из фонового потока)."""
+
+    def shutdown(self) -> None:
+        """Отправляет оставшиеся spans и останавливает поток."""
+        self._stop.set()
+        self._thread.join()
+
+
+class JsonlSpanExporter(BatchSpanExporter):
+    """Spans в файл, по одному OTLP JSON объекту на строку."""
+
+    def __init__(self, path: str, **kwargs):
+        self.path = path
+        super().__init__(**kwargs)
+
+    def export(self, batch: List[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for finished in batch:
+                f.write(json.dumps(finished.to_dict(), ensure_ascii=False) + "\n")
+
+
+class OTLPHttpSpanExporter(BatchSpanExporter):
+    """Spans на OTLP/HTTP коллектор в JSON кодировке (POST /v1/traces)."""
+
+    def __init__(self, endpoint: str = "http://localhost:4318/v1/traces",
+                 service_name: str = "ghostpen-api", **kwargs):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        super().__init__(**kwargs)
+
+    def export(self, batch: List[Span]) -> None:
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": self.service_name}}
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": "ghostpen"},
+                "spans": [finished.to_dict() for finished in batch],
+            }],
+        }]}
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+
+def configure(exporter: Optional[BatchSpanExporter]) -> None:
+    """Устанавливает экспортёр (None — spans не экспортируются, только ID в логах)."""
+    global _exporter
+    _exporter = exporter
+
+
+def shutdown() -> None:
+    """Дописывает spans и останавливает экспортёр."""
+    global _exporter
+    if _exporter is not None:
+        exporter, _exporter = _exporter, None
+        exporter.shutdown()
+
+
+def exporter_stats() -> Dict[str, Any]:
+    if _exporter is None:
+        return {"exporter": None}
+    return {"exporter": type(_exporter).__name__, "dropped": _exporter.dropped}
+
+
+def install_log_context() -> None:
+    """Добавляет trace_id и span_id текущего span в каждую запись logging."""
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, "_ghostpen_tracing", False):
+        return
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        current = _current_span.get()
+        if current is not None:
+            record.trace_id = current.trace_id
+            record.span_id = current.span_id
+        return record
+
+    record_factory._ghostpen_tracing = True
+    logging.setLogRecordFactory(record_factory)
+
+
+def parse_traceparent(header: Optional[str]):
+    """W3C traceparent → (trace_id, parent_span_id) или (None, None)."""
+    if header:
+        parts = header.strip().split("-")
+        if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+            return parts[1], parts[2]
+    return None, None
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware: корневой span на HTTP запрос.
+
+    Продолжает трассу из заголовка traceparent и возвращает её ID
+    в заголовке X-Trace-Id (по нему медленный запрос находится в экспорте).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        trace_id, parent_id = parse_traceparent(
+            headers.get(b"traceparent", b"").decode("latin-1")
+        )
+        with span(f"HTTP {scope['method']}", trace_id=trace_id, parent_id=parent_id,
+                  **{"http.method": scope["method"], "http.target": scope["path"]}) as request_span:
+
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    request_span.set_attribute("http.status_code", message["status"])
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-trace-id", request_span.trace_id.encode("ascii"))
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace_id)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    request_span.name = f"HTTP {scope['method']} {route.path}"
+                    request_span.set_attribute("http.route", route.path)
@@ -0,0 +1,8 @@
+"""Модули API и scripts импортируются так же, как при запуске из api/."""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for directory in (ROOT / "api", ROOT / "scripts"):
+    sys.path.insert(0, str(directory))
@@ -0,0 +1,68 @@
+"""Тесты BM25 индекса постов."""
+
+from bm25_index import BM25Index
+
+
+def make_index():
+    index = BM25Index()
+    index.add("plan", "Планирование недели: цели, задачи и приоритеты")
+    index.add("books", "Какие книги я читаю в отпуске")
+    index.add("team", "Команда важнее процессов, а цели команды важнее задач")
+    return index
+
+
+def test_search_ranks_relevant_documents():
+    results = make_index().search("планирование и цели", top_k=2)
+    assert [doc_id for doc_id, _ in results] == ["plan", "team"]
+    assert results[0][1] > results[1][1] > 0
+
+
+def test_search_without_matches():
+    assert make_index().search("футбол") == []
+    assert BM25Index().search("цели") == []
+
+
+def test_remove_drops_postings():
+    index = make_index()
+    index.remove("plan")
+    assert len(index) == 2
+    assert index.get("plan") is None
+    assert [doc_id for doc_id, _ in index.search("планирование")] == []
+    assert [doc_id for doc_id, _ in index.search("цели")] == ["team"]
+
+
+def test_remove_unknown_document_is_noop():
+    index = make_index()
+    version = index.version
+    index.remove("missing")
+    assert len(index) == 3
+    assert index.version == version
+
+
+def test_add_replaces_document():
+    index = make_index()
+    index.add("books", "Планирование бюджета")
+    assert len(index) == 3
+    assert index.get("books") == "Планирование бюджета"
+    assert index.search("отпуске") == []
+    assert {doc_id for doc_id, _ in index.search("планирование")} == {"plan", "books"}
+
+
+def test_add_remove_restores_state():
+    index = make_index()
+    before = index.search("цели команды")
+    index.add("extra", "Цели и команды")
+    index.remove("extra")
+    assert index.search("цели команды") == before
+
+
+def test_iterates_ids_in_insertion_order():
+    assert list(make_index()) == ["plan", "books", "team"]
+
+
+def test_version_changes_on_every_write():
+    index = BM25Index()
+    index.add("a", "текст")
+    index.add("a", "другой текст")
+    index.remove("a")
+    assert index.version == 4  # замена = удаление + добавление
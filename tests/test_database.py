@@ -0,0 +1,103 @@
+"""Тесты SQLite бэкенда: keyset пагинация, проекция колонок и FTS5 поиск."""
+
+import pytest
+
+from database import Database, project_post_columns
+
+
+@pytest.fixture
+def db(tmp_path):
+    # Database — singleton: каждому тесту свой файл БД
+    Database._instance = None
+    Database._initialized = False
+    database = Database(str(tmp_path / "ghostpen.db"))
+    database.create_user("u1", name="User")
+    database.create_user("u2", name="Other")
+    yield database
+    database.close()
+    Database._instance = None
+    Database._initialized = False
+
+
+def add_timeline(db, user_id="u1"):
+    """Посты с одинаковыми timestamp: порядок внутри решает id."""
+    timestamps = ["2024-01-01T10:00", "2024-01-02T10:00", "2024-01-02T10:00",
+                  "2024-01-03T10:00", "2024-01-03T10:00"]
+    for i, timestamp in enumerate(timestamps):
+        platform = "linkedin" if i % 2 else "telegram"
+        db.add_post(user_id, platform, f"Пост {i}", timestamp=timestamp)
+
+
+def test_keyset_pages_cover_all_posts_once(db):
+    add_timeline(db)
+    add_timeline(db, "u2")
+    expected = [(p["timestamp"], p["id"]) for p in db.get_user_posts("u1")]
+    assert expected == sorted(expected, reverse=True)
+
+    pages, after = [], None
+    while True:
+        page = db.get_user_posts("u1", limit=2, after=after, columns=("content",))
+        if not page:
+            break
+        pages.append(page)
+        after = (page[-1]["timestamp"], page[-1]["id"])
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [(p["timestamp"], p["id"]) for page in pages for p in page] == expected
+
+
+def test_keyset_pagination_with_platform(db):
+    add_timeline(db)
+    first = db.get_user_posts("u1", platform="linkedin", limit=1)
+    rest = db.get_user_posts("u1", platform="linkedin",
+                             after=(first[0]["timestamp"], first[0]["id"]))
+    assert [p["content"] for p in first + rest] == ["Пост 3", "Пост 1"]
+
+
+def test_column_projection(db):
+    db.add_post("u1", "linkedin", "Текст", hashtags=["#цели"])
+    post, = db.get_user_posts("u1", columns=("content", "hashtags"))
+    assert set(post) == {"id", "timestamp", "content", "hashtags"}
+    assert post["hashtags"] == ["#цели"]
+
+
+def test_project_post_columns_rejects_unknown():
+    assert project_post_columns(["content"]) == ("id", "timestamp", "content")
+    with pytest.raises(ValueError):
+        project_post_columns(["content", "password_hash"])
+
+
+def test_fts_index_follows_insert_update_and_delete(db):
+    first = db.add_post("u1", "linkedin", "Планирование недели и цели")
+    db.add_post("u1", "telegram", "Книги, которые я читаю")
+    db.add_post("u2", "linkedin", "Планирование бюджета")
+
+    hits = db.search_user_posts("u1", "планирован")
+    assert [hit["id"] for hit in hits] == [first]
+    assert "<mark>Планирование</mark>" in hits[0]["snippet"]
+
+    conn = db.get_connection()
+    with conn:
+        conn.execute("UPDATE user_posts SET content = ? WHERE id = ?", ("Итоги года", first))
+    assert db.search_user_posts("u1", "планирован") == []
+    assert [hit["id"] for hit in db.search_user_posts("u1", "итоги")] == [first]
+
+    assert db.delete_post(first, "u1")
+    assert db.search_user_posts("u1", "итоги") == []
+    assert conn.execute(
+        "INSERT INTO user_posts_fts(user_posts_fts) VALUES ('integrity-check')"
+    ).fetchall() == []
+
+
+def test_fts_phrases_and_platform_filter(db):
+    db.add_post("u1", "linkedin", "Команда важнее процессов")
+    db.add_post("u1", "telegram", "Процессов больше, чем команда")
+    assert len(db.search_user_posts("u1", '"команда важнее"')) == 1
+    assert len(db.search_user_posts("u1", "команда процессов")) == 2
+    assert len(db.search_user_posts("u1", "команда", platform="telegram")) == 1
+
+
+def test_fts_query_operators_are_not_interpreted(db):
+    db.add_post("u1", "linkedin", "AND OR NOT NEAR")
+    assert len(db.search_user_posts("u1", "NOT OR*")) == 1
+    assert db.search_user_posts("u1", '"" ( ) *') == []
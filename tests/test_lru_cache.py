@@ -0,0 +1,94 @@
+"""Тесты LRU кэша с бюджетом в байтах."""
+
+from lru_cache import LRUCache
+
+
+def make_cache(max_bytes, evicted=None):
+    on_evict = (lambda key, value: evicted.append((key, value))) if evicted is not None else None
+    return LRUCache(max_bytes, sizeof=len, on_evict=on_evict)
+
+
+def test_evicts_least_recently_used():
+    evicted = []
+    cache = make_cache(6, evicted)
+    cache.put("a", "aa")
+    cache.put("b", "bb")
+    cache.put("c", "cc")
+    assert cache.get("a") == "aa"  # "b" становится самым старым
+    cache.put("d", "dd")
+
+    assert "b" not in cache
+    assert [cache.get(key) for key in ("a", "c", "d")] == ["aa", "cc", "dd"]
+    assert evicted == [("b", "bb")]
+    assert cache.current_bytes == 6
+
+
+def test_replace_updates_size():
+    cache = make_cache(10)
+    cache.put("a", "aa")
+    cache.put("a", "aaaaa")
+    assert cache.current_bytes == 5
+    assert len(cache) == 1
+
+
+def test_growing_entry_evicts_others():
+    evicted = []
+    cache = make_cache(6, evicted)
+    cache.put("a", "aa")
+    cache.put("b", "bb")
+    cache.put("b", "bbbbb")
+    assert evicted == [("a", "aa")]
+    assert cache.current_bytes == 5
+
+
+def test_oversized_value_is_not_cached():
+    evicted = []
+    cache = make_cache(4, evicted)
+    cache.put("a", "aaaaa")
+    assert "a" not in cache
+    assert cache.current_bytes == 0
+    assert evicted == []
+
+
+def test_oversized_replacement_evicts_previous_value():
+    evicted = []
+    cache = make_cache(4, evicted)
+    cache.put("a", "aa")
+    cache.put("a", "aaaaa")
+    assert "a" not in cache
+    assert cache.current_bytes == 0
+    assert evicted == [("a", "aa")]
+
+
+def test_pop_and_clear_do_not_call_on_evict():
+    evicted = []
+    cache = make_cache(10, evicted)
+    cache.put("a", "aa")
+    cache.put("b", "bb")
+    cache.pop("a")
+    assert cache.current_bytes == 2
+    cache.clear()
+    assert len(cache) == 0 and cache.current_bytes == 0
+    assert evicted == []
+
+
+def test_on_evict_runs_outside_lock():
+    # Колбэк может обращаться к тому же кэшу без взаимоблокировки
+    seen = []
+    cache = LRUCache(2, sizeof=len, on_evict=lambda key, value: seen.append(cache.stats()["entries"]))
+    cache.put("a", "aa")
+    cache.put("b", "bb")
+    assert seen == [1]
+
+
+def test_stats():
+    cache = make_cache(4)
+    cache.put("a", "aa")
+    cache.get("a")
+    cache.get("missing")
+    cache.put("b", "bb")
+    cache.put("c", "cc")
+    assert cache.stats() == {
+        "entries": 2, "bytes": 4, "max_bytes": 4,
+        "hits": 1, "misses": 1, "evictions": 1, "hit_rate": 0.5,
+    }
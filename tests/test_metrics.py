@@ -0,0 +1,80 @@
+"""Тесты экспозиции метрик в текстовом формате Prometheus."""
+
+import pytest
+
+from metrics import Counter, Gauge, Histogram, MetricsRegistry, _Metric
+
+
+def test_counter_exposition():
+    counter = Counter("requests_total", "Requests", ("route", "status"))
+    counter.inc(route="/api/generate", status=200)
+    counter.inc(2, route="/api/generate", status=200)
+    counter.inc(route="/api/authors", status=304)
+    assert counter.render() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{route="/api/generate",status="200"} 3',
+        'requests_total{route="/api/authors",status="304"} 1',
+    ]
+
+
+def test_counter_set_total_and_unlabeled():
+    counter = Counter("cache_hits_total", "Hits")
+    counter.set_total(7)
+    counter.set_total(9)
+    assert counter.samples() == ["cache_hits_total 9"]
+
+
+def test_label_values_are_escaped():
+    counter = Counter("errors_total", "Errors", ("message",))
+    counter.inc(message='bad "quote"\\\n')
+    assert counter.samples() == ['errors_total{message="bad \\"quote\\"\\\\\\n"} 1']
+
+
+def test_gauge_set_inc_dec():
+    gauge = Gauge("in_flight", "In flight")
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    assert gauge.samples() == ["in_flight 1"]
+    gauge.set(0.25)
+    assert gauge.render()[1] == "# TYPE in_flight gauge"
+    assert gauge.samples() == ["in_flight 0.25"]
+
+
+def test_histogram_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, stage="llm")
+    assert histogram.samples() == [
+        'latency_seconds_bucket{stage="llm",le="0.1"} 2',
+        'latency_seconds_bucket{stage="llm",le="1"} 3',
+        'latency_seconds_bucket{stage="llm",le="+Inf"} 4',
+        'latency_seconds_sum{stage="llm"} 3.65',
+        'latency_seconds_count{stage="llm"} 4',
+    ]
+
+
+def test_histogram_timer():
+    histogram = Histogram("block_seconds", "Block", buckets=(60.0,))
+    with histogram.time():
+        pass
+    assert histogram.samples()[-1] == "block_seconds_count 1"
+    assert histogram.samples()[0] == 'block_seconds_bucket{le="60"} 1'
+
+
+def test_registry_runs_collectors_and_survives_errors():
+    registry = MetricsRegistry()
+    gauge = registry.register(Gauge("entries", "Entries"))
+
+    def failing():
+        raise RuntimeError("source unavailable")
+
+    registry.add_collector(failing)
+    registry.add_collector(lambda: gauge.set(5))
+    assert registry.render() == "# HELP entries Entries\n# TYPE entries gauge\nentries 5\n"
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        _Metric("x", "x")
@@ -0,0 +1,46 @@
+"""Тесты MinHash/LSH детектора почти-дубликатов."""
+
+import pytest
+
+from near_duplicates import NearDuplicateDetector, deduplicate
+
+SENTENCE = "Планирование недели помогает мне держать фокус на главных задачах"
+
+
+def test_finds_near_duplicate():
+    detector = NearDuplicateDetector(threshold=0.5)
+    assert detector.check_and_add("a", SENTENCE) is None
+    assert detector.check_and_add("b", SENTENCE.lower() + "!") == "a"
+    assert detector.check_and_add("c", "Планирование недели помогает мне держать фокус на важных задачах") == "a"
+    assert len(detector) == 1
+
+
+def test_distinct_texts_are_kept():
+    detector = NearDuplicateDetector(threshold=0.5)
+    assert detector.check_and_add("a", SENTENCE) is None
+    assert detector.check_and_add("b", "Вчера я дочитал книгу о распределённых системах") is None
+    assert len(detector) == 2
+
+
+def test_signature_is_deterministic():
+    a, b = NearDuplicateDetector(), NearDuplicateDetector()
+    assert a.signature(SENTENCE) == b.signature(SENTENCE)
+    assert len(a.signature(SENTENCE)) == a.num_perm
+    assert a.similarity(a.signature(SENTENCE), b.signature(SENTENCE)) == 1.0
+
+
+def test_short_texts_do_not_collide():
+    detector = NearDuplicateDetector(threshold=0.5)
+    assert detector.check_and_add("a", "Да") is None
+    assert detector.check_and_add("b", "Нет") is None
+
+
+def test_deduplicate_keeps_first_occurrence():
+    texts = [SENTENCE, "Совсем другая мысль о команде и процессах", SENTENCE + ".", SENTENCE.upper()]
+    assert deduplicate(texts) == [0, 1]
+
+
+@pytest.mark.parametrize("threshold", [0, -0.1, 1.5])
+def test_rejects_invalid_threshold(threshold):
+    with pytest.raises(ValueError):
+        NearDuplicateDetector(threshold=threshold)
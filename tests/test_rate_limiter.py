@@ -0,0 +1,81 @@
+"""Тесты token bucket и хранилищ корзин."""
+
+import asyncio
+
+import pytest
+
+import rate_limiter
+from rate_limiter import MemoryBucketStore, RateLimiter, SQLiteBucketStore, apply_cost
+
+
+def test_apply_cost_refills_up_to_capacity():
+    assert apply_cost(0, 0, 10, 5, capacity=10, refill_per_second=1) == (True, 5)
+    assert apply_cost(0, 0, 100, 5, capacity=10, refill_per_second=1) == (True, 5)
+
+
+def test_apply_cost_rejects_without_spending():
+    assert apply_cost(3, 0, 0, 5, capacity=10, refill_per_second=1) == (False, 3)
+
+
+def test_apply_cost_force_goes_into_bounded_debt():
+    assert apply_cost(3, 0, 0, 5, capacity=10, refill_per_second=1, force=True) == (True, -2)
+    assert apply_cost(3, 0, 0, 50, capacity=10, refill_per_second=1, force=True) == (True, -10)
+
+
+def test_apply_cost_refund_is_capped_at_capacity():
+    assert apply_cost(9, 0, 0, -5, capacity=10, refill_per_second=1) == (True, 10)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        store = MemoryBucketStore()
+    else:
+        store = SQLiteBucketStore(str(tmp_path / "ratelimit.db"))
+    yield store
+    store.close()
+
+
+def test_store_keeps_buckets_separate(store):
+    assert store.take("a", 10, 10, 0.001) == (True, 0)
+    assert store.take("a", 1, 10, 0.001)[0] is False
+    assert store.take("b", 1, 10, 0.001)[0] is True
+
+
+def test_prune_uses_each_bucket_parameters(store, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "PRUNE_EVERY", 1)
+    # Медленная корзина токенов не должна удаляться быстрым лимитом
+    store.take("tokens:u", 30_000, 40_000, 20_000 / 60)
+    store.take("requests:u", 1, 10, 10 / 60)
+    assert store.take("tokens:u", 10_001, 40_000, 20_000 / 60)[0] is False
+
+
+def test_limiter_rejects_with_retry_after():
+    limiter = RateLimiter(MemoryBucketStore(), "test", capacity=2, per_minute=60)
+
+    async def scenario():
+        assert (await limiter.acquire("u"))[0]
+        assert (await limiter.acquire("u"))[0]
+        return await limiter.acquire("u")
+
+    allowed, retry_after = asyncio.run(scenario())
+    assert not allowed
+    assert 0 < retry_after <= 1
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_limiter_settle_refunds():
+    limiter = RateLimiter(MemoryBucketStore(), "test", capacity=1, per_minute=0.001)
+
+    async def scenario():
+        assert (await limiter.acquire("u"))[0]
+        await limiter.settle("u", -1)
+        return await limiter.acquire("u")
+
+    assert asyncio.run(scenario())[0]
+
+
+@pytest.mark.parametrize("capacity, per_minute", [(1, 0), (0, 10), (5, -1)])
+def test_limiter_rejects_non_positive_limits(capacity, per_minute):
+    with pytest.raises(ValueError):
+        RateLimiter(MemoryBucketStore(), "test", capacity, per_minute)
@@ -0,0 +1,99 @@
+"""Тесты подписи и проверки JWT (HS256 и EdDSA)."""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from auth import TokenCodec, _b64url_decode, _b64url_encode
+
+ed25519 = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.ed25519")
+
+
+@pytest.fixture
+def codec():
+    return TokenCodec("EdDSA", private_key=ed25519.Ed25519PrivateKey.generate())
+
+
+def test_eddsa_round_trip(codec):
+    exp = datetime.now(timezone.utc) + timedelta(minutes=5)
+    claims = codec.decode(codec.encode({"sub": "user-1", "exp": exp}))
+    assert claims == {"sub": "user-1", "exp": int(exp.timestamp())}
+
+
+def test_eddsa_verify_only_codec(codec):
+    token = codec.encode({"sub": "user-1"})
+    verifier = TokenCodec("EdDSA", public_key=codec.public_key)
+    assert verifier.decode(token) == {"sub": "user-1"}
+    with pytest.raises(RuntimeError):
+        verifier.encode({"sub": "user-1"})
+
+
+def test_eddsa_rejects_tampered_payload(codec):
+    header, payload, signature = codec.encode({"sub": "user-1"}).split(".")
+    forged = _b64url_encode(b'{"sub":"admin"}')
+    assert codec.decode(f"{header}.{forged}.{signature}") is None
+
+
+def test_eddsa_rejects_other_key(codec):
+    other = TokenCodec("EdDSA", private_key=ed25519.Ed25519PrivateKey.generate())
+    assert codec.decode(other.encode({"sub": "user-1"})) is None
+
+
+def test_eddsa_rejects_expired(codec):
+    assert codec.decode(codec.encode({"sub": "user-1", "exp": int(time.time()) - 1})) is None
+
+
+@pytest.mark.parametrize("token", ["", "a.b", "a.b.c.d", "!!.??.**"])
+def test_eddsa_rejects_malformed(codec, token):
+    assert codec.decode(token) is None
+
+
+@pytest.mark.parametrize("header, claims", [(b"[]", b'{"sub":"x"}'), (b'{"alg":"EdDSA"}', b"[]")])
+def test_eddsa_rejects_non_object_segments(codec, header, claims):
+    signing_input = f"{_b64url_encode(header)}.{_b64url_encode(claims)}"
+    signature = codec.private_key.sign(signing_input.encode("ascii"))
+    assert codec.decode(f"{signing_input}.{_b64url_encode(signature)}") is None
+
+
+def test_eddsa_rejects_other_algorithm_header(codec):
+    header, payload, signature = codec.encode({"sub": "user-1"}).split(".")
+    hs_header = _b64url_encode(b'{"alg":"HS256","typ":"JWT"}')
+    assert codec.decode(f"{hs_header}.{payload}.{signature}") is None
+    assert _b64url_decode(header) == b'{"alg":"EdDSA","typ":"JWT"}'
+
+
+def test_hs256_round_trip_and_wrong_secret():
+    token = TokenCodec("HS256", secret_key="secret").encode({"sub": "user-1"})
+    assert TokenCodec("HS256", secret_key="secret").decode(token) == {"sub": "user-1"}
+    assert TokenCodec("HS256", secret_key="other").decode(token) is None
+
+
+@pytest.mark.parametrize("algorithm", ["RS256", "EdDSA ", "none"])
+def test_unsupported_algorithm(algorithm):
+    with pytest.raises(ValueError):
+        TokenCodec(algorithm, secret_key="secret")
+
+
+def test_from_pem_files_rejects_non_ed25519_key(tmp_path):
+    rsa = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.rsa")
+    from cryptography.hazmat.primitives import serialization
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    path = tmp_path / "rsa.pem"
+    path.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+    with pytest.raises(ValueError):
+        TokenCodec.from_pem_files(str(path), None)
+
+
+def test_from_pem_files_round_trip(tmp_path, codec):
+    from cryptography.hazmat.primitives import serialization
+
+    path = tmp_path / "ed25519.pem"
+    path.write_bytes(codec.private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+    loaded = TokenCodec.from_pem_files(str(path), None)
+    assert codec.decode(loaded.encode({"sub": "user-1"})) == {"sub": "user-1"}